@@ -4,16 +4,64 @@ from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error
 import joblib
-from typing import List, Dict, Any
-from datetime import datetime, timedelta
+import sklearn
+from typing import List, Dict, Any, NamedTuple, Optional, Sequence, Union
+from datetime import datetime, date, timedelta
+from ai_models.feature_encoder import FeatureEncoder, DEFAULT_FEATURE_COLUMNS
+from ai_models.registry import ModelRegistry
+import logging
 import os
+import time
+import warnings
+from threading import Lock
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Demand returned when no trained model is available
+DEFAULT_DEMAND = 5.0
+
+# Version of the saved model bundle. Files holding a bare estimator predate bundles.
+MODEL_BUNDLE_VERSION = 1
+
+# Seconds between checks of the registry manifest for a model trained by another process
+MODEL_RELOAD_CHECK_SECONDS = float(os.getenv("MODEL_RELOAD_CHECK_SECONDS", "30"))
+
+class ServingModel(NamedTuple):
+    model: Any
+    encoder: FeatureEncoder
+    metadata: Dict[str, Any]
+    version: Optional[str]            # registry version, None for a legacy model file
+    manifest_mtime: Optional[float]   # manifest modification time when the version was read
 
 class DemandPredictor:
-    def __init__(self):
-        self.model = None
-        self.is_trained = False
+    def __init__(self, registry: Optional[ModelRegistry] = None):
+        # Replaced as a whole, so a prediction never mixes one model with another's layout
+        self.serving: Optional[ServingModel] = None
+        self.registry = registry or ModelRegistry("demand")
+        # Single model file written before the registry, loaded when the registry is empty
         self.model_path = "ai_models/demand_model.pkl"
+        self._checked_at = 0.0
+        self._reload_lock = Lock()
         
+    @property
+    def model(self):
+        return self.serving.model if self.serving else None
+    
+    @property
+    def is_trained(self) -> bool:
+        return self.serving is not None
+    
+    @property
+    def encoder(self) -> FeatureEncoder:
+        return self.serving.encoder if self.serving else FeatureEncoder(DEFAULT_FEATURE_COLUMNS)
+    
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self.serving.metadata if self.serving else {}
+    
     def prepare_features(self, data: pd.DataFrame) -> pd.DataFrame:
         """
         Prepare features for training the demand prediction model.
@@ -49,55 +97,227 @@ class DemandPredictor:
         # Prepare features
         features = self.prepare_features(training_data)
         
-        # Define feature columns and target
-        feature_columns = ['hour', 'day_of_week', 'month', 'weather', 'traffic']
-        X = features[feature_columns]
-        y = features['demand_count']
+        return self.fit(
+            features['hour'].to_numpy(),
+            features['day_of_week'].to_numpy(),
+            features['month'].to_numpy(),
+            features['weather'].tolist(),
+            features['traffic'].tolist(),
+            features['demand_count'].to_numpy(),
+            samples=len(training_data)
+        )
+    
+    def fit(self, hours: Sequence[int], day_of_week: Sequence[int], month: Sequence[int],
+            weather: Sequence[Optional[str]], traffic: Sequence[Optional[str]], demand: Sequence[float],
+            samples: Optional[int] = None, n_jobs: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Train the demand prediction model on aggregated rows, then save and serve it.
         
-        # Handle categorical variables
-        X = pd.get_dummies(X, columns=['weather', 'traffic'], dummy_na=True)
+        Args:
+            hours (Sequence[int]): Hour of each row
+            day_of_week (Sequence[int]): Day of week of each row
+            month (Sequence[int]): Month of each row
+            weather (Sequence[Optional[str]]): Weather condition of each row
+            traffic (Sequence[Optional[str]]): Traffic condition of each row
+            demand (Sequence[float]): Demand count of each row
+            samples (int): Number of raw records the rows were aggregated from
+            n_jobs (int): Cores used to fit the forest, -1 for all of them
+            
+        Returns:
+            Dict[str, Any]: Training metrics
+        """
+        # Encode with a column per category seen in training
+        encoder = FeatureEncoder.fit(weather=weather, traffic=traffic)
+        X = encoder.transform(hours, day_of_week, month, weather, traffic)
+        y = np.asarray(demand, dtype=np.float64)
         
         # Split data
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
         
         # Train model
-        self.model = RandomForestRegressor(n_estimators=100, random_state=42)
-        self.model.fit(X_train, y_train)
+        model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=n_jobs)
+        model.fit(X_train, y_train)
         
         # Evaluate model
-        y_pred = self.model.predict(X_test)
+        y_pred = model.predict(X_test)
         mse = mean_squared_error(y_test, y_pred)
         rmse = np.sqrt(mse)
         
-        self.is_trained = True
+        metrics = {
+            "mse": mse,
+            "rmse": rmse,
+            "samples": len(y) if samples is None else samples
+        }
+        metadata = {
+            **metrics,
+            "model_type": type(model).__name__,
+            "training_rows": len(y),
+            "trained_at": datetime.utcnow().isoformat(),
+            "sklearn_version": sklearn.__version__
+        }
         
         # Save model
-        os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
-        joblib.dump(self.model, self.model_path)
+        bundle = self.build_bundle(model, encoder, metadata)
+        # Read before publishing, so a version published meanwhile by another
+        # process still looks new to the next poll
+        manifest_mtime = self.registry.manifest_mtime()
+        self.use_bundle(bundle, self.save_bundle(bundle), manifest_mtime)
+        
+        return metrics
+    
+    @staticmethod
+    def build_bundle(model, encoder: FeatureEncoder, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Package a fitted estimator with everything needed to serve it.
         
+        Args:
+            model: Fitted estimator
+            encoder (FeatureEncoder): Encoder the estimator was trained with
+            metadata (Dict[str, Any]): Training metadata such as metrics and sample counts
+            
+        Returns:
+            Dict[str, Any]: Model bundle
+        """
         return {
-            "mse": mse,
-            "rmse": rmse,
-            "samples": len(training_data)
+            "version": MODEL_BUNDLE_VERSION,
+            "model": model,
+            "feature_names": list(encoder.feature_names),
+            "vocabularies": encoder.vocabularies,
+            "metadata": dict(metadata or {})
         }
     
+    def save_bundle(self, bundle: Dict[str, Any]) -> str:
+        """
+        Publish a model bundle to the registry as its current version.
+        
+        Returns:
+            str: The new version
+        """
+        return self.registry.publish(bundle, bundle.get("metadata"))
+    
+    def use_bundle(self, bundle: Any, version: Optional[str] = None, manifest_mtime: Optional[float] = None):
+        """
+        Serve predictions from a loaded model bundle.
+        
+        Files written before bundles hold a bare estimator. Its column layout
+        comes from feature_names_in_ when it was fitted on a DataFrame, or
+        from the old hardcoded layout.
+        """
+        if isinstance(bundle, dict) and "model" in bundle:
+            model = bundle["model"]
+            encoder = FeatureEncoder(bundle["feature_names"])
+            metadata = bundle.get("metadata", {})
+        else:
+            model = bundle
+            encoder = FeatureEncoder(list(getattr(model, "feature_names_in_", DEFAULT_FEATURE_COLUMNS)))
+            metadata = {"model_type": type(model).__name__, "legacy": True}
+        
+        n_features = getattr(model, "n_features_in_", len(encoder.feature_names))
+        if n_features != len(encoder.feature_names):
+            raise ValueError(f"Model expects {n_features} features but its layout has {len(encoder.feature_names)}")
+        
+        self.serving = ServingModel(model, encoder, metadata, version, manifest_mtime)
+        self._checked_at = time.monotonic()
+    
+    @property
+    def feature_columns(self) -> List[str]:
+        return self.encoder.feature_names
+    
     def load_model(self) -> bool:
         """
-        Load a pre-trained model from disk.
+        Load the registry's current model, or the legacy model file.
         
         Returns:
             bool: True if model loaded successfully, False otherwise
         """
         try:
-            if os.path.exists(self.model_path):
-                self.model = joblib.load(self.model_path)
-                self.is_trained = True
-                return True
-            return False
+            with self._reload_lock:
+                # Read the mtime first: if the manifest changes meanwhile, the next poll reloads
+                manifest_mtime = self.registry.manifest_mtime()
+                version = self.registry.current_version()
+                if version is not None:
+                    if self.serving is None or self.serving.version != version:
+                        self.use_bundle(self.registry.load(version), version, manifest_mtime)
+                        logger.info(f"Serving demand model version {version}")
+                    else:
+                        self.serving = self.serving._replace(manifest_mtime=manifest_mtime)
+                    self.registry.listen(self.on_new_version)
+                    return True
+                
+                if os.path.exists(self.model_path):
+                    self.use_bundle(joblib.load(self.model_path))
+                    return True
+                return False
         except Exception as e:
-            print(f"Error loading model: {str(e)}")
+            logger.error(f"Error loading model: {str(e)}")
             return False
     
+    def on_new_version(self, version: str):
+        """Swap in a version announced by another process"""
+        serving = self.serving
+        if serving is None or serving.version != version:
+            self.load_model()
+    
+    def current_model(self) -> Optional[ServingModel]:
+        """
+        Return the model to serve, picking up a new registry version at most
+        every MODEL_RELOAD_CHECK_SECONDS.
+        
+        Returns:
+            Optional[ServingModel]: The model, or None if no model is available
+        """
+        serving = self.serving
+        if serving is None:
+            self.load_model()
+            return self.serving
+        
+        if time.monotonic() - self._checked_at >= MODEL_RELOAD_CHECK_SECONDS:
+            self._checked_at = time.monotonic()
+            manifest_mtime = self.registry.manifest_mtime()
+            if manifest_mtime is not None and manifest_mtime != serving.manifest_mtime:
+                self.load_model()
+        return self.serving
+    
+    def predict_batch(self, pump_ids: Sequence[str], slot_dates: Sequence[date], hours: Sequence[int],
+                      weather: Union[str, Sequence[str]] = "clear",
+                      traffic: Union[str, Sequence[str]] = "low") -> np.ndarray:
+        """
+        Predict demand for many time slots with a single model call.
+        
+        Args:
+            pump_ids (Sequence[str]): Pump identifier of each slot
+            slot_dates (Sequence[date]): Date of each slot
+            hours (Sequence[int]): Hour of each slot
+            weather (Union[str, Sequence[str]]): Weather condition of each slot, or one for all slots
+            traffic (Union[str, Sequence[str]]): Traffic condition of each slot, or one for all slots
+            
+        Returns:
+            np.ndarray: Non-negative predicted demand count of each slot
+        """
+        n = len(hours)
+        if len(pump_ids) != n or len(slot_dates) != n:
+            raise ValueError("pump_ids, slot_dates and hours must have the same length")
+        if n == 0:
+            return np.zeros(0)
+        
+        serving = self.current_model()
+        if serving is None:
+            # Return average demand if no model is available
+            return np.full(n, DEFAULT_DEMAND)
+        
+        try:
+            features = serving.encoder.encode(slot_dates, hours, weather, traffic)
+            with warnings.catch_warnings():
+                # Legacy estimators were fitted on DataFrames. The matrix follows
+                # their column layout, so the missing names are expected.
+                warnings.filterwarnings("ignore", message="X does not have valid feature names")
+                predictions = serving.model.predict(features)
+            return np.maximum(predictions, 0)  # Ensure non-negative predictions
+        except Exception as e:
+            logger.error(f"Error predicting demand: {str(e)}")
+            # Return average demand as fallback
+            return np.full(n, DEFAULT_DEMAND)
+    
     def predict_demand(self, pump_id: str, slot_date: datetime, slot_time: str, 
                       weather: str = "clear", traffic: str = "low") -> float:
         """
@@ -113,50 +333,11 @@ class DemandPredictor:
         Returns:
             float: Predicted demand count
         """
-        if not self.is_trained and not self.load_model():
-            # Return average demand if no model is available
-            return 5.0
-            
         try:
-            # Parse time
             hour = int(slot_time.split(':')[0])
-            
-            # Extract date features
-            day_of_week = slot_date.weekday()
-            month = slot_date.month
-            
-            # Create feature vector
-            features = pd.DataFrame({
-                'hour': [hour],
-                'day_of_week': [day_of_week],
-                'month': [month],
-                'weather': [weather],
-                'traffic': [traffic]
-            })
-            
-            # Handle categorical variables (same as training)
-            features = pd.get_dummies(features, columns=['weather', 'traffic'], dummy_na=True)
-            
-            # Ensure all columns from training are present
-            # This is a simplified approach - in production, you'd save the training columns
-            expected_columns = ['hour', 'day_of_week', 'month', 'weather_clear', 'weather_rainy', 
-                              'weather_cloudy', 'traffic_low', 'traffic_medium', 'traffic_high']
-            
-            for col in expected_columns:
-                if col not in features.columns:
-                    features[col] = 0
-                    
-            # Reorder columns to match training
-            features = features.reindex(columns=expected_columns, fill_value=0)
-            
-            # Make prediction
-            prediction = self.model.predict(features)[0]
-            return max(0, prediction)  # Ensure non-negative prediction
-            
-        except Exception as e:
-            print(f"Error predicting demand: {str(e)}")
-            # Return average demand as fallback
-            return 5.0
+        except ValueError:
+            return DEFAULT_DEMAND
+        return float(self.predict_batch([pump_id], [slot_date], [hour], weather, traffic)[0])
 
 # Global instance
 demand_predictor = DemandPredictor()
\ No newline at end of file
@@ -0,0 +1,134 @@
+import numpy as np
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+# Numeric features, in model column order
+NUMERIC_FEATURES = ('hour', 'day_of_week', 'month')
+
+# Categorical features, one-hot encoded as "<feature>_<value>" columns after the numeric ones
+CATEGORICAL_FEATURES = ('weather', 'traffic')
+
+# Column layout for models saved before the layout was stored with them
+DEFAULT_FEATURE_COLUMNS = ['hour', 'day_of_week', 'month', 'weather_clear', 'weather_rainy',
+                           'weather_cloudy', 'traffic_low', 'traffic_medium', 'traffic_high']
+
+# Column suffix pandas.get_dummies(dummy_na=True) uses for missing values
+MISSING_CATEGORY = 'nan'
+
+Categories = Union[Optional[str], Sequence[Optional[str]]]
+
+
+class FeatureEncoder:
+    """
+    Maps slot attributes straight to model input rows.
+
+    The column layout is fixed when the model is trained and saved with it, so
+    inference needs no pandas: categorical values are turned into column
+    indexes with dict lookups and written into a preallocated matrix. Values
+    outside the training vocabulary leave all their one-hot columns at zero,
+    like get_dummies followed by a reindex to the training columns.
+    """
+
+    def __init__(self, feature_names: Sequence[str]):
+        self.feature_names = list(feature_names)
+        columns = {name: index for index, name in enumerate(self.feature_names)}
+        self._numeric = {name: columns[name] for name in NUMERIC_FEATURES if name in columns}
+        self._categories: Dict[str, Dict[Optional[str], int]] = {name: {} for name in CATEGORICAL_FEATURES}
+        for column, index in columns.items():
+            for name in CATEGORICAL_FEATURES:
+                if column.startswith(f"{name}_"):
+                    value = column[len(name) + 1:]
+                    self._categories[name][None if value == MISSING_CATEGORY else value] = index
+                    break
+
+    @classmethod
+    def from_vocabularies(cls, vocabularies: Dict[str, Sequence[str]]) -> "FeatureEncoder":
+        """Build an encoder with a column per value of each categorical feature"""
+        feature_names = list(NUMERIC_FEATURES)
+        for name in CATEGORICAL_FEATURES:
+            feature_names.extend(f"{name}_{value}" for value in vocabularies.get(name, ()))
+        return cls(feature_names)
+
+    @classmethod
+    def fit(cls, **values: Iterable[Optional[str]]) -> "FeatureEncoder":
+        """
+        Build an encoder from the categorical values seen in training data.
+
+        Args:
+            **values: Training values of each categorical feature, e.g. weather=[...]
+
+        Returns:
+            FeatureEncoder: Encoder with sorted vocabularies of the non-missing values
+        """
+        return cls.from_vocabularies({
+            name: sorted({value for value in values.get(name, ()) if isinstance(value, str)})
+            for name in CATEGORICAL_FEATURES
+        })
+
+    @property
+    def vocabularies(self) -> Dict[str, List[str]]:
+        return {
+            name: [MISSING_CATEGORY if value is None else value for value in categories]
+            for name, categories in self._categories.items()
+        }
+
+    def transform(self, hours: Sequence[int], day_of_week: Sequence[int], month: Sequence[int],
+                  weather: Categories = "clear", traffic: Categories = "low") -> np.ndarray:
+        """
+        Build the feature matrix for rows of raw feature values.
+
+        Args:
+            hours (Sequence[int]): Hour of each row
+            day_of_week (Sequence[int]): Day of week of each row, Monday is 0
+            month (Sequence[int]): Month of each row
+            weather (Categories): Weather condition of each row, or one for all rows
+            traffic (Categories): Traffic condition of each row, or one for all rows
+
+        Returns:
+            np.ndarray: Matrix with one row per input row, in feature_names order
+        """
+        n = len(hours)
+        features = np.zeros((n, len(self.feature_names)), dtype=np.float64)
+
+        for name, values in zip(NUMERIC_FEATURES, (hours, day_of_week, month)):
+            if name in self._numeric:
+                features[:, self._numeric[name]] = values
+
+        rows = np.arange(n)
+        for name, values in zip(CATEGORICAL_FEATURES, (weather, traffic)):
+            categories = self._categories[name]
+            if values is None or isinstance(values, str):
+                index = categories.get(values)
+                if index is not None:
+                    features[:, index] = 1
+                continue
+            indexes = np.fromiter(
+                (categories.get(value if isinstance(value, str) else None, -1) for value in values),
+                dtype=np.int64, count=n
+            )
+            known = indexes >= 0
+            features[rows[known], indexes[known]] = 1
+
+        return features
+
+    def encode(self, slot_dates: Sequence[date], hours: Sequence[int],
+               weather: Categories = "clear", traffic: Categories = "low") -> np.ndarray:
+        """
+        Build the feature matrix for a batch of slots.
+
+        Args:
+            slot_dates (Sequence[date]): Date of each slot
+            hours (Sequence[int]): Hour of each slot
+            weather (Categories): Weather condition of each slot, or one for all slots
+            traffic (Categories): Traffic condition of each slot, or one for all slots
+
+        Returns:
+            np.ndarray: Matrix with one row per slot, in feature_names order
+        """
+        return self.transform(
+            hours,
+            [slot_date.weekday() for slot_date in slot_dates],
+            [slot_date.month for slot_date in slot_dates],
+            weather,
+            traffic
+        )
@@ -0,0 +1,191 @@
+from datetime import datetime
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Dict, Optional
+import json
+import joblib
+import logging
+import os
+from dotenv import load_dotenv
+from utils.cache import REDIS_URL, get_redis_client
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Directory holding one file per model version and the manifest naming the current one
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "ai_models/registry")
+
+# Versions kept on disk, so a worker still loading the previous one never loses its file
+MODEL_REGISTRY_KEEP_VERSIONS = int(os.getenv("MODEL_REGISTRY_KEEP_VERSIONS", "5"))
+
+# Announce new versions on a Redis channel so workers reload without waiting for their next poll
+MODEL_REGISTRY_REDIS_ENABLED = os.getenv("MODEL_REGISTRY_REDIS_ENABLED", "false").lower() in ("1", "true", "yes")
+MODEL_REGISTRY_CHANNEL = os.getenv("MODEL_REGISTRY_CHANNEL", "cng:models")
+
+MANIFEST_FILE = "manifest.json"
+
+
+def _write_atomic(path: str, write: Callable[[str], None]):
+    """Write a file through a temporary file renamed over path, so readers never see a partial file"""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        write(temp_path)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+class ModelRegistry:
+    """
+    Versioned model files on local disk with a manifest naming the current version.
+
+    Publishing writes the new version's file, then atomically replaces the
+    manifest, so a reader always finds a complete manifest pointing at a
+    complete file. Serving processes poll the manifest's mtime, and can also
+    be notified through Redis pub/sub.
+
+    Files are loaded with mmap_mode="r": numpy arrays stored in a bundle are
+    mapped read-only from the page cache instead of copied into each worker.
+    """
+
+    def __init__(self, name: str = "demand", root: str = MODEL_REGISTRY_DIR,
+                 keep_versions: int = MODEL_REGISTRY_KEEP_VERSIONS, redis_client: Any = None):
+        self.name = name
+        self.root = root
+        self.keep_versions = keep_versions
+        self.redis = redis_client
+        if self.redis is None and MODEL_REGISTRY_REDIS_ENABLED:
+            self.redis = get_redis_client(REDIS_URL)
+        self._lock = Lock()
+        self._stopped = Event()
+        self._listener: Optional[Thread] = None
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.root, f"{self.name}-{MANIFEST_FILE}")
+
+    @property
+    def channel(self) -> str:
+        return f"{MODEL_REGISTRY_CHANNEL}:{self.name}"
+
+    def version_path(self, version: str) -> str:
+        return os.path.join(self.root, f"{self.name}-{version}.joblib")
+
+    def read_manifest(self) -> Dict[str, Any]:
+        """
+        Read the manifest.
+
+        Returns:
+            Dict[str, Any]: Manifest with the current version and the versions on disk,
+            empty if nothing has been published
+        """
+        try:
+            with open(self.manifest_path) as manifest:
+                return json.load(manifest)
+        except FileNotFoundError:
+            return {}
+
+    def manifest_mtime(self) -> Optional[float]:
+        """Modification time of the manifest, or None if nothing has been published"""
+        try:
+            return os.stat(self.manifest_path).st_mtime
+        except OSError:
+            return None
+
+    def current_version(self) -> Optional[str]:
+        return self.read_manifest().get("current")
+
+    def publish(self, bundle: Dict[str, Any], metadata: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Save a model bundle as a new version and make it current.
+
+        Args:
+            bundle (Dict[str, Any]): Model bundle to save
+            metadata (Dict[str, Any]): Details recorded for the version in the manifest
+
+        Returns:
+            str: The new version
+        """
+        os.makedirs(self.root, exist_ok=True)
+        version = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{os.getpid()}"
+
+        # Uncompressed, so arrays can be memory mapped when loading
+        _write_atomic(self.version_path(version), lambda path: joblib.dump(bundle, path))
+
+        with self._lock:
+            manifest = self.read_manifest()
+            versions = manifest.get("versions", [])
+            versions.append({
+                "version": version,
+                "created_at": datetime.utcnow().isoformat(),
+                "metadata": metadata or {}
+            })
+            removed, versions = versions[:-self.keep_versions], versions[-self.keep_versions:]
+            manifest = {"current": version, "versions": versions}
+
+            def write_manifest(path):
+                with open(path, "w") as manifest_file:
+                    json.dump(manifest, manifest_file, indent=2, default=str)
+
+            _write_atomic(self.manifest_path, write_manifest)
+
+        for entry in removed:
+            try:
+                os.remove(self.version_path(entry["version"]))
+            except OSError:
+                pass
+
+        logger.info(f"Published {self.name} model version {version}")
+        self.notify(version)
+        return version
+
+    def load(self, version: str) -> Any:
+        """Load a version's bundle, memory mapping its arrays"""
+        return joblib.load(self.version_path(version), mmap_mode="r")
+
+    def notify(self, version: str):
+        """Tell other processes about a new version over Redis, if configured"""
+        if self.redis is None:
+            return
+        try:
+            self.redis.publish(self.channel, version)
+        except Exception as e:
+            logger.warning(f"Could not announce {self.name} model version {version}: {str(e)}")
+
+    def listen(self, on_version: Callable[[str], None]):
+        """
+        Call on_version from a background thread whenever a new version is announced.
+
+        Does nothing without Redis. Polling the manifest still picks up new
+        versions if a message is missed.
+        """
+        if self.redis is None:
+            return
+        with self._lock:
+            if self._listener is not None or self._stopped.is_set():
+                return
+            self._listener = Thread(target=self._listen, args=(on_version,), name=f"{self.name}-models", daemon=True)
+            self._listener.start()
+
+    def _listen(self, on_version: Callable[[str], None]):
+        while not self._stopped.is_set():
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                while not self._stopped.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get("type") == "message":
+                        data = message["data"]
+                        on_version(data.decode() if isinstance(data, bytes) else data)
+                pubsub.close()
+            except Exception as e:
+                logger.warning(f"Model version listener for {self.name} failed: {str(e)}")
+                self._stopped.wait(5)
+
+    def shutdown(self):
+        self._stopped.set()
+        with self._lock:
+            listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.join(timeout=2)
@@ -0,0 +1,224 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from models.ai_data import AIData
+from models.booking import Booking
+from ai_models.demand_predictor import DemandPredictor, demand_predictor
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date
+from threading import Lock
+from typing import Any, Dict, Iterable, Optional, Tuple
+import logging
+import multiprocessing
+import os
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per round trip while streaming training data
+TRAINING_CHUNK_SIZE = int(os.getenv("AI_TRAINING_CHUNK_SIZE", "5000"))
+
+# Cores used to fit the model, all of them by default
+TRAINING_N_JOBS = int(os.getenv("AI_TRAINING_N_JOBS", str(os.cpu_count() or 1)))
+
+# Processes per API process that run training requested through the API. 0
+# trains on a background thread instead, which is enough for tests.
+TRAINING_WORKERS = int(os.getenv("AI_TRAINING_WORKERS", "1"))
+
+# Fewer aggregated pump/date/hour rows than this are not enough to train on
+MIN_TRAINING_ROWS = int(os.getenv("AI_MIN_TRAINING_ROWS", "10"))
+
+# Bookings that never turned into demand at the pump
+EXCLUDED_BOOKING_STATUSES = ("cancelled",)
+
+# Conditions assumed for bookings, which do not record them. These match the
+# defaults the prediction endpoints use.
+DEFAULT_WEATHER = "clear"
+DEFAULT_TRAFFIC = "low"
+
+
+class DemandAggregator:
+    """
+    Sums demand per pump, date and hour as rows are streamed in.
+
+    Memory grows with the number of distinct slots, not with the number of
+    bookings read.
+    """
+
+    def __init__(self):
+        # (pump_id, slot_date, hour) -> [demand, weather, traffic]
+        self.slots: Dict[Tuple[str, date, int], list] = {}
+        self.samples = 0
+
+    def add(self, pump_id, slot_date: date, hour: int, demand: int = 1,
+            weather: Optional[str] = None, traffic: Optional[str] = None):
+        self.samples += 1
+        slot = self.slots.get((str(pump_id), slot_date, hour))
+        if slot is None:
+            self.slots[(str(pump_id), slot_date, hour)] = [demand, weather, traffic]
+            return
+        slot[0] += demand
+        # Recorded conditions win over the defaults assumed for bookings
+        slot[1] = slot[1] or weather
+        slot[2] = slot[2] or traffic
+
+    def columns(self) -> Dict[str, list]:
+        """Aggregated rows as the column lists DemandPredictor.fit takes"""
+        columns = {"hours": [], "day_of_week": [], "month": [], "weather": [], "traffic": [], "demand": []}
+        for (_, slot_date, hour), (demand, weather, traffic) in self.slots.items():
+            columns["hours"].append(hour)
+            columns["day_of_week"].append(slot_date.weekday())
+            columns["month"].append(slot_date.month)
+            columns["weather"].append(weather or DEFAULT_WEATHER)
+            columns["traffic"].append(traffic or DEFAULT_TRAFFIC)
+            columns["demand"].append(demand)
+        return columns
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+
+def stream_rows(db: Session, statement, chunk_size: int = TRAINING_CHUNK_SIZE) -> Iterable[tuple]:
+    """
+    Yield the rows of a query chunk by chunk over a server-side cursor.
+
+    Args:
+        db (Session): Database session
+        statement: SELECT to run
+        chunk_size (int): Rows fetched per round trip
+
+    Yields:
+        tuple: Result rows
+    """
+    result = db.execute(statement.execution_options(yield_per=chunk_size))
+    for partition in result.partitions():
+        yield from partition
+
+
+def load_training_data(db: Session, since: Optional[date] = None,
+                       chunk_size: int = TRAINING_CHUNK_SIZE) -> DemandAggregator:
+    """
+    Aggregate historical bookings and AI data into per-slot demand.
+
+    Args:
+        db (Session): Database session
+        since (date): Only use slots on or after this date
+        chunk_size (int): Rows fetched per round trip
+
+    Returns:
+        DemandAggregator: Demand per pump, date and hour
+    """
+    aggregator = DemandAggregator()
+
+    bookings = select(Booking.pump_id, Booking.slot_date, Booking.slot_time).where(
+        Booking.booking_status.notin_(EXCLUDED_BOOKING_STATUSES)
+    )
+    ai_data = select(AIData.pump_id, AIData.slot_date, AIData.slot_time, AIData.demand_count,
+                     AIData.weather, AIData.traffic)
+    if since is not None:
+        bookings = bookings.where(Booking.slot_date >= since)
+        ai_data = ai_data.where(AIData.slot_date >= since)
+
+    for pump_id, slot_date, slot_time in stream_rows(db, bookings, chunk_size):
+        aggregator.add(pump_id, slot_date, slot_time.hour)
+
+    for pump_id, slot_date, slot_time, demand_count, weather, traffic in stream_rows(db, ai_data, chunk_size):
+        aggregator.add(pump_id, slot_date, slot_time.hour, demand_count or 0, weather, traffic)
+
+    return aggregator
+
+
+def train_from_database(db: Session, predictor: DemandPredictor = demand_predictor, since: Optional[date] = None,
+                        chunk_size: int = TRAINING_CHUNK_SIZE, n_jobs: int = TRAINING_N_JOBS) -> Dict[str, Any]:
+    """
+    Train the demand model on historical data and swap it in.
+
+    Args:
+        db (Session): Database session
+        predictor (DemandPredictor): Predictor to train
+        since (date): Only use slots on or after this date
+        chunk_size (int): Rows fetched per round trip
+        n_jobs (int): Cores used to fit the model
+
+    Returns:
+        Dict[str, Any]: Training report with sample counts, metrics and timings
+    """
+    started = time.perf_counter()
+    aggregator = load_training_data(db, since, chunk_size)
+    load_seconds = time.perf_counter() - started
+
+    report = {
+        "samples": aggregator.samples,
+        "training_rows": len(aggregator),
+        "load_seconds": round(load_seconds, 3),
+        "n_jobs": n_jobs
+    }
+    if len(aggregator) < MIN_TRAINING_ROWS:
+        logger.warning(f"Not enough training data: {len(aggregator)} rows, need {MIN_TRAINING_ROWS}")
+        return {**report, "status": "skipped"}
+
+    fit_started = time.perf_counter()
+    metrics = predictor.fit(**aggregator.columns(), samples=aggregator.samples, n_jobs=n_jobs)
+    report.update(
+        status="trained",
+        version=predictor.serving.version,
+        mse=float(metrics["mse"]),
+        rmse=float(metrics["rmse"]),
+        fit_seconds=round(time.perf_counter() - fit_started, 3),
+        duration_seconds=round(time.perf_counter() - started, 3)
+    )
+    logger.info(f"Trained demand model: {report}")
+    return report
+
+
+def run_training(since: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Train the global demand predictor with its own database session, then
+    recompute the stored demand forecasts with the new model.
+    """
+    from db import SessionLocal
+    from services.forecast_service import forecast_service
+
+    db = SessionLocal()
+    try:
+        report = train_from_database(db, since=since)
+        if report["status"] == "trained":
+            report["forecast"] = forecast_service.refresh(db)
+        return report
+    finally:
+        db.close()
+
+
+_training_pool: Optional[Executor] = None
+_training_pool_lock = Lock()
+
+
+def get_training_pool() -> Executor:
+    """
+    Executor that runs training requested through the API, one run at a time.
+
+    Training runs outside the API process so fitting the forest on every core
+    does not starve request handling. The pool uses the spawn start method so
+    the worker starts without the API's database connections and threads.
+    """
+    global _training_pool
+    with _training_pool_lock:
+        if _training_pool is None:
+            if TRAINING_WORKERS > 0:
+                _training_pool = ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                _training_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai-training")
+        return _training_pool
+
+
+def shutdown_training_pool():
+    global _training_pool
+    with _training_pool_lock:
+        pool, _training_pool = _training_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
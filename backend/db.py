@@ -1,31 +1,429 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
+from threading import Lock
+import itertools
+import logging
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Database configuration
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test_supabase.db")
 
-# Handle SQLite differently for UUID support
+# Connection pool configuration. Each uvicorn worker has its own pool, so the
+# database sees up to workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))  # 0 disables the timeout
+
+# SQLite pragmas applied to every new connection
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Read replicas, as a comma separated list of URLs. Read-only routes use them
+# while they are within READ_REPLICA_MAX_LAG_SECONDS of the primary.
+READ_REPLICA_URLS = [url.strip() for url in os.getenv("READ_REPLICA_URLS", "").split(",") if url.strip()]
+READ_REPLICA_MAX_LAG_SECONDS = float(os.getenv("READ_REPLICA_MAX_LAG_SECONDS", "5"))
+READ_REPLICA_CHECK_INTERVAL = float(os.getenv("READ_REPLICA_CHECK_INTERVAL", "10"))
+
+# Replay lag of a PostgreSQL standby. A standby that has replayed everything it
+# received is caught up even if the primary has been idle for a while.
+REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class PoolMetrics:
+    """Thread-safe counters describing how a connection pool is being used"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.waits = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def record_checkout(self):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+
+    def record_checkin(self):
+        with self._lock:
+            self.checkins += 1
+            self.in_use = max(self.in_use - 1, 0)
+
+    def record_invalidate(self):
+        with self._lock:
+            self.invalidations += 1
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.waits += 1
+            self.total_wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+                "avg_wait_ms": round(self.total_wait_seconds / self.waits * 1000, 3) if self.waits else 0.0,
+                "max_wait_ms": round(self.max_wait_seconds * 1000, 3),
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait to check out a connection"""
+
+    metrics = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if self.metrics is not None:
+                self.metrics.record_wait(time.perf_counter() - start)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool with the same checkout wait timing, for async engines"""
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    scheme, _, rest = url.partition("://")
+    return scheme.startswith("sqlite") and (rest in ("", "/") or ":memory:" in rest)
+
+
+def create_db_engine(url: str = DATABASE_URL, **overrides) -> Engine:
+    """
+    Create an engine configured from the DB_* / SQLITE_* environment settings.
+
+    Args:
+        url (str): Database URL
+        **overrides: Extra keyword arguments passed straight to create_engine
+
+    Returns:
+        Engine: Configured SQLAlchemy engine with pool metrics attached as ``engine.pool.metrics``
+    """
+    is_sqlite = url.startswith("sqlite")
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    connect_args = {}
+
+    if is_sqlite:
+        connect_args["check_same_thread"] = False
+    elif DB_STATEMENT_TIMEOUT_MS > 0:
+        connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+
+    if not _is_memory_sqlite(url):
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+
+    options["connect_args"] = connect_args
+    options.update(overrides)
+    db_engine = create_engine(url, **options)
+
+    _instrument(db_engine, url)
+    return db_engine
+
+
+def _instrument(db_engine: Engine, url: str):
+    """Attach pool metrics and SQLite pragmas to a (sync) engine"""
+    is_sqlite = url.startswith("sqlite")
+    metrics = PoolMetrics()
+    db_engine.pool.metrics = metrics
+
+    @event.listens_for(db_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        metrics.record_connect()
+        if is_sqlite:
+            cursor = dbapi_connection.cursor()
+            if not _is_memory_sqlite(url):
+                cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+            cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+            cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+            cursor.close()
+
+    @event.listens_for(db_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.record_checkout()
+
+    @event.listens_for(db_engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        metrics.record_checkin()
+
+    @event.listens_for(db_engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.record_invalidate()
+
+
+def to_async_url(url: str) -> str:
+    """Map a sync database URL onto its async driver (aiosqlite / asyncpg)"""
+    scheme, sep, rest = url.partition("://")
+    dialect = scheme.split("+")[0]
+    if dialect == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    if dialect in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg{sep}{rest}"
+    return url
+
+
+def create_async_db_engine(url: str = DATABASE_URL, **overrides) -> AsyncEngine:
+    """
+    Create an async engine with the same pool settings as create_db_engine.
+
+    Args:
+        url (str): Database URL, either sync or async form
+        **overrides: Extra keyword arguments passed straight to create_async_engine
+
+    Returns:
+        AsyncEngine: Configured engine with pool metrics on ``engine.sync_engine.pool.metrics``
+    """
+    async_url = to_async_url(url)
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    connect_args = {}
 
-# Handle SQLite differently for UUID support
-if DATABASE_URL.startswith("sqlite"):
-    # For SQLite, we need to use String for UUID columns
-    from sqlalchemy import MetaData
-    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-else:
-    engine = create_engine(DATABASE_URL)
+    if not async_url.startswith("sqlite") and DB_STATEMENT_TIMEOUT_MS > 0:
+        connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+
+    if not _is_memory_sqlite(async_url):
+        options.update(
+            poolclass=InstrumentedAsyncAdaptedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+
+    options["connect_args"] = connect_args
+    options.update(overrides)
+    db_engine = create_async_engine(async_url, **options)
+    _instrument(db_engine.sync_engine, async_url)
+    return db_engine
+
+
+def get_pool_metrics(db_engine: Engine = None) -> dict:
+    """Return pool configuration, current pool status and usage counters for an engine"""
+    db_engine = db_engine or engine
+    if isinstance(db_engine, AsyncEngine):
+        db_engine = db_engine.sync_engine
+    pool = db_engine.pool
+    metrics = getattr(pool, "metrics", None)
+
+    stats = {"pool_class": type(pool).__name__, "status": pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            pool_size=pool.size(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            max_overflow=DB_MAX_OVERFLOW,
+            timeout=DB_POOL_TIMEOUT,
+        )
+    if metrics is not None:
+        stats.update(metrics.snapshot())
+    return stats
+
+
+class ReplicaPool:
+    """
+    Round-robin over read replica engines, skipping replicas that lag too far
+    behind the primary or cannot be reached.
     
+    Lag is measured at most once per ``check_interval`` seconds per replica.
+    """
+
+    def __init__(self, engines, max_lag_seconds: float = READ_REPLICA_MAX_LAG_SECONDS,
+                 check_interval: float = READ_REPLICA_CHECK_INTERVAL):
+        self.engines = list(engines)
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self._status = {}
+        self._counter = itertools.count()
+        self._lock = Lock()
+
+    def measure_lag(self, db_engine: Engine) -> float:
+        """Seconds the replica is behind the primary (always 0 for non-PostgreSQL databases)"""
+        if db_engine.dialect.name != "postgresql":
+            return 0.0
+        with db_engine.connect() as connection:
+            return float(connection.execute(REPLICA_LAG_SQL).scalar() or 0)
+
+    def is_healthy(self, db_engine: Engine) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            status = self._status.get(db_engine)
+        if status is not None and now - status["checked_at"] < self.check_interval:
+            return status["healthy"]
+
+        try:
+            lag = self.measure_lag(db_engine)
+            healthy = lag <= self.max_lag_seconds
+            if not healthy:
+                logger.warning(f"Read replica {db_engine.url!r} is {lag:.1f}s behind, using the primary")
+        except Exception as e:
+            lag = None
+            healthy = False
+            logger.warning(f"Read replica {db_engine.url!r} is unavailable, using the primary: {str(e)}")
+
+        with self._lock:
+            self._status[db_engine] = {"checked_at": now, "healthy": healthy, "lag_seconds": lag}
+        return healthy
+
+    def choose(self):
+        """Return the next healthy replica engine, or None when the primary should serve the read"""
+        count = len(self.engines)
+        start = next(self._counter)
+        for offset in range(count):
+            db_engine = self.engines[(start + offset) % count]
+            if self.is_healthy(db_engine):
+                return db_engine
+        return None
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return [
+                {
+                    "url": db_engine.url.render_as_string(hide_password=True),
+                    "healthy": self._status.get(db_engine, {}).get("healthy"),
+                    "lag_seconds": self._status.get(db_engine, {}).get("lag_seconds"),
+                }
+                for db_engine in self.engines
+            ]
+
+
+def is_write_statement(clause) -> bool:
+    """INSERT/UPDATE/DELETE, SELECT ... FOR UPDATE and raw SQL must run on the primary"""
+    return (
+        isinstance(clause, (UpdateBase, TextClause))
+        or getattr(clause, "_for_update_arg", None) is not None
+    )
+
+
+engine = create_db_engine(DATABASE_URL)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
 def get_db():
+    """Yield one session per request, rolling back on errors and always returning the connection"""
     db = SessionLocal()
     try:
         yield db
+    except Exception:
+        db.rollback()
+        raise
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+read_replicas = ReplicaPool(create_db_engine(url) for url in READ_REPLICA_URLS)
+
+
+class RoutingSession(Session):
+    """
+    Session for read-only routes that sends queries to a healthy read replica.
+    
+    Flushes and write statements go to the primary, and once a session has
+    written it stays on the primary so it reads its own writes.
+    """
+
+    primary = engine
+    replicas = read_replicas
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.info.get("use_primary") or self._flushing or is_write_statement(clause):
+            self.info["use_primary"] = True
+            return self.primary
+        return self.replicas.choose() or self.primary
+
+
+ReadSessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False)
+
+def get_read_db():
+    """Like get_db, but reads are served by a read replica when one is configured and caught up"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+async_engine = create_async_db_engine(DATABASE_URL)
+
+# Objects stay loaded after commit so routes can serialize them without lazy IO
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def get_async_db():
+    """Async counterpart of get_db for ``async def`` routes"""
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception:
+            await db.rollback()
+            raise
+
+async_replica_engines = [create_async_db_engine(url) for url in READ_REPLICA_URLS]
+async_read_replicas = ReplicaPool(replica.sync_engine for replica in async_replica_engines)
+
+
+class AsyncRoutingSession(RoutingSession):
+    """RoutingSession used underneath AsyncSession, routing between the async engines"""
+
+    primary = async_engine.sync_engine
+    replicas = async_read_replicas
+
+
+AsyncReadSessionLocal = async_sessionmaker(
+    sync_session_class=AsyncRoutingSession, autoflush=False, expire_on_commit=False
+)
+
+async def get_async_read_db():
+    """Async counterpart of get_read_db"""
+    async with AsyncReadSessionLocal() as db:
+        try:
+            yield db
+        except Exception:
+            await db.rollback()
+            raise
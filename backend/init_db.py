@@ -8,6 +8,9 @@ from models.payment import Payment
 from models.reminder import Reminder
 from models.ai_data import AIData
 from models.pump_admin import PumpAdmin
+from models.slot_counter import SlotCounter
+from models.id_block import IdBlock
+from models.demand_forecast import DemandForecast
 from models.base import Base
 import sys
 
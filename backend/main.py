@@ -3,8 +3,15 @@ import os
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from db import async_engine, async_replica_engines, engine, get_pool_metrics, read_replicas
+from ai_models.demand_predictor import demand_predictor
+from ai_models.training import shutdown_training_pool
 from routes import ai_predictions, bookings, payments, pumps, reminders, tokens, users
 from sms_handler import router as sms_router
+from services.expiry_policy import expiry_policy
+from utils.external_apis import external_api_service
+from utils.qr_renderer import qr_renderer
+from utils.token_signing import token_signer
 
 app = FastAPI(
     title="AI-Powered Smart CNG Pump Appointment System",
@@ -31,6 +38,37 @@ app.include_router(reminders.router, prefix="/api/reminders", tags=["reminders"]
 app.include_router(ai_predictions.router, prefix="/api/ai", tags=["ai-predictions"])
 app.include_router(sms_router, prefix="/api/sms", tags=["sms"])
 
+@app.on_event("startup")
+def load_token_signing_key():
+    """Fail fast when tokens cannot be signed with a configured key"""
+    token_signer.private_key
+
+
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    """Close pooled async connections so driver threads do not outlive the worker"""
+    await async_engine.dispose()
+    for replica in async_replica_engines:
+        await replica.dispose()
+
+
+@app.on_event("shutdown")
+def stop_qr_renderer():
+    qr_renderer.shutdown()
+
+
+@app.on_event("shutdown")
+def stop_expiry_policy():
+    expiry_policy.shutdown()
+    external_api_service.close()
+
+
+@app.on_event("shutdown")
+def stop_ai_models():
+    shutdown_training_pool()
+    demand_predictor.registry.shutdown()
+
+
 @app.get("/")
 async def root():
     return {"message": "AI-Powered Smart CNG Pump Appointment System API"}
@@ -41,6 +79,16 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/health/db")
+async def database_pool_health():
+    """Connection pool sizing, status and checkout/wait metrics for this worker"""
+    return {
+        "sync": get_pool_metrics(engine),
+        "async": get_pool_metrics(async_engine),
+        "replicas": read_replicas.snapshot()
+    }
+
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
     uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
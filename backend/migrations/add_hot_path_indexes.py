@@ -0,0 +1,83 @@
+"""
+Add the indexes backing the service layer's hot lookups to an existing database.
+
+Safe to run more than once. On PostgreSQL the indexes are built with
+CREATE INDEX CONCURRENTLY so bookings keep flowing while they build.
+
+Usage:
+    python -m migrations.add_hot_path_indexes
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateIndex
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+# Tables whose indexes this migration manages
+TABLES = [
+    "bookings",
+    "tokens",
+    "reminders",
+    "payments",
+    "pump_admins",
+    "pumps",
+    "users",
+    "user_profiles",
+    "user_roles",
+]
+
+def get_indexes():
+    """Return every index declared on the managed tables"""
+    import init_db  # noqa: F401 - registers all models on the metadata
+    from models.base import Base
+    
+    indexes = []
+    for table_name in TABLES:
+        table = Base.metadata.tables[table_name]
+        indexes.extend(sorted(table.indexes, key=lambda index: index.name))
+    return indexes
+
+def upgrade(engine: Engine) -> int:
+    """
+    Create any missing hot path indexes.
+    
+    Args:
+        engine (Engine): Engine for the database to migrate
+        
+    Returns:
+        int: Number of indexes processed
+    """
+    indexes = get_indexes()
+    
+    if engine.dialect.name == "postgresql":
+        # CONCURRENTLY cannot run inside a transaction block
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for index in indexes:
+                ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+                conn.execute(text(ddl.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)))
+                logger.info(f"Ensured index {index.name}")
+    else:
+        with engine.begin() as conn:
+            for index in indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+                logger.info(f"Ensured index {index.name}")
+    
+    return len(indexes)
+
+def downgrade(engine: Engine):
+    """Drop the hot path indexes"""
+    with engine.begin() as conn:
+        for index in get_indexes():
+            conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+            logger.info(f"Dropped index {index.name}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    from db import engine
+    
+    if len(sys.argv) > 1 and sys.argv[1] == "downgrade":
+        downgrade(engine)
+    else:
+        print(f"Ensured {upgrade(engine)} indexes on {engine.url}")
@@ -0,0 +1,60 @@
+"""
+Replace the rendered QR data URIs stored in tokens.qr_data with the compact
+QR payload ("CNG_TOKEN:<token_code>:<booking_id>").
+
+QR images are rendered on demand by GET /api/tokens/{id}/qr, so only the
+payload needs to be stored. Rows are rewritten in batches of set-based
+UPDATEs so the table is never locked for long. Safe to run more than once.
+On PostgreSQL run VACUUM (or let autovacuum run) afterwards to reclaim the
+freed space.
+
+Usage:
+    python -m migrations.compact_token_qr_data
+"""
+from sqlalchemy import String, cast, literal, select, update
+from sqlalchemy.engine import Engine
+import logging
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+
+def upgrade(engine: Engine, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Compact every token whose qr_data still holds a rendered image.
+
+    Args:
+        engine (Engine): Engine for the database to migrate
+        batch_size (int): Rows rewritten per UPDATE statement
+
+    Returns:
+        int: Number of tokens compacted
+    """
+    from models.token import Token
+    from services.token_service import QR_PAYLOAD_PREFIX
+
+    tokens = Token.__table__
+    payload = literal(QR_PAYLOAD_PREFIX) + tokens.c.token_code + literal(":") + cast(tokens.c.booking_id, String)
+
+    total = 0
+    while True:
+        batch = select(tokens.c.id).where(tokens.c.qr_data.like("data:%")).limit(batch_size).scalar_subquery()
+        with engine.begin() as conn:
+            result = conn.execute(
+                update(tokens)
+                .where(tokens.c.id.in_(batch))
+                .values(qr_data=payload)
+                .execution_options(synchronize_session=False)
+            )
+        if result.rowcount <= 0:
+            break
+        total += result.rowcount
+        logger.info(f"Compacted {total} tokens")
+
+    return total
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    from db import engine
+
+    print(f"Compacted {upgrade(engine)} tokens on {engine.url}")
@@ -0,0 +1,55 @@
+"""
+Create the slot_counters table on an existing database and backfill it.
+
+Booking creation reserves capacity through slot_counters, so run this
+before deploying on a database that has bookings but no counters. Safe to
+run more than once: every counter is recomputed from the bookings table.
+
+Usage:
+    python -m migrations.create_slot_counters
+"""
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+def get_table():
+    """Return the slot_counters table"""
+    import init_db  # noqa: F401 - registers all models on the metadata
+    from models.slot_counter import SlotCounter
+    
+    return SlotCounter.__table__
+
+def upgrade(engine: Engine) -> int:
+    """
+    Create the slot_counters table if missing and rebuild every counter.
+    
+    Args:
+        engine (Engine): Engine for the database to migrate
+    
+    Returns:
+        int: Number of counters written
+    """
+    from services.slot_capacity_service import slot_capacity_service
+    
+    get_table().create(engine, checkfirst=True)
+    logger.info("Ensured table slot_counters")
+    
+    with Session(engine) as db:
+        return slot_capacity_service.rebuild_counters(db)
+
+def downgrade(engine: Engine):
+    """Drop the slot_counters table"""
+    get_table().drop(engine, checkfirst=True)
+    logger.info("Dropped table slot_counters")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    from db import engine
+    
+    if len(sys.argv) > 1 and sys.argv[1] == "downgrade":
+        downgrade(engine)
+    else:
+        print(f"Wrote {upgrade(engine)} slot counters on {engine.url}")
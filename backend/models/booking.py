@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, Integer, Numeric, Date, Time, ForeignKey, CheckConstraint
+from sqlalchemy import Column, String, Text, Integer, Numeric, Date, Time, ForeignKey, CheckConstraint, Index
 from models.base import Base, TimestampMixin
 from models.utils import uuid_column
 
@@ -19,4 +19,6 @@ class Booking(Base, TimestampMixin):
     __table_args__ = (
         CheckConstraint('fuel_quantity > 0 AND fuel_quantity <= 50', name='fuel_quantity_valid'),
         CheckConstraint('amount > 0', name='amount_valid'),
+        Index('ix_bookings_pump_slot', 'pump_id', 'slot_date', 'slot_time'),
+        Index('ix_bookings_user_id', 'user_id'),
     )
\ No newline at end of file
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, Integer, Float, Date, DateTime, PrimaryKeyConstraint
+from models.base import Base
+from models.utils import uuid_column
+
+class DemandForecast(Base):
+    __tablename__ = "demand_forecasts"
+    
+    pump_id = uuid_column()
+    slot_date = Column(Date, nullable=False)
+    hour = Column(Integer, nullable=False)              # 0-23
+    weather = Column(String(100), nullable=False)
+    traffic = Column(String(100), nullable=False)
+    demand = Column(Float, nullable=False)              # Predicted demand count
+    model_version = Column(String(64))                  # Registry version that made the forecast
+    generated_at = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        PrimaryKeyConstraint('pump_id', 'slot_date', 'hour', 'weather', 'traffic', name='pk_demand_forecasts'),
+    )
@@ -0,0 +1,8 @@
+from sqlalchemy import Column, String, BigInteger
+from models.base import Base, TimestampMixin
+
+class IdBlock(Base, TimestampMixin):
+    __tablename__ = "id_blocks"
+    
+    name = Column(String(50), primary_key=True)  # Sequence name, e.g. token_code
+    next_value = Column(BigInteger, nullable=False, default=0)  # First value not yet handed out
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Numeric, ForeignKey, Integer
+from sqlalchemy import Column, String, Numeric, ForeignKey, Integer, Index
 from models.base import Base, TimestampMixin
 from models.utils import uuid_column
 
@@ -10,4 +10,8 @@ class Payment(Base, TimestampMixin):
     amount = Column(Numeric(10, 2), nullable=False)
     mode = Column(String(50))  # UPI, card, wallet
     status = Column(String(20), nullable=False)  # success, failed
-    transaction_id = Column(String(255))  # External payment gateway transaction ID
\ No newline at end of file
+    transaction_id = Column(String(255))  # External payment gateway transaction ID
+    
+    __table_args__ = (
+        Index('ix_payments_booking_id', 'booking_id'),
+    )
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, Integer, Numeric, Boolean, DateTime, func
+from sqlalchemy import Column, String, Text, Integer, Numeric, Boolean, DateTime, Index, func
 from models.base import Base
 from models.utils import uuid_column
 
@@ -18,4 +18,8 @@ class Pump(Base):
     rating = Column(Numeric(2, 1), default=4.0)
     is_open = Column(Boolean, nullable=False, default=True)
     created_at = Column(DateTime, default=func.now(), nullable=False)
-    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
\ No newline at end of file
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
+    
+    __table_args__ = (
+        Index('ix_pumps_city', 'city'),
+    )
\ No newline at end of file
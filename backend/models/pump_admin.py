@@ -1,4 +1,4 @@
-from sqlalchemy import Column, ForeignKey, Integer
+from sqlalchemy import Column, ForeignKey, Integer, Index
 from models.base import Base, TimestampMixin
 from models.utils import uuid_column
 
@@ -7,4 +7,8 @@ class PumpAdmin(Base, TimestampMixin):
     
     id = uuid_column(primary_key=True)
     user_id = uuid_column()
-    pump_id = uuid_column()
\ No newline at end of file
+    pump_id = uuid_column()
+    
+    __table_args__ = (
+        Index('ix_pump_admins_user_pump', 'user_id', 'pump_id'),
+    )
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Integer
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Index
 from models.base import Base, TimestampMixin
 from models.utils import uuid_column
 
@@ -8,4 +8,8 @@ class Reminder(Base, TimestampMixin):
     id = uuid_column(primary_key=True)
     booking_id = uuid_column()
     reminder_time = Column(DateTime, nullable=False)
-    confirmation_status = Column(String(20))  # coming, not_coming, no_reply
\ No newline at end of file
+    confirmation_status = Column(String(20))  # coming, not_coming, no_reply
+    
+    __table_args__ = (
+        Index('ix_reminders_booking_id', 'booking_id'),
+    )
\ No newline at end of file
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, Date, Time, UniqueConstraint, CheckConstraint
+from models.base import Base, TimestampMixin
+from models.utils import uuid_column
+
+class SlotCounter(Base, TimestampMixin):
+    __tablename__ = "slot_counters"
+    
+    id = uuid_column(primary_key=True)
+    pump_id = uuid_column()
+    slot_date = Column(Date, nullable=False)
+    slot_time = Column(Time, nullable=False)
+    booked_count = Column(Integer, nullable=False, default=0)  # Bookings currently holding this slot
+    
+    __table_args__ = (
+        UniqueConstraint('pump_id', 'slot_date', 'slot_time', name='uq_slot_counter_bucket'),
+        CheckConstraint('booked_count >= 0', name='booked_count_valid'),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Integer
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Integer, Index
 from models.base import Base, TimestampMixin
 from models.utils import uuid_column
 
@@ -12,6 +12,11 @@ class Token(Base, TimestampMixin):
     expiry_time = Column(DateTime, nullable=False)
     scan_time = Column(DateTime)
     status = Column(String(20), nullable=False, default='valid')  # valid, used, expired
+    
+    __table_args__ = (
+        Index('ix_tokens_booking_id', 'booking_id'),
+        Index('ix_tokens_status_expiry', 'status', 'expiry_time'),
+    )
 
 class TokenScan(Base, TimestampMixin):
     __tablename__ = "token_scans"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, Enum as SQLEnum, Integer
+from sqlalchemy import Column, String, Text, Enum as SQLEnum, Integer, Index
 from models.base import Base, TimestampMixin
 from models.utils import uuid_column
 from enum import Enum
@@ -18,6 +18,10 @@ class User(Base, TimestampMixin):
     phone = Column(String(20))
     vehicle_number = Column(String(50))
     role = Column(SQLEnum(UserRole), default=UserRole.USER)
+    
+    __table_args__ = (
+        Index('ix_users_phone', 'phone'),
+    )
 
 class UserProfile(Base, TimestampMixin):
     __tablename__ = "user_profiles"
@@ -27,10 +31,18 @@ class UserProfile(Base, TimestampMixin):
     full_name = Column(String(255))
     phone = Column(String(20))
     vehicle_number = Column(String(50))
+    
+    __table_args__ = (
+        Index('ix_user_profiles_user_id', 'user_id'),
+    )
 
 class UserRoles(Base, TimestampMixin):
     __tablename__ = "user_roles"
     
     id = uuid_column(primary_key=True)
     user_id = uuid_column()
-    role = Column(String(20), nullable=False)  # Using String for SQLite compatibility
\ No newline at end of file
+    role = Column(String(20), nullable=False)  # Using String for SQLite compatibility
+    
+    __table_args__ = (
+        Index('ix_user_roles_user_role', 'user_id', 'role'),
+    )
\ No newline at end of file
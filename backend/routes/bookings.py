@@ -1,41 +1,75 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from schemas.booking import BookingCreate, Booking, BookingUpdate
-from services.booking_service import booking_service
-from services.pump_service import pump_service
-from db import get_db
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from schemas.booking import BookingCreate, Booking, BookingUpdate, SlotAvailabilityMatrix
+from services.booking_service import async_booking_service
+from services.pump_service import async_pump_service
+from services.slot_capacity_service import slot_capacity_service, SlotUnavailableError
+from db import get_async_db, get_async_read_db
 from uuid import UUID
 from datetime import date, time
+from typing import List
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Upper bounds for a single availability request
+MAX_AVAILABILITY_PUMPS = 100
+MAX_AVAILABILITY_DAYS = 31
+
 @router.get("/", response_model=list[Booking])
-def get_user_bookings(
+async def get_user_bookings(
     user_id: UUID,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all bookings for a specific user"""
-    bookings = booking_service.get_bookings_by_user(db, user_id)
+    bookings = await async_booking_service.get_bookings_by_user(db, user_id)
     return bookings
 
 @router.get("/pump/{pump_id}", response_model=list[Booking])
-def get_pump_bookings(
+async def get_pump_bookings(
     pump_id: UUID,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all bookings for a specific pump"""
-    bookings = booking_service.get_bookings_by_pump(db, pump_id)
+    bookings = await async_booking_service.get_bookings_by_pump(db, pump_id)
     return bookings
 
+@router.get("/availability", response_model=SlotAvailabilityMatrix)
+async def get_availability(
+    pump_ids: List[UUID] = Query(..., description="Pumps to include"),
+    from_date: date = Query(..., alias="from", description="First date (YYYY-MM-DD)"),
+    to_date: date = Query(..., alias="to", description="Last date (YYYY-MM-DD)"),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Get slot availability for many pumps over a date range in one request"""
+    if to_date < from_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'to' must not be before 'from'"
+        )
+    if (to_date - from_date).days + 1 > MAX_AVAILABILITY_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Date range cannot exceed {MAX_AVAILABILITY_DAYS} days"
+        )
+    
+    pump_ids = list(dict.fromkeys(pump_ids))
+    if len(pump_ids) > MAX_AVAILABILITY_PUMPS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cannot request more than {MAX_AVAILABILITY_PUMPS} pumps"
+        )
+    
+    return await async_booking_service.get_availability_matrix(db, pump_ids, from_date, to_date)
+
 @router.get("/{booking_id}", response_model=Booking)
-def get_booking(
+async def get_booking(
     booking_id: UUID,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a specific booking by ID"""
-    booking = booking_service.get_booking_by_id(db, booking_id)
+    booking = await async_booking_service.get_booking_by_id(db, booking_id)
     if not booking:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -44,44 +78,52 @@ def get_booking(
     return booking
 
 @router.post("/", response_model=Booking)
-def create_booking(
+async def create_booking(
     booking: BookingCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new booking and automatically generate e-coupon"""
     # Verify pump exists
-    pump = pump_service.get_pump_by_id(db, booking.pump_id)
+    pump = await async_pump_service.get_cached_pump(db, booking.pump_id)
     if not pump:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Pump not found"
         )
     
-    # Check if slot is available
-    if not booking_service.is_slot_available(db, booking.pump_id, booking.slot_date, booking.slot_time):
+    # Reserve a place in the slot and create the booking in one transaction
+    try:
+        new_booking = await async_booking_service.create_booking(
+            db, booking, capacity=slot_capacity_service.get_slot_capacity(pump)
+        )
+    except SlotUnavailableError:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
+            status_code=status.HTTP_409_CONFLICT,
             detail="Selected time slot is not available"
         )
     
-    # Create booking
-    new_booking = booking_service.create_booking(db, booking)
-    
     # Automatically generate e-coupon for the booking
-    from services.token_service import token_service
-    token, qr_image = token_service.generate_e_token(db, new_booking.id)
+    from services.token_service import async_token_service
+    await async_token_service.generate_e_token(db, new_booking.id, pump_id=new_booking.pump_id)
     
     logger.info(f"Booking created with e-coupon: {new_booking.id}")
     return new_booking
 
 @router.put("/{booking_id}", response_model=Booking)
-def update_booking(
+async def update_booking(
     booking_id: UUID,
     booking_update: BookingUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update a booking"""
-    updated_booking = booking_service.update_booking(db, booking_id, booking_update)
+    # A cancelled or expired booking reserves its slot again, which fails if the slot is full
+    try:
+        updated_booking = await async_booking_service.update_booking(db, booking_id, booking_update)
+    except SlotUnavailableError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Selected time slot is not available"
+        )
     if not updated_booking:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -91,12 +133,12 @@ def update_booking(
     return updated_booking
 
 @router.delete("/{booking_id}")
-def delete_booking(
+async def delete_booking(
     booking_id: UUID,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a booking"""
-    deleted = booking_service.delete_booking(db, booking_id)
+    deleted = await async_booking_service.delete_booking(db, booking_id)
     if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -106,22 +148,21 @@ def delete_booking(
     return {"message": "Booking deleted successfully"}
 
 @router.get("/{pump_id}/slots/{slot_date}", response_model=list[str])
-def get_available_slots(
+async def get_available_slots(
     pump_id: UUID,
     slot_date: date,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get available time slots for a pump on a specific date"""
     # Verify pump exists
-    pump = pump_service.get_pump_by_id(db, pump_id)
-    if not pump:
+    if not await async_pump_service.pump_exists(db, pump_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Pump not found"
         )
     
     # Get available slots
-    available_slots = booking_service.get_available_slots(db, pump_id, slot_date)
+    available_slots = await async_booking_service.get_available_slots(db, pump_id, slot_date)
     
     # Convert time objects to strings for JSON serialization
     slot_strings = [slot.strftime("%H:%M") for slot in available_slots]
@@ -129,12 +170,18 @@ def get_available_slots(
     return slot_strings
 
 @router.post("/{booking_id}/confirm")
-def confirm_booking(
+async def confirm_booking(
     booking_id: UUID,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Confirm a booking"""
-    confirmed_booking = booking_service.confirm_booking(db, booking_id)
+    try:
+        confirmed_booking = await async_booking_service.confirm_booking(db, booking_id)
+    except SlotUnavailableError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Selected time slot is not available"
+        )
     if not confirmed_booking:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -144,12 +191,18 @@ def confirm_booking(
     return {"message": "Booking confirmed successfully", "booking": confirmed_booking}
 
 @router.post("/{booking_id}/complete")
-def complete_booking(
+async def complete_booking(
     booking_id: UUID,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Mark a booking as completed"""
-    completed_booking = booking_service.complete_booking(db, booking_id)
+    try:
+        completed_booking = await async_booking_service.complete_booking(db, booking_id)
+    except SlotUnavailableError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Selected time slot is not available"
+        )
     if not completed_booking:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,19 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from schemas.token import TokenCreate, Token, TokenUpdate, TokenScanCreate, TokenScan
-from services.token_service import token_service
-from services.booking_service import booking_service
-from db import get_db
+from services.token_service import async_token_service, token_service, TOKEN_SCAN_BATCH_LIMIT
+from services.booking_service import async_booking_service
+from db import get_async_db
 from uuid import UUID
+from datetime import datetime
+from typing import List, Literal, Optional
+from utils.token_signing import encode_public_key, token_signer
+import base64
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+QR_MEDIA_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+# A token's QR code never changes, so clients and CDNs may keep it for a day
+QR_CACHE_CONTROL = "public, max-age=86400, immutable"
+
+@router.get("/signing-key")
+async def get_token_signing_key():
+    """Get the public key pumps use to verify signed token QR codes offline"""
+    return {
+        "algorithm": "Ed25519",
+        "public_key": encode_public_key(token_signer.public_key)
+    }
+
 @router.get("/{token_id}", response_model=Token)
-def get_token(token_id: UUID, db: Session = Depends(get_db)):
+async def get_token(token_id: UUID, db: AsyncSession = Depends(get_async_db)):
     """Get a specific token by ID"""
-    token = token_service.get_token_by_id(db, token_id)
+    token = await async_token_service.get_token_by_id(db, token_id)
     if not token:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -21,10 +38,35 @@ def get_token(token_id: UUID, db: Session = Depends(get_db)):
         )
     return token
 
+@router.get("/{token_id}/qr")
+async def get_token_qr(
+    token_id: UUID,
+    format: Literal["png", "svg"] = Query(default="png", description="Image format"),
+    scale: int = Query(default=10, ge=1, le=40, description="Size of one QR module (pixels for PNG)"),
+    border: int = Query(default=4, ge=0, le=10, description="Quiet zone width in modules"),
+    if_none_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the QR code image for a token, rendered on demand and cached"""
+    token = await async_token_service.get_token_by_id(db, token_id)
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Token not found"
+        )
+    
+    etag = token_service.get_qr_etag(token, format, scale, border)
+    headers = {"ETag": etag, "Cache-Control": QR_CACHE_CONTROL}
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    image = await async_token_service.get_qr_image(token, format, scale, border)
+    return Response(content=image, media_type=QR_MEDIA_TYPES[format], headers=headers)
+
 @router.get("/booking/{booking_id}", response_model=Token)
-def get_token_by_booking(booking_id: UUID, db: Session = Depends(get_db)):
+async def get_token_by_booking(booking_id: UUID, db: AsyncSession = Depends(get_async_db)):
     """Get token for a specific booking"""
-    token = token_service.get_token_by_booking_id(db, booking_id)
+    token = await async_token_service.get_token_by_booking_id(db, booking_id)
     if not token:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -33,35 +75,38 @@ def get_token_by_booking(booking_id: UUID, db: Session = Depends(get_db)):
     return token
 
 @router.post("/generate/{booking_id}")
-def generate_token_for_booking(booking_id: UUID, db: Session = Depends(get_db)):
-    """Generate an e-token with QR code for a booking"""
+async def generate_token_for_booking(booking_id: UUID, db: AsyncSession = Depends(get_async_db)):
+    """Get the valid e-token of a booking with its QR code, generating one if needed"""
     # Verify booking exists
-    booking = booking_service.get_booking_by_id(db, booking_id)
+    booking = await async_booking_service.get_booking_by_id(db, booking_id)
     if not booking:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Booking not found"
         )
     
-    # Generate token
-    token, qr_image = token_service.generate_e_token(db, booking_id)
+    # Reuse the booking's current token, so a booking never has two valid tokens at once
+    token = await async_token_service.get_token_by_booking_id(db, booking_id)
+    if token is None or token.status != "valid" or token.expiry_time < datetime.utcnow():
+        token = await async_token_service.generate_e_token(db, booking_id, pump_id=booking.pump_id)
+    qr_png = await async_token_service.get_qr_image(token)
     
     return {
         "token": token,
-        "qr_code": qr_image
+        "qr_code": base64.b64encode(qr_png).decode()
     }
 
 @router.post("/validate/{token_code}")
-def validate_token(token_code: str, db: Session = Depends(get_db)):
+async def validate_token(token_code: str, db: AsyncSession = Depends(get_async_db)):
     """Validate a token by its code"""
-    result = token_service.validate_token(db, token_code)
+    result = await async_token_service.validate_token(db, token_code)
     return result
 
 @router.post("/use/{token_id}")
-def use_token(token_id: UUID, db: Session = Depends(get_db)):
+async def use_token(token_id: UUID, db: AsyncSession = Depends(get_async_db)):
     """Mark a token as used"""
     # Verify token exists
-    token = token_service.get_token_by_id(db, token_id)
+    token = await async_token_service.get_token_by_id(db, token_id)
     if not token:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -69,7 +114,7 @@ def use_token(token_id: UUID, db: Session = Depends(get_db)):
         )
     
     # Use token
-    used_token = token_service.use_token(db, token_id)
+    used_token = await async_token_service.use_token(db, token_id)
     
     return {
         "message": "Token marked as used",
@@ -77,11 +122,11 @@ def use_token(token_id: UUID, db: Session = Depends(get_db)):
     }
 
 @router.post("/scan")
-def scan_token(scan_data: TokenScanCreate, db: Session = Depends(get_db)):
+async def scan_token(scan_data: TokenScanCreate, db: AsyncSession = Depends(get_async_db)):
     """Record a token scan event"""
     # If token_id is provided, validate the token
     if scan_data.token_id:
-        token = token_service.get_token_by_id(db, scan_data.token_id)
+        token = await async_token_service.get_token_by_id(db, scan_data.token_id)
         if not token:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -89,17 +134,47 @@ def scan_token(scan_data: TokenScanCreate, db: Session = Depends(get_db)):
             )
     
     # Create scan record
-    scan_record = token_service.create_token_scan_record(db, scan_data)
+    scan_record = await async_token_service.create_token_scan_record(db, scan_data)
     
     return {
         "message": "Token scan recorded",
         "scan_record": scan_record
     }
 
+def check_scan_batch(scans: List[TokenScanCreate]):
+    if len(scans) > TOKEN_SCAN_BATCH_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {TOKEN_SCAN_BATCH_LIMIT} scans can be uploaded at once"
+        )
+
+@router.post("/scans/batch")
+async def record_scans(scans: List[TokenScanCreate], db: AsyncSession = Depends(get_async_db)):
+    """Record a batch of token scan events, with a result per scan"""
+    check_scan_batch(scans)
+    results = await async_token_service.record_scans(db, scans)
+    return {
+        "recorded": sum(1 for result in results if result["status"] != "unknown_token"),
+        "results": results
+    }
+
+@router.post("/scans/sync")
+async def sync_offline_scans(scans: List[TokenScanCreate], db: AsyncSession = Depends(get_async_db)):
+    """Upload scans that a pump verified offline, completing the bookings of accepted tokens"""
+    check_scan_batch(scans)
+    results = await async_token_service.sync_offline_scans(db, scans)
+    return {
+        "synced": sum(1 for result in results if result["status"] != "unknown_token"),
+        "completed": sum(1 for result in results if result["status"] == "completed"),
+        "conflict": sum(1 for result in results if result["status"] == "conflict"),
+        "rejected": sum(1 for result in results if result["status"] == "rejected"),
+        "results": results
+    }
+
 @router.post("/scan-and-complete", response_model=dict)
-def scan_token_and_complete_booking(token_code: str, db: Session = Depends(get_db)):
+async def scan_token_and_complete_booking(token_code: str, db: AsyncSession = Depends(get_async_db)):
     """Scan a token by code and mark the associated booking as completed"""
-    result = token_service.scan_token_and_complete_booking(db, token_code)
+    result = await async_token_service.scan_token_and_complete_booking(db, token_code)
     if not result["success"]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
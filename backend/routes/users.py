@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from schemas.user import UserCreate, User, UserLogin, Token, UserProfile
-from services.user_service import user_service
+from services.user_service import user_service, async_user_service
 from utils.security import create_access_token, verify_password
-from db import get_db
+from db import get_db, get_async_db
 from datetime import timedelta
 import logging
 
@@ -11,10 +12,10 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 @router.post("/register", response_model=User)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user"""
     # Check if user already exists by email
-    db_user = user_service.get_user_by_email(db, email=user.email)
+    db_user = await async_user_service.get_user_by_email(db, email=user.email)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -23,7 +24,7 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
     
     # Check if user already exists by phone
     if user.phone:
-        db_user = user_service.get_user_by_phone(db, phone=user.phone)
+        db_user = await async_user_service.get_user_by_phone(db, phone=user.phone)
         if db_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -31,14 +32,14 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
             )
     
     # Create new user
-    new_user = user_service.create_user(db, user)
+    new_user = await async_user_service.create_user(db, user)
     logger.info(f"User registered: {user.email or user.phone}")
     return new_user
 
 @router.post("/login", response_model=Token)
-def login_user(user_credentials: UserLogin, db: Session = Depends(get_db)):
+async def login_user(user_credentials: UserLogin, db: AsyncSession = Depends(get_async_db)):
     """Authenticate user and return access token"""
-    user = user_service.authenticate_user(
+    user = await async_user_service.authenticate_user(
         db, 
         email=user_credentials.email, 
         password=user_credentials.password,
@@ -65,17 +66,17 @@ def login_user(user_credentials: UserLogin, db: Session = Depends(get_db)):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/profile", response_model=User)
-def get_user_profile(current_user: User = Depends(user_service.get_current_user)):
+async def get_user_profile(current_user: User = Depends(async_user_service.get_current_user)):
     """Get current user profile"""
     return current_user
 @router.put("/profile", response_model=User)
-def update_user_profile(
+async def update_user_profile(
     user_update: UserCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(user_service.get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(async_user_service.get_current_user)
 ):
     """Update current user profile"""
-    updated_user = user_service.update_user(db, current_user.id, user_update)
+    updated_user = await async_user_service.update_user(db, current_user.id, user_update)
     if not updated_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -87,10 +88,10 @@ def update_user_profile(
 
 
 @router.get("/search", response_model=list[User])
-def search_users(
+async def search_users(
     query: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(user_service.get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(async_user_service.get_current_user)
 ):
     """Search users by email or full name (super admin only)"""
     # Check if user is super admin
@@ -101,7 +102,7 @@ def search_users(
         )
     
     # Search users by email or full name
-    users = user_service.search_users(db, query)
+    users = await async_user_service.search_users(db, query)
     return users
 
 
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import date, time, datetime
 from decimal import Decimal
 from uuid import UUID
@@ -33,4 +33,9 @@ class BookingInDBBase(BookingBase):
         from_attributes = True
 
 class Booking(BookingInDBBase):
-    pass
\ No newline at end of file
+    pass
+
+class SlotAvailabilityMatrix(BaseModel):
+    slots: List[str]
+    dates: List[date]
+    availability: Dict[str, List[List[int]]]
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from datetime import datetime
 from decimal import Decimal
 from uuid import UUID
@@ -36,6 +36,15 @@ class Pump(PumpInDBBase):
 
 class PumpWithDistance(Pump):
     distance: Optional[float] = None
+
+class GeoPoint(BaseModel):
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+
+class NearbyPumpsBatchRequest(BaseModel):
+    locations: List[GeoPoint] = Field(..., max_length=500)
+    max_distance: float = Field(default=25.0, ge=0.1, le=100)
+
 class PumpAdminBase(BaseModel):
     user_id: UUID
     pump_id: UUID
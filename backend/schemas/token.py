@@ -29,6 +29,17 @@ class TokenInDBBase(TokenBase):
 class Token(TokenInDBBase):
     pass
 
+class TokenState(BaseModel):
+    """Snapshot of a token and its booking, cached for pump-side validation"""
+    id: UUID
+    token_code: str
+    booking_id: UUID
+    pump_id: Optional[UUID] = None
+    status: str
+    expiry_time: datetime
+    booking_status: Optional[str] = None
+    confirmation_status: Optional[str] = None
+
 class TokenScanBase(BaseModel):
     token_id: Optional[UUID] = None
     pump_id: Optional[UUID] = None
@@ -38,7 +49,8 @@ class TokenScanBase(BaseModel):
     token_code: Optional[str] = None
 
 class TokenScanCreate(TokenScanBase):
-    pass
+    # Signed QR payload read by an offline verifier, checked again when the scan is synced
+    qr_payload: Optional[str] = None
 
 class TokenScanInDBBase(TokenScanBase):
     id: UUID
@@ -1,15 +1,32 @@
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from models.booking import Booking
 from models.pump import Pump
+from services.slot_capacity_service import slot_capacity_service, SlotUnavailableError
 from schemas.booking import BookingCreate, BookingUpdate
 from uuid import UUID
-from typing import List, Optional
+from typing import List, Optional, Sequence
 from datetime import date, time, datetime, timedelta
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Hourly booking slots from 6 AM to 6 PM
+SLOT_TIMES = [time(hour=h) for h in range(6, 18)]
+
+# Bookings in these states no longer hold their slot
+RELEASED_BOOKING_STATUSES = ("cancelled", "expired")
+
+# Booking fields copied into cached token states
+TOKEN_STATE_FIELDS = {"pump_id", "booking_status", "confirmation_status"}
+
 class BookingService:
+    def _refresh_token_states(self, db: Session, booking_id: UUID):
+        from models.token import Token
+        from services.token_service import token_service
+        
+        token_service.refresh_token_states(db, Token.booking_id == str(booking_id))
+    
     def get_booking_by_id(self, db: Session, booking_id: UUID) -> Booking:
         # Convert UUID to string for SQLite compatibility
         booking_id_str = str(booking_id)
@@ -29,7 +46,13 @@ class BookingService:
             Booking.slot_date == slot_date
         ).all()
     
-    def create_booking(self, db: Session, booking: BookingCreate) -> Booking:
+    def create_booking(self, db: Session, booking: BookingCreate, capacity: Optional[int] = None) -> Booking:
+        """
+        Create a booking.
+        
+        When ``capacity`` is given the slot place is reserved atomically in the same
+        transaction as the insert, and SlotUnavailableError is raised if the slot is full.
+        """
         # Convert UUID objects to strings for SQLite compatibility
         booking_dict = booking.dict()
         if 'user_id' in booking_dict and hasattr(booking_dict['user_id'], 'hex'):
@@ -38,6 +61,17 @@ class BookingService:
             booking_dict['pump_id'] = str(booking_dict['pump_id'])
         
         db_booking = Booking(**booking_dict)
+        if db_booking.booking_status not in RELEASED_BOOKING_STATUSES:
+            if capacity is None:
+                slot_capacity_service.increment(db, db_booking.pump_id, db_booking.slot_date, db_booking.slot_time)
+            else:
+                try:
+                    slot_capacity_service.reserve(
+                        db, db_booking.pump_id, db_booking.slot_date, db_booking.slot_time, capacity
+                    )
+                except SlotUnavailableError:
+                    db.rollback()
+                    raise
         db.add(db_booking)
         db.commit()
         db.refresh(db_booking)
@@ -45,17 +79,41 @@ class BookingService:
         return db_booking
     
     def update_booking(self, db: Session, booking_id: UUID, booking_update: BookingUpdate) -> Booking:
+        """
+        Update a booking.
+        
+        A cancelled or expired booking that takes its slot again reserves it
+        like create_booking does, and SlotUnavailableError is raised if the slot is full.
+        """
         db_booking = self.get_booking_by_id(db, booking_id)
         if not db_booking:
             return None
             
+        held_slot = db_booking.booking_status not in RELEASED_BOOKING_STATUSES
         update_data = booking_update.dict(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_booking, key, value)
+        
+        # Keep the slot counter in step when a booking releases or re-takes its slot
+        holds_slot = db_booking.booking_status not in RELEASED_BOOKING_STATUSES
+        if held_slot and not holds_slot:
+            slot_capacity_service.decrement(db, db_booking.pump_id, db_booking.slot_date, db_booking.slot_time)
+        elif holds_slot and not held_slot:
+            pump = db.query(Pump).filter(Pump.id == str(db_booking.pump_id)).first()
+            capacity = slot_capacity_service.get_slot_capacity(pump) if pump else 0
+            try:
+                slot_capacity_service.reserve(
+                    db, db_booking.pump_id, db_booking.slot_date, db_booking.slot_time, capacity
+                )
+            except SlotUnavailableError:
+                db.rollback()
+                raise
             
         db_booking.updated_at = datetime.utcnow()
         db.commit()
         db.refresh(db_booking)
+        if TOKEN_STATE_FIELDS.intersection(update_data):
+            self._refresh_token_states(db, db_booking.id)
         logger.info(f"Updated booking with id: {booking_id}")
         return db_booking
     
@@ -74,36 +132,116 @@ class BookingService:
         if not db_booking:
             return False
         
+        if db_booking.booking_status not in RELEASED_BOOKING_STATUSES:
+            slot_capacity_service.decrement(db, db_booking.pump_id, db_booking.slot_date, db_booking.slot_time)
         db.delete(db_booking)
         db.commit()
+        self._refresh_token_states(db, booking_id)
         logger.info(f"Deleted booking with id: {booking_id}")
         return True
     
-    def get_available_slots(self, db: Session, pump_id: UUID, slot_date: date) -> List[time]:
+    def get_availability_matrix(self, db: Session, pump_ids: Sequence[UUID], from_date: date,
+                                to_date: date) -> dict:
         """
-        Get available time slots for a pump on a specific date.
-        This is a simplified implementation - in production, you'd want more sophisticated slot management.
+        Build a compact pump x date x slot availability matrix.
+        
+        Returns:
+            dict: ``slots`` and ``dates`` axis labels plus ``availability``, which maps each
+            pump id to one row per date holding the number of free places per slot.
         """
-        # Get existing bookings for the pump on the specified date
-        existing_bookings = self.get_bookings_by_date(db, pump_id, slot_date)
+        pumps = db.query(Pump).filter(Pump.id.in_([str(pump_id) for pump_id in pump_ids])).all()
+        capacities = {str(pump.id): slot_capacity_service.get_slot_capacity(pump) for pump in pumps}
+        counters = slot_capacity_service.get_counters(db, pump_ids, from_date, to_date)
+        dates = [from_date + timedelta(days=i) for i in range((to_date - from_date).days + 1)]
         
-        # For demonstration, we'll create 24 hourly slots from 6 AM to 6 PM
-        all_slots = [time(hour=h) for h in range(6, 18)]
+        availability = {}
+        for pump_id in pump_ids:
+            pump_key = str(pump_id)
+            capacity = capacities.get(pump_key, 0)
+            availability[pump_key] = [
+                [max(capacity - counters.get((pump_key, slot_date, slot_time), 0), 0) for slot_time in SLOT_TIMES]
+                for slot_date in dates
+            ]
         
-        # Filter out booked slots
-        booked_times = {booking.slot_time for booking in existing_bookings}
-        available_slots = [slot for slot in all_slots if slot not in booked_times]
+        return {
+            "slots": [slot_time.strftime("%H:%M") for slot_time in SLOT_TIMES],
+            "dates": dates,
+            "availability": availability
+        }
+    
+    def get_available_slots(self, db: Session, pump_id: UUID, slot_date: date) -> List[time]:
+        """Get the time slots for a pump on a specific date that still have free places"""
+        matrix = self.get_availability_matrix(db, [pump_id], slot_date, slot_date)
+        free_places = matrix["availability"][str(pump_id)][0]
         
-        return available_slots
+        return [slot for slot, free in zip(SLOT_TIMES, free_places) if free > 0]
     
-    def is_slot_available(self, db: Session, pump_id: UUID, slot_date: date, slot_time: time) -> bool:
-        """Check if a specific time slot is available"""
-        existing_booking = db.query(Booking).filter(
-            Booking.pump_id == pump_id,
-            Booking.slot_date == slot_date,
-            Booking.slot_time == slot_time
-        ).first()
+    def is_slot_available(self, db: Session, pump_id: UUID, slot_date: date, slot_time: time,
+                          capacity: Optional[int] = None) -> bool:
+        """
+        Check if a specific time slot still has a free place.
         
-        return existing_booking is None
+        Pass ``capacity`` when the pump is already loaded to make this a single counter read.
+        """
+        if capacity is None:
+            pump = db.query(Pump).filter(Pump.id == str(pump_id)).first()
+            if not pump:
+                return False
+            capacity = slot_capacity_service.get_slot_capacity(pump)
+        
+        return slot_capacity_service.get_booked_count(db, pump_id, slot_date, slot_time) < capacity
+
+booking_service = BookingService()
+
+
+class AsyncBookingService:
+    """
+    Async version of BookingService for ``async def`` routes.
+    
+    Each call runs the BookingService implementation on the AsyncSession's
+    connection through ``run_sync``, so database IO awaits the async driver
+    while the booking rules stay in one place.
+    """
+    
+    async def get_booking_by_id(self, db: AsyncSession, booking_id: UUID) -> Booking:
+        return await db.run_sync(booking_service.get_booking_by_id, booking_id)
+    
+    async def get_bookings_by_user(self, db: AsyncSession, user_id: UUID) -> List[Booking]:
+        return await db.run_sync(booking_service.get_bookings_by_user, user_id)
+    
+    async def get_bookings_by_pump(self, db: AsyncSession, pump_id: UUID) -> List[Booking]:
+        return await db.run_sync(booking_service.get_bookings_by_pump, pump_id)
+    
+    async def get_bookings_by_date(self, db: AsyncSession, pump_id: UUID, slot_date: date) -> List[Booking]:
+        return await db.run_sync(booking_service.get_bookings_by_date, pump_id, slot_date)
+    
+    async def create_booking(self, db: AsyncSession, booking: BookingCreate, capacity: Optional[int] = None) -> Booking:
+        return await db.run_sync(booking_service.create_booking, booking, capacity)
+    
+    async def update_booking(self, db: AsyncSession, booking_id: UUID, booking_update: BookingUpdate) -> Booking:
+        return await db.run_sync(booking_service.update_booking, booking_id, booking_update)
+    
+    async def cancel_booking(self, db: AsyncSession, booking_id: UUID) -> Booking:
+        return await db.run_sync(booking_service.cancel_booking, booking_id)
+    
+    async def confirm_booking(self, db: AsyncSession, booking_id: UUID) -> Booking:
+        return await db.run_sync(booking_service.confirm_booking, booking_id)
+    
+    async def complete_booking(self, db: AsyncSession, booking_id: UUID) -> Booking:
+        return await db.run_sync(booking_service.complete_booking, booking_id)
+    
+    async def delete_booking(self, db: AsyncSession, booking_id: UUID) -> bool:
+        return await db.run_sync(booking_service.delete_booking, booking_id)
+    
+    async def get_availability_matrix(self, db: AsyncSession, pump_ids: Sequence[UUID], from_date: date,
+                                      to_date: date) -> dict:
+        return await db.run_sync(booking_service.get_availability_matrix, pump_ids, from_date, to_date)
+    
+    async def get_available_slots(self, db: AsyncSession, pump_id: UUID, slot_date: date) -> List[time]:
+        return await db.run_sync(booking_service.get_available_slots, pump_id, slot_date)
+    
+    async def is_slot_available(self, db: AsyncSession, pump_id: UUID, slot_date: date, slot_time: time,
+                                capacity: Optional[int] = None) -> bool:
+        return await db.run_sync(booking_service.is_slot_available, pump_id, slot_date, slot_time, capacity)
 
-booking_service = BookingService()
\ No newline at end of file
+async_booking_service = AsyncBookingService()
@@ -0,0 +1,216 @@
+from threading import Event, Lock, Thread
+from typing import Callable, NamedTuple, Optional, Tuple
+from uuid import UUID
+import logging
+import os
+import queue
+import time
+from dotenv import load_dotenv
+from utils.cache import TTLCache, MISSING
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Token expiry bounds, in minutes. Tokens get the base expiry when no signals are known.
+TOKEN_BASE_EXPIRY_MINUTES = int(os.getenv("TOKEN_BASE_EXPIRY_MINUTES", "20"))
+TOKEN_MIN_EXPIRY_MINUTES = int(os.getenv("TOKEN_MIN_EXPIRY_MINUTES", "15"))
+TOKEN_MAX_EXPIRY_MINUTES = int(os.getenv("TOKEN_MAX_EXPIRY_MINUTES", "60"))
+
+# Signals older than EXPIRY_SIGNAL_REFRESH_SECONDS are refreshed in the background
+# and are no longer used once they are EXPIRY_SIGNAL_TTL_SECONDS old
+EXPIRY_SIGNAL_REFRESH_SECONDS = float(os.getenv("EXPIRY_SIGNAL_REFRESH_SECONDS", "600"))
+EXPIRY_SIGNAL_TTL_SECONDS = float(os.getenv("EXPIRY_SIGNAL_TTL_SECONDS", "1800"))
+EXPIRY_SIGNAL_CACHE_SIZE = int(os.getenv("EXPIRY_SIGNAL_CACHE_SIZE", "5000"))
+
+# Most pumps refreshed per second, which bounds calls to the paid external APIs
+EXPIRY_SIGNAL_REFRESH_RATE = float(os.getenv("EXPIRY_SIGNAL_REFRESH_RATE", "2"))
+
+# Travel time in traffic is measured on a reference trip of about 2 km north of the pump
+TRAFFIC_PROBE_OFFSET_DEGREES = 0.018
+MAX_TRAFFIC_FACTOR = 2.0
+
+# Extra minutes for weather that slows drivers down, by OpenWeatherMap description keyword
+WEATHER_EXTRA_MINUTES = (
+    ("thunderstorm", 15),
+    ("snow", 15),
+    ("rain", 10),
+    ("drizzle", 5),
+    ("fog", 5),
+    ("mist", 5),
+    ("haze", 5),
+)
+
+# Queue a demand forecast refresh for a pump when its signals move it to other forecast conditions
+FORECAST_REFRESH_ON_SIGNAL_CHANGE = os.getenv("FORECAST_REFRESH_ON_SIGNAL_CHANGE", "true").lower() in ("1", "true", "yes")
+
+# Demand model weather categories, by OpenWeatherMap description keyword; anything else is clear
+FORECAST_WEATHER_KEYWORDS = (
+    ("thunderstorm", "rainy"),
+    ("rain", "rainy"),
+    ("drizzle", "rainy"),
+    ("snow", "rainy"),
+    ("cloud", "cloudy"),
+    ("fog", "cloudy"),
+    ("mist", "cloudy"),
+    ("haze", "cloudy"),
+)
+
+# Demand model traffic categories, by lowest traffic factor
+FORECAST_TRAFFIC_LEVELS = ((1.5, "high"), (1.2, "medium"))
+
+# Conditions the hourly forecast refresh covers, and the prediction endpoints' default
+DEFAULT_FORECAST_CONDITION = ("clear", "low")
+
+class PumpSignals(NamedTuple):
+    traffic_factor: float       # travel time in traffic / free flow travel time
+    weather: Optional[str]      # OpenWeatherMap description
+    fetched_at: float           # time.monotonic() of the fetch
+
+def fetch_pump_signals(latitude: float, longitude: float) -> PumpSignals:
+    """Fetch the traffic and weather signals for a pump location from the external APIs"""
+    from utils.external_apis import external_api_service
+
+    traffic_factor = 1.0
+    trip = external_api_service.get_distance_and_duration(
+        f"{latitude},{longitude}",
+        f"{latitude + TRAFFIC_PROBE_OFFSET_DEGREES},{longitude}",
+        departure_time="now"
+    )
+    if trip and trip.get("duration") and trip.get("duration_in_traffic"):
+        traffic_factor = trip["duration_in_traffic"] / trip["duration"]
+
+    weather = external_api_service.get_weather_data(latitude, longitude)
+    return PumpSignals(
+        traffic_factor=traffic_factor,
+        weather=weather["description"] if weather else None,
+        fetched_at=time.monotonic()
+    )
+
+def forecast_condition(signals: PumpSignals) -> Tuple[str, str]:
+    """The demand model's (weather, traffic) categories for a pump's signals"""
+    description = (signals.weather or "").lower()
+    weather = next((category for keyword, category in FORECAST_WEATHER_KEYWORDS if keyword in description), "clear")
+    traffic = next((level for factor, level in FORECAST_TRAFFIC_LEVELS if signals.traffic_factor >= factor), "low")
+    return weather, traffic
+
+def enqueue_forecast_refresh(pump_id: str, condition: Tuple[str, str]):
+    """Queue a demand forecast refresh of one pump for the conditions it now sees"""
+    from tasks.reminder_tasks import refresh_demand_forecast
+
+    refresh_demand_forecast.delay(pump_ids=[pump_id], conditions=[list(condition)])
+
+class ExpiryPolicy:
+    """
+    Computes token expiry from cached per-pump traffic and weather signals.
+
+    Computing an expiry only reads memory. Missing or ageing signals are queued
+    for a background thread that fetches them at no more than ``refresh_rate``
+    pumps per second, so booking requests never wait on the external APIs.
+
+    When a refresh moves a pump into other forecast conditions,
+    ``on_condition_change`` is called with the pump id and the new
+    (weather, traffic) condition.
+    """
+
+    def __init__(self, fetch_signals: Callable[[float, float], PumpSignals] = fetch_pump_signals,
+                 base_minutes: int = TOKEN_BASE_EXPIRY_MINUTES, refresh_rate: float = EXPIRY_SIGNAL_REFRESH_RATE,
+                 refresh_after_seconds: float = EXPIRY_SIGNAL_REFRESH_SECONDS,
+                 on_condition_change: Optional[Callable[[str, Tuple[str, str]], None]] = None):
+        self.fetch_signals = fetch_signals
+        self.on_condition_change = on_condition_change
+        self.base_minutes = base_minutes
+        self.refresh_rate = refresh_rate
+        self.refresh_after_seconds = refresh_after_seconds
+        self.signals = TTLCache(max_size=EXPIRY_SIGNAL_CACHE_SIZE, ttl_seconds=EXPIRY_SIGNAL_TTL_SECONDS)
+        self._queue: "queue.Queue[tuple[str, float, float]]" = queue.Queue()
+        self._queued = set()
+        self._lock = Lock()
+        self._stopped = Event()
+        self._thread: Optional[Thread] = None
+
+    def expiry_minutes_for(self, signals: PumpSignals) -> int:
+        """Token expiry in minutes for a set of signals"""
+        minutes = self.base_minutes * min(max(signals.traffic_factor, 1.0), MAX_TRAFFIC_FACTOR)
+        description = (signals.weather or "").lower()
+        for keyword, extra_minutes in WEATHER_EXTRA_MINUTES:
+            if keyword in description:
+                minutes += extra_minutes
+                break
+        return int(min(max(round(minutes), TOKEN_MIN_EXPIRY_MINUTES), TOKEN_MAX_EXPIRY_MINUTES))
+
+    def get_expiry_minutes(self, pump_id: UUID, latitude: Optional[float], longitude: Optional[float]) -> int:
+        """
+        Token expiry in minutes for a pump, from its cached signals.
+
+        Never blocks on the network: without fresh signals the base expiry is
+        used and a background refresh is requested.
+        """
+        if pump_id is None or latitude is None or longitude is None:
+            return self.base_minutes
+
+        signals = self.signals.get(str(pump_id))
+        if signals is MISSING or time.monotonic() - signals.fetched_at > self.refresh_after_seconds:
+            self.request_refresh(pump_id, latitude, longitude)
+        if signals is MISSING:
+            return self.base_minutes
+        return self.expiry_minutes_for(signals)
+
+    def request_refresh(self, pump_id: UUID, latitude: float, longitude: float):
+        """Queue a pump's signals for refreshing unless they are already queued"""
+        key = str(pump_id)
+        with self._lock:
+            if key in self._queued or self._stopped.is_set():
+                return
+            self._queued.add(key)
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name="expiry-signals", daemon=True)
+                self._thread.start()
+        self._queue.put((key, float(latitude), float(longitude)))
+
+    def refresh(self, pump_id: UUID, latitude: float, longitude: float) -> PumpSignals:
+        """Fetch and cache a pump's signals now"""
+        previous = self.signals.get(str(pump_id))
+        signals = self.fetch_signals(latitude, longitude)
+        self.signals.set(str(pump_id), signals)
+
+        # Unknown signals count as the default conditions, which are always forecast
+        condition = forecast_condition(signals)
+        previous_condition = DEFAULT_FORECAST_CONDITION if previous is MISSING else forecast_condition(previous)
+        if self.on_condition_change is not None and condition != previous_condition:
+            try:
+                self.on_condition_change(str(pump_id), condition)
+            except Exception as e:
+                logger.warning(f"Could not queue a forecast refresh for pump {pump_id}: {str(e)}")
+        return signals
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                key, latitude, longitude = self._queue.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            try:
+                self.refresh(key, latitude, longitude)
+            except Exception as e:
+                logger.error(f"Error refreshing expiry signals for pump {key}: {str(e)}")
+            finally:
+                with self._lock:
+                    self._queued.discard(key)
+
+            # Rate limit calls to the external APIs
+            if self.refresh_rate > 0:
+                self._stopped.wait(1 / self.refresh_rate)
+
+    def shutdown(self):
+        self._stopped.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=2)
+
+
+expiry_policy = ExpiryPolicy(
+    on_condition_change=enqueue_forecast_refresh if FORECAST_REFRESH_ON_SIGNAL_CHANGE else None
+)
@@ -0,0 +1,228 @@
+from sqlalchemy import func, insert, tuple_
+from sqlalchemy.orm import Session
+from models.demand_forecast import DemandForecast
+from models.pump import Pump
+from ai_models.demand_predictor import demand_predictor
+from utils.cache import TTLCache, MISSING
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+import logging
+import numpy as np
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Days ahead, starting today, that forecasts are precomputed for
+FORECAST_DAYS = int(os.getenv("FORECAST_DAYS", "14"))
+
+# Weather and traffic combinations forecast for every slot, as "weather:traffic" pairs.
+# The first is what the prediction endpoints use by default.
+FORECAST_CONDITIONS = [
+    tuple(pair.split(":", 1)) for pair in os.getenv("FORECAST_CONDITIONS", "clear:low").split(",") if ":" in pair
+]
+
+# Pumps forecast per model call and per committed batch of rows
+FORECAST_PUMP_BATCH_SIZE = int(os.getenv("FORECAST_PUMP_BATCH_SIZE", "50"))
+
+# Seconds a worker keeps a pump's forecast for a date before re-reading the table
+FORECAST_CACHE_TTL_SECONDS = float(os.getenv("FORECAST_CACHE_TTL_SECONDS", "300"))
+FORECAST_CACHE_SIZE = int(os.getenv("FORECAST_CACHE_SIZE", "20000"))
+
+FORECAST_HOURS = list(range(24))
+
+class ForecastService:
+    """
+    Precomputed demand forecasts per pump, date, hour, weather and traffic.
+    
+    A refresh job scores every slot of the next FORECAST_DAYS days in batches
+    and stores the results in the ``demand_forecasts`` table. Workers keep the
+    rows of each (pump, date) they serve in memory, so a forecast is a dict
+    lookup. Rows made by a model version other than the one being served, and
+    slots that were never forecast, fall back to live inference.
+    """
+    
+    def __init__(self, predictor=demand_predictor):
+        self.predictor = predictor
+        # (pump_id, slot_date) -> {(hour, weather, traffic): (demand, model_version)}
+        self.cube = TTLCache(max_size=FORECAST_CACHE_SIZE, ttl_seconds=FORECAST_CACHE_TTL_SECONDS)
+    
+    def _load(self, db: Session, pump_id: str, slot_dates: Sequence[date]):
+        """Read the stored forecasts of a pump for the given dates into the cube"""
+        slots: Dict[date, Dict[Tuple[int, str, str], Tuple[float, Optional[str]]]] = {
+            slot_date: {} for slot_date in slot_dates
+        }
+        rows = db.query(
+            DemandForecast.slot_date,
+            DemandForecast.hour,
+            DemandForecast.weather,
+            DemandForecast.traffic,
+            DemandForecast.demand,
+            DemandForecast.model_version
+        ).filter(
+            DemandForecast.pump_id == pump_id,
+            DemandForecast.slot_date.in_(list(slot_dates))
+        ).all()
+        for slot_date, hour, weather, traffic, demand, model_version in rows:
+            slots[slot_date][(hour, weather, traffic)] = (demand, model_version)
+        
+        # Dates without forecasts are cached too, so misses do not query every time
+        for slot_date, forecasts in slots.items():
+            self.cube.set((pump_id, slot_date), forecasts)
+    
+    def predict(self, db: Session, pump_id: UUID, slot_dates: Sequence[date], hours: Sequence[int],
+                weather: str = "clear", traffic: str = "low") -> np.ndarray:
+        """
+        Demand for slots of a pump, from the forecast cube where possible.
+        
+        Args:
+            db (Session): Database session
+            pump_id (UUID): Pump ID
+            slot_dates (Sequence[date]): Date of each slot
+            hours (Sequence[int]): Hour of each slot
+            weather (str): Weather condition
+            traffic (str): Traffic condition
+        
+        Returns:
+            np.ndarray: Predicted demand of each slot
+        """
+        serving = self.predictor.current_model()
+        if serving is None:
+            # No model: live inference returns the default demand without any model call
+            return self.predictor.predict_batch([str(pump_id)] * len(hours), slot_dates, hours, weather, traffic)
+        
+        pump_id = str(pump_id)
+        missing_dates = [
+            slot_date for slot_date in dict.fromkeys(slot_dates) if self.cube.get((pump_id, slot_date)) is MISSING
+        ]
+        if missing_dates:
+            self._load(db, pump_id, missing_dates)
+        
+        demand = np.empty(len(hours), dtype=np.float64)
+        misses: List[int] = []
+        forecasts = {}
+        for i, (slot_date, hour) in enumerate(zip(slot_dates, hours)):
+            if slot_date not in forecasts:
+                forecasts[slot_date] = self.cube.get((pump_id, slot_date), {})
+            forecast = forecasts[slot_date].get((hour, weather, traffic))
+            if forecast is not None and forecast[1] == serving.version:
+                demand[i] = forecast[0]
+            else:
+                misses.append(i)
+        
+        if misses:
+            demand[misses] = self.predictor.predict_batch(
+                [pump_id] * len(misses),
+                [slot_dates[i] for i in misses],
+                [hours[i] for i in misses],
+                weather,
+                traffic
+            )
+        return demand
+    
+    def refresh(self, db: Session, pump_ids: Optional[Sequence[UUID]] = None, days: int = FORECAST_DAYS,
+                conditions: Optional[Sequence[Tuple[str, str]]] = None, start_date: Optional[date] = None,
+                force: bool = False) -> Dict[str, Any]:
+        """
+        Compute and store the forecasts that are missing or out of date.
+        
+        Only (pump, date) pairs without forecasts from the current model
+        version are scored, so the hourly run only adds the day that rolled
+        into the window, and a run after training recomputes everything.
+        
+        Args:
+            db (Session): Database session
+            pump_ids (Sequence[UUID]): Pumps to forecast, all pumps by default
+            days (int): Days ahead to forecast, starting at start_date
+            conditions (Sequence[Tuple[str, str]]): (weather, traffic) pairs to forecast
+            start_date (date): First date to forecast, today by default
+            force (bool): Recompute forecasts that are already up to date
+        
+        Returns:
+            Dict[str, Any]: Refresh report with pump, slot and row counts and timing
+        """
+        started = time.perf_counter()
+        serving = self.predictor.current_model()
+        if serving is None:
+            logger.warning("No demand model available, skipping forecast refresh")
+            return {"status": "skipped", "pumps": 0, "rows": 0}
+        
+        conditions = [tuple(condition) for condition in (conditions or FORECAST_CONDITIONS)]
+        start_date = start_date or date.today()
+        dates = [start_date + timedelta(days=i) for i in range(days)]
+        if pump_ids is None:
+            pump_ids = [pump_id for (pump_id,) in db.query(Pump.id).all()]
+            # Forecasts for past days are no longer read
+            db.query(DemandForecast).filter(DemandForecast.slot_date < start_date).delete(synchronize_session=False)
+        pump_ids = [str(pump_id) for pump_id in pump_ids]
+        
+        pairs = [(pump_id, slot_date) for pump_id in pump_ids for slot_date in dates]
+        if not force and pairs:
+            # A pair is current once every requested condition has a row from the served version
+            current = {
+                (str(pump_id), slot_date)
+                for pump_id, slot_date in db.query(DemandForecast.pump_id, DemandForecast.slot_date).filter(
+                    DemandForecast.pump_id.in_(pump_ids),
+                    DemandForecast.slot_date.in_(dates),
+                    DemandForecast.hour == FORECAST_HOURS[0],
+                    DemandForecast.model_version == serving.version,
+                    tuple_(DemandForecast.weather, DemandForecast.traffic).in_(conditions)
+                ).group_by(DemandForecast.pump_id, DemandForecast.slot_date).having(
+                    func.count() == len(conditions)
+                )
+            }
+            pairs = [pair for pair in pairs if pair not in current]
+        
+        generated_at = datetime.utcnow()
+        rows_written = 0
+        batch_size = FORECAST_PUMP_BATCH_SIZE * max(len(dates), 1)
+        
+        for offset in range(0, len(pairs), batch_size):
+            batch = pairs[offset:offset + batch_size]
+            slot_pumps = [pump_id for pump_id, _ in batch for _ in FORECAST_HOURS]
+            slot_dates = [slot_date for _, slot_date in batch for _ in FORECAST_HOURS]
+            hours = FORECAST_HOURS * len(batch)
+            
+            rows = []
+            for weather, traffic in conditions:
+                # One model call scores every slot in the batch
+                demand = self.predictor.predict_batch(slot_pumps, slot_dates, hours, weather, traffic)
+                rows.extend(
+                    {
+                        "pump_id": slot_pumps[i],
+                        "slot_date": slot_dates[i],
+                        "hour": hours[i],
+                        "weather": weather,
+                        "traffic": traffic,
+                        "demand": float(demand[i]),
+                        "model_version": serving.version,
+                        "generated_at": generated_at
+                    }
+                    for i in range(len(hours))
+                )
+            
+            db.query(DemandForecast).filter(
+                tuple_(DemandForecast.pump_id, DemandForecast.slot_date).in_(batch),
+                tuple_(DemandForecast.weather, DemandForecast.traffic).in_(conditions)
+            ).delete(synchronize_session=False)
+            db.execute(insert(DemandForecast), rows)
+            db.commit()
+            rows_written += len(rows)
+            
+            for pair in batch:
+                self.cube.delete(pair)
+        
+        db.commit()
+        report = {
+            "status": "refreshed",
+            "pumps": len(pump_ids),
+            "slots": len(pairs) * len(FORECAST_HOURS),
+            "rows": rows_written,
+            "model_version": serving.version,
+            "duration_seconds": round(time.perf_counter() - started, 3)
+        }
+        logger.info(f"Refreshed demand forecasts: {report}")
+        return report
+
+forecast_service = ForecastService()
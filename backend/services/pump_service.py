@@ -1,19 +1,71 @@
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from models.pump import Pump
 from models.pump_admin import PumpAdmin
-from schemas.pump import PumpCreate, PumpUpdate
-from typing import List, Optional
+from schemas.pump import PumpCreate, PumpUpdate, Pump as PumpSchema
+from utils.cache import TieredCache, MISSING
+from utils.geo_index import PumpGeoIndex
+from typing import Any, List, Optional, Tuple
 from uuid import UUID
 import logging
+import os
+import time
 
 logger = logging.getLogger(__name__)
 
+# How often the geo index is rebuilt from the database, in seconds
+GEO_INDEX_REFRESH_SECONDS = int(os.getenv("GEO_INDEX_REFRESH_SECONDS", "300"))
+
+# Pump catalog cache. Other workers see an update or delete within PUMP_CACHE_TTL_SECONDS.
+# Writes store the committed row (or a tombstone for a delete), so a lagging
+# read replica never refills the cache with the row as it was before the write.
+PUMP_CACHE_SIZE = int(os.getenv("PUMP_CACHE_SIZE", "5000"))
+PUMP_CACHE_TTL_SECONDS = float(os.getenv("PUMP_CACHE_TTL_SECONDS", "30"))
+PUMP_CACHE_SHARED_TTL_SECONDS = float(os.getenv("PUMP_CACHE_SHARED_TTL_SECONDS", "600"))
+
 class PumpService:
+    def __init__(self):
+        self.geo_index = PumpGeoIndex()
+        self._geo_index_loaded_at = None
+        self.pump_cache = TieredCache(
+            "pump",
+            max_size=PUMP_CACHE_SIZE,
+            local_ttl_seconds=PUMP_CACHE_TTL_SECONDS,
+            shared_ttl_seconds=PUMP_CACHE_SHARED_TTL_SECONDS,
+            serialize=lambda pump: pump.model_dump_json() if pump else "",
+            deserialize=lambda raw: PumpSchema.model_validate_json(raw) if raw else None
+        )
+    
     def get_pump_by_id(self, db: Session, pump_id: UUID) -> Pump:
         # Convert UUID to string for SQLite compatibility
         pump_id_str = str(pump_id)
         return db.query(Pump).filter(Pump.id == pump_id_str).first()
     
+    def get_cached_pump(self, db: Session, pump_id: UUID) -> Optional[PumpSchema]:
+        """
+        Get a pump snapshot from the catalog cache, loading it from the database on a miss.
+        
+        A deleted pump is cached as None. If a write stored a newer snapshot while
+        this one was loading (e.g. from a lagging replica), the newer one is kept.
+        """
+        pump_id_str = str(pump_id)
+        pump = self.pump_cache.get(pump_id_str)
+        if pump is not MISSING:
+            return pump
+        
+        db_pump = self.get_pump_by_id(db, pump_id_str)
+        if not db_pump:
+            return None
+        pump = PumpSchema.model_validate(db_pump)
+        current = self.pump_cache.get(pump_id_str)
+        if current is not MISSING and (current is None or current.updated_at >= pump.updated_at):
+            return current
+        self.pump_cache.set(pump_id_str, pump)
+        return pump
+    
+    def pump_exists(self, db: Session, pump_id: UUID) -> bool:
+        return self.get_cached_pump(db, pump_id) is not None
+    
     def get_pumps(self, db: Session, skip: int = 0, limit: int = 100) -> List[Pump]:
         return db.query(Pump).offset(skip).limit(limit).all()
     
@@ -25,6 +77,7 @@ class PumpService:
         db.add(db_pump)
         db.commit()
         db.refresh(db_pump)
+        self.geo_index.upsert(db_pump.id, db_pump.latitude, db_pump.longitude)
         logger.info(f"Created new pump: {pump.name}")
         return db_pump
     
@@ -39,6 +92,8 @@ class PumpService:
             
         db.commit()
         db.refresh(db_pump)
+        self.geo_index.upsert(db_pump.id, db_pump.latitude, db_pump.longitude)
+        self.pump_cache.set(str(db_pump.id), PumpSchema.model_validate(db_pump))
         logger.info(f"Updated pump with id: {pump_id}")
         return db_pump
     
@@ -47,8 +102,11 @@ class PumpService:
         if not db_pump:
             return False
             
+        db_pump_id = db_pump.id
         db.delete(db_pump)
         db.commit()
+        self.geo_index.remove(db_pump_id)
+        self.pump_cache.set(str(db_pump_id), None)
         logger.info(f"Deleted pump with id: {pump_id}")
         return True
     
@@ -80,70 +138,159 @@ class PumpService:
         logger.info(f"Assigned user {user_id} as admin for pump {pump_id}")
         return pump_admin
     
-    def get_nearby_pumps(self, db: Session, latitude: float, longitude: float, max_distance: float = 25.0) -> List[dict]:
-        """Get pumps within a specified distance from the given location"""
-        from math import radians, cos, sin, asin, sqrt
-        
-        def haversine_distance(lat1, lon1, lat2, lon2):
-            """Calculate the great circle distance between two points on earth"""
-            # Convert decimal degrees to radians
-            lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-            
-            # Haversine formula
-            dlat = lat2 - lat1
-            dlon = lon2 - lon1
-            a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-            c = 2 * asin(sqrt(a))
-            
-            # Radius of earth in kilometers
-            r = 6371
-            
-            return c * r
+    def _pump_to_dict(self, pump: Pump, distance: float) -> dict:
+        """Serialize a pump and its distance into the PumpWithDistance payload"""
+        return {
+            'id': str(pump.id),  # Convert UUID to string
+            'name': pump.name,
+            'address': pump.address,
+            'city': pump.city,
+            'latitude': float(pump.latitude) if pump.latitude else None,
+            'longitude': float(pump.longitude) if pump.longitude else None,
+            'total_capacity': pump.total_capacity,
+            'remaining_capacity': pump.remaining_capacity,
+            'walkin_lanes': pump.walkin_lanes,
+            'booked_lanes': pump.booked_lanes,
+            'rating': float(pump.rating) if pump.rating else None,
+            'is_open': pump.is_open,
+            'created_at': pump.created_at.isoformat() if pump.created_at else None,
+            'updated_at': pump.updated_at.isoformat() if pump.updated_at else None,
+            'distance': distance
+        }
+    
+    def _ensure_geo_index(self, db: Session) -> PumpGeoIndex:
+        """
+        Load the geo index from the database on first use and periodically afterwards.
         
-        try:
-            # Get all pumps with coordinates
-            all_pumps = db.query(Pump).filter(
+        Writes made through this service update the index immediately. The periodic
+        rebuild picks up pumps written by other worker processes.
+        """
+        now = time.monotonic()
+        if self._geo_index_loaded_at is None or now - self._geo_index_loaded_at >= GEO_INDEX_REFRESH_SECONDS:
+            rows = db.query(Pump.id, Pump.latitude, Pump.longitude).filter(
                 Pump.latitude.isnot(None),
                 Pump.longitude.isnot(None)
             ).all()
+            self.geo_index.rebuild(rows)
+            self._geo_index_loaded_at = now
+            logger.info(f"Loaded {len(self.geo_index)} pumps into the geo index")
+        return self.geo_index
+    
+    def _pumps_with_distance(self, db: Session, hits: List[Tuple[Any, float]]) -> List[dict]:
+        """Fetch the pumps for index hits and return them in hit order"""
+        if not hits:
+            return []
+        
+        pumps = db.query(Pump).filter(Pump.id.in_([pump_id for pump_id, _ in hits])).all()
+        pumps_by_id = {str(pump.id): pump for pump in pumps}
+        
+        results = []
+        for pump_id, distance in hits:
+            pump = pumps_by_id.get(str(pump_id))
+            if pump is not None:
+                results.append(self._pump_to_dict(pump, distance))
+        return results
+    
+    def get_nearby_pumps(self, db: Session, latitude: float, longitude: float, max_distance: float = 25.0) -> List[dict]:
+        """Get pumps within a specified distance from the given location"""
+        try:
+            hits = self._ensure_geo_index(db).query_radius(latitude, longitude, max_distance)
+            return self._pumps_with_distance(db, hits)
+        except Exception as e:
+            logger.error(f"Error in get_nearby_pumps: {str(e)}")
+            # Return empty list in case of error instead of throwing exception
+            return []
+    
+    def get_nearby_pumps_batch(self, db: Session, locations: List[Tuple[float, float]],
+                               max_distance: float = 25.0) -> List[List[dict]]:
+        """Get nearby pumps for many (latitude, longitude) locations with one index pass and one query"""
+        try:
+            hits_per_location = self._ensure_geo_index(db).query_radius_batch(locations, max_distance)
             
-            nearby_pumps_with_distance = []
-            for pump in all_pumps:
-                if pump.latitude is not None and pump.longitude is not None:
-                    distance = haversine_distance(
-                        latitude, 
-                        longitude, 
-                        float(pump.latitude), 
-                        float(pump.longitude)
-                    )
-                    if distance <= max_distance:
-                        # Convert pump to dictionary and add distance
-                        pump_dict = {
-                            'id': str(pump.id),  # Convert UUID to string
-                            'name': pump.name,
-                            'address': pump.address,
-                            'city': pump.city,
-                            'latitude': float(pump.latitude) if pump.latitude else None,
-                            'longitude': float(pump.longitude) if pump.longitude else None,
-                            'total_capacity': pump.total_capacity,
-                            'remaining_capacity': pump.remaining_capacity,
-                            'walkin_lanes': pump.walkin_lanes,
-                            'booked_lanes': pump.booked_lanes,
-                            'rating': float(pump.rating) if pump.rating else None,
-                            'is_open': pump.is_open,
-                            'created_at': pump.created_at.isoformat() if pump.created_at else None,
-                            'updated_at': pump.updated_at.isoformat() if pump.updated_at else None,
-                            'distance': distance  # Add distance to the dictionary
-                        }
-                        nearby_pumps_with_distance.append(pump_dict)
+            pump_ids = {str(pump_id): pump_id for hits in hits_per_location for pump_id, _ in hits}
+            if not pump_ids:
+                return [[] for _ in locations]
             
-            # Sort by distance
-            nearby_pumps_with_distance.sort(key=lambda x: x['distance'])
+            pumps = db.query(Pump).filter(Pump.id.in_(list(pump_ids.values()))).all()
+            pumps_by_id = {str(pump.id): pump for pump in pumps}
             
-            return nearby_pumps_with_distance
+            results = []
+            for hits in hits_per_location:
+                results.append([
+                    self._pump_to_dict(pumps_by_id[str(pump_id)], distance)
+                    for pump_id, distance in hits
+                    if str(pump_id) in pumps_by_id
+                ])
+            return results
         except Exception as e:
-            logger.error(f"Error in get_nearby_pumps: {str(e)}")
-            # Return empty list in case of error instead of throwing exception
+            logger.error(f"Error in get_nearby_pumps_batch: {str(e)}")
+            raise
+    
+    def get_nearest_pumps(self, db: Session, latitude: float, longitude: float, limit: int = 5,
+                          max_distance: Optional[float] = None) -> List[dict]:
+        """Get the closest pumps to the given location, sorted by distance"""
+        try:
+            hits = self._ensure_geo_index(db).query_nearest(latitude, longitude, limit, max_distance)
+            return self._pumps_with_distance(db, hits)
+        except Exception as e:
+            logger.error(f"Error in get_nearest_pumps: {str(e)}")
             return []
 
-pump_service = PumpService()
\ No newline at end of file
+pump_service = PumpService()
+
+
+class AsyncPumpService:
+    """
+    Async version of PumpService for ``async def`` routes.
+    
+    Each call runs the PumpService implementation on the AsyncSession's
+    connection through ``run_sync``. The geo index is shared with PumpService.
+    """
+    
+    async def get_pump_by_id(self, db: AsyncSession, pump_id: UUID) -> Pump:
+        return await db.run_sync(pump_service.get_pump_by_id, pump_id)
+    
+    async def get_cached_pump(self, db: AsyncSession, pump_id: UUID) -> Optional[PumpSchema]:
+        # Memory hits are answered without touching the database connection
+        pump = pump_service.pump_cache.local.get(str(pump_id))
+        if pump is not MISSING:
+            return pump
+        return await db.run_sync(pump_service.get_cached_pump, pump_id)
+    
+    async def pump_exists(self, db: AsyncSession, pump_id: UUID) -> bool:
+        return await self.get_cached_pump(db, pump_id) is not None
+    
+    async def get_pumps(self, db: AsyncSession, skip: int = 0, limit: int = 100) -> List[Pump]:
+        return await db.run_sync(pump_service.get_pumps, skip, limit)
+    
+    async def get_pumps_by_city(self, db: AsyncSession, city: str) -> List[Pump]:
+        return await db.run_sync(pump_service.get_pumps_by_city, city)
+    
+    async def create_pump(self, db: AsyncSession, pump: PumpCreate) -> Pump:
+        return await db.run_sync(pump_service.create_pump, pump)
+    
+    async def update_pump(self, db: AsyncSession, pump_id: UUID, pump_update: PumpUpdate) -> Pump:
+        return await db.run_sync(pump_service.update_pump, pump_id, pump_update)
+    
+    async def delete_pump(self, db: AsyncSession, pump_id: UUID) -> bool:
+        return await db.run_sync(pump_service.delete_pump, pump_id)
+    
+    async def get_pumps_for_admin(self, db: AsyncSession, user_id: UUID) -> List[Pump]:
+        return await db.run_sync(pump_service.get_pumps_for_admin, user_id)
+    
+    async def assign_admin_to_pump(self, db: AsyncSession, user_id: UUID, pump_id: UUID) -> PumpAdmin:
+        return await db.run_sync(pump_service.assign_admin_to_pump, user_id, pump_id)
+    
+    async def get_nearby_pumps(self, db: AsyncSession, latitude: float, longitude: float,
+                               max_distance: float = 25.0) -> List[dict]:
+        return await db.run_sync(pump_service.get_nearby_pumps, latitude, longitude, max_distance)
+    
+    async def get_nearby_pumps_batch(self, db: AsyncSession, locations: List[Tuple[float, float]],
+                                     max_distance: float = 25.0) -> List[List[dict]]:
+        return await db.run_sync(pump_service.get_nearby_pumps_batch, locations, max_distance)
+    
+    async def get_nearest_pumps(self, db: AsyncSession, latitude: float, longitude: float, limit: int = 5,
+                                max_distance: Optional[float] = None) -> List[dict]:
+        return await db.run_sync(pump_service.get_nearest_pumps, latitude, longitude, limit, max_distance)
+
+async_pump_service = AsyncPumpService()
@@ -0,0 +1,222 @@
+from sqlalchemy import bindparam, case, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models.booking import Booking
+from models.pump import Pump
+from models.slot_counter import SlotCounter
+from uuid import UUID
+from typing import Dict, Sequence, Tuple
+from datetime import date, time
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# How many vehicles one booked lane can serve in a single slot
+VEHICLES_PER_LANE_SLOT = int(os.getenv("VEHICLES_PER_LANE_SLOT", "4"))
+
+class SlotUnavailableError(Exception):
+    """Raised when a slot has no free place left to reserve"""
+
+class SlotCapacityService:
+    """
+    Per-slot booking counters.
+    
+    Each (pump, date, time) bucket holds up to ``booked_lanes x VEHICLES_PER_LANE_SLOT``
+    bookings. The number of bookings holding a bucket is kept in a ``slot_counters``
+    row that is adjusted in SQL alongside the booking write, so availability checks
+    read one counter instead of counting bookings.
+    """
+    
+    def get_slot_capacity(self, pump: Pump) -> int:
+        """Number of bookings a single slot at this pump can hold"""
+        return max(pump.booked_lanes or 0, 0) * VEHICLES_PER_LANE_SLOT
+    
+    def _bucket_filter(self, pump_id: UUID, slot_date: date, slot_time: time):
+        return (
+            SlotCounter.pump_id == str(pump_id),
+            SlotCounter.slot_date == slot_date,
+            SlotCounter.slot_time == slot_time
+        )
+    
+    def get_booked_count(self, db: Session, pump_id: UUID, slot_date: date, slot_time: time) -> int:
+        count = db.query(SlotCounter.booked_count).filter(
+            *self._bucket_filter(pump_id, slot_date, slot_time)
+        ).scalar()
+        return count or 0
+    
+    def get_remaining(self, db: Session, pump: Pump, slot_date: date, slot_time: time) -> int:
+        """Free places left in a slot"""
+        booked = self.get_booked_count(db, pump.id, slot_date, slot_time)
+        return max(self.get_slot_capacity(pump) - booked, 0)
+    
+    def get_counters(self, db: Session, pump_ids: Sequence[UUID], from_date: date,
+                     to_date: date) -> Dict[Tuple[str, date, time], int]:
+        """Booked counts keyed by (pump_id, slot_date, slot_time) for a set of pumps over a date range"""
+        if not pump_ids:
+            return {}
+        
+        rows = db.query(
+            SlotCounter.pump_id,
+            SlotCounter.slot_date,
+            SlotCounter.slot_time,
+            SlotCounter.booked_count
+        ).filter(
+            SlotCounter.pump_id.in_([str(pump_id) for pump_id in pump_ids]),
+            SlotCounter.slot_date >= from_date,
+            SlotCounter.slot_date <= to_date
+        ).all()
+        
+        return {(str(pump_id), slot_date, slot_time): count for pump_id, slot_date, slot_time, count in rows}
+    
+    def _ensure_counter(self, db: Session, pump_id: UUID, slot_date: date, slot_time: time):
+        """
+        Create the counter row for a slot if it does not exist yet.
+        
+        Uses insert-on-conflict-do-nothing against the unique bucket constraint, so
+        concurrent first bookings for a slot never fail on a duplicate counter.
+        """
+        values = {
+            "pump_id": str(pump_id),
+            "slot_date": slot_date,
+            "slot_time": slot_time,
+            "booked_count": 0
+        }
+        dialect = db.get_bind().dialect.name
+        
+        if dialect == "postgresql":
+            db.execute(postgresql.insert(SlotCounter).values(**values).on_conflict_do_nothing(
+                index_elements=["pump_id", "slot_date", "slot_time"]
+            ))
+        elif dialect == "sqlite":
+            db.execute(sqlite.insert(SlotCounter).values(**values).on_conflict_do_nothing(
+                index_elements=["pump_id", "slot_date", "slot_time"]
+            ))
+        elif not db.query(SlotCounter.id).filter(*self._bucket_filter(pump_id, slot_date, slot_time)).first():
+            try:
+                with db.begin_nested():
+                    db.add(SlotCounter(**values))
+            except IntegrityError:
+                pass
+    
+    def reserve(self, db: Session, pump_id: UUID, slot_date: date, slot_time: time, capacity: int):
+        """
+        Atomically take one place in a slot.
+        
+        The counter is bumped with a conditional ``UPDATE ... WHERE booked_count < capacity``,
+        so concurrent requests can never push a slot past its capacity and the loser of a
+        race finds out from the affected row count without a check-then-insert window.
+        Like increment, this does not commit.
+        
+        Raises:
+            SlotUnavailableError: If the slot is already full
+        """
+        self._ensure_counter(db, pump_id, slot_date, slot_time)
+        
+        updated = db.query(SlotCounter).filter(
+            *self._bucket_filter(pump_id, slot_date, slot_time),
+            SlotCounter.booked_count < capacity
+        ).update(
+            {SlotCounter.booked_count: SlotCounter.booked_count + 1},
+            synchronize_session=False
+        )
+        
+        if not updated:
+            raise SlotUnavailableError(f"Slot {slot_date} {slot_time} at pump {pump_id} is full")
+    
+    def increment(self, db: Session, pump_id: UUID, slot_date: date, slot_time: time):
+        """
+        Add one booking to a slot counter regardless of capacity.
+        
+        The change is flushed but not committed, so it lands in the same
+        transaction as the booking write that caused it.
+        """
+        self._ensure_counter(db, pump_id, slot_date, slot_time)
+        
+        db.query(SlotCounter).filter(
+            *self._bucket_filter(pump_id, slot_date, slot_time)
+        ).update(
+            {SlotCounter.booked_count: SlotCounter.booked_count + 1},
+            synchronize_session=False
+        )
+    
+    def decrement(self, db: Session, pump_id: UUID, slot_date: date, slot_time: time):
+        """Release one booking from a slot counter. Like increment, this does not commit."""
+        db.query(SlotCounter).filter(
+            *self._bucket_filter(pump_id, slot_date, slot_time),
+            SlotCounter.booked_count > 0
+        ).update(
+            {SlotCounter.booked_count: SlotCounter.booked_count - 1},
+            synchronize_session=False
+        )
+    
+    def release_many(self, db: Session, released: Dict[Tuple[str, date, time], int]):
+        """
+        Release several bookings from their slot counters with one executemany UPDATE.
+        
+        Args:
+            db (Session): Database session
+            released (Dict[Tuple[str, date, time], int]): Bookings released per
+                (pump_id, slot_date, slot_time) bucket
+        
+        Like increment, this does not commit.
+        """
+        if not released:
+            return
+        
+        counters = SlotCounter.__table__
+        count = bindparam("released_count")
+        db.connection().execute(
+            counters.update().where(
+                counters.c.pump_id == bindparam("bucket_pump_id"),
+                counters.c.slot_date == bindparam("bucket_slot_date"),
+                counters.c.slot_time == bindparam("bucket_slot_time")
+            ).values(
+                booked_count=case((counters.c.booked_count > count, counters.c.booked_count - count), else_=0)
+            ),
+            [
+                {
+                    "bucket_pump_id": str(pump_id),
+                    "bucket_slot_date": slot_date,
+                    "bucket_slot_time": slot_time,
+                    "released_count": released_count
+                }
+                for (pump_id, slot_date, slot_time), released_count in released.items()
+            ]
+        )
+    
+    def rebuild_counters(self, db: Session) -> int:
+        """
+        Recompute every slot counter from the bookings table.
+        
+        Used to backfill counters for bookings made before counters existed.
+        
+        Returns:
+            int: Number of counters written
+        """
+        from services.booking_service import RELEASED_BOOKING_STATUSES
+        
+        rows = db.query(
+            Booking.pump_id,
+            Booking.slot_date,
+            Booking.slot_time,
+            func.count(Booking.id)
+        ).filter(
+            Booking.booking_status.notin_(RELEASED_BOOKING_STATUSES)
+        ).group_by(
+            Booking.pump_id,
+            Booking.slot_date,
+            Booking.slot_time
+        ).all()
+        
+        db.query(SlotCounter).delete(synchronize_session=False)
+        db.add_all([
+            SlotCounter(pump_id=pump_id, slot_date=slot_date, slot_time=slot_time, booked_count=count)
+            for pump_id, slot_date, slot_time, count in rows
+        ])
+        db.commit()
+        logger.info(f"Rebuilt {len(rows)} slot counters from bookings")
+        return len(rows)
+
+slot_capacity_service = SlotCapacityService()
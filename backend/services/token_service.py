@@ -1,22 +1,67 @@
+from sqlalchemy import insert, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from models.booking import Booking
 from models.token import Token, TokenScan
-from schemas.token import TokenCreate, TokenUpdate, TokenScanCreate
-from utils.qr_generator import generate_qr_code, generate_token_code
+from schemas.token import TokenCreate, TokenUpdate, TokenScanCreate, TokenState
+from services.expiry_policy import expiry_policy
+from services.pump_service import pump_service
+from utils.cache import TieredCache, MISSING
+from utils.qr_generator import generate_token_code
+from utils.qr_renderer import qr_renderer
+from utils.token_signing import OFFLINE_SCAN_ACCEPTED, QR_PAYLOAD_PREFIX, token_signer
 from uuid import UUID
 from typing import List, Optional, Tuple
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from collections import Counter
+import hashlib
 import logging
+import os
+import time
 
 logger = logging.getLogger(__name__)
 
+# Attempts at creating a token before giving up on a token code collision
+TOKEN_CODE_ATTEMPTS = 3
+
+# Token state cache for pump-side validation. Only used and expired states are
+# cached, because they are final. A valid token can be used through another
+# worker at any time, so a token is only reported valid after reading the database.
+TOKEN_STATE_CACHE_SIZE = int(os.getenv("TOKEN_STATE_CACHE_SIZE", "20000"))
+TOKEN_STATE_FINAL_TTL_SECONDS = float(os.getenv("TOKEN_STATE_FINAL_TTL_SECONDS", "3600"))
+
+FINAL_TOKEN_STATUSES = ("used", "expired")
+
+# Tokens expired per UPDATE by the expiry sweeper
+TOKEN_EXPIRY_BATCH_SIZE = int(os.getenv("TOKEN_EXPIRY_BATCH_SIZE", "1000"))
+
+# Bookings that expire along with their token
+EXPIRABLE_BOOKING_STATUSES = ("active", "confirmed")
+
+# Most scans accepted by one bulk scan upload
+TOKEN_SCAN_BATCH_LIMIT = int(os.getenv("TOKEN_SCAN_BATCH_LIMIT", "1000"))
+
 class TokenService:
+    def __init__(self):
+        self.token_state_cache = TieredCache(
+            "token_state",
+            max_size=TOKEN_STATE_CACHE_SIZE,
+            local_ttl_seconds=TOKEN_STATE_FINAL_TTL_SECONDS,
+            shared_ttl_seconds=TOKEN_STATE_FINAL_TTL_SECONDS,
+            serialize=lambda state: state.model_dump_json(),
+            deserialize=TokenState.model_validate_json
+        )
+    
     def get_token_by_id(self, db: Session, token_id: UUID) -> Token:
-        return db.query(Token).filter(Token.id == token_id).first()
+        # Convert UUID to string for SQLite compatibility
+        return db.query(Token).filter(Token.id == str(token_id)).first()
     
     def get_token_by_booking_id(self, db: Session, booking_id: UUID) -> Token:
         # Convert UUID to string for SQLite compatibility
         booking_id_str = str(booking_id)
-        return db.query(Token).filter(Token.booking_id == booking_id_str).first()
+        # A booking gets a new token once its previous one is used or expired, so return the newest
+        return db.query(Token).filter(Token.booking_id == booking_id_str).order_by(Token.created_at.desc()).first()
     
     def get_token_by_code(self, db: Session, token_code: str) -> Token:
         return db.query(Token).filter(Token.token_code == token_code).first()
@@ -45,46 +90,160 @@ class TokenService:
             
         db.commit()
         db.refresh(db_token)
+        self.refresh_token_states(db, Token.id == db_token.id)
         logger.info(f"Updated token with id: {token_id}")
         return db_token
     
-    def generate_e_token(self, db: Session, booking_id: UUID, expiry_minutes: int = 20) -> Tuple[Token, str]:
+    def _token_state(self, token: Token, pump_id: Optional[UUID], booking_status: Optional[str],
+                     confirmation_status: Optional[str]) -> TokenState:
+        return TokenState(
+            id=token.id,
+            token_code=token.token_code,
+            booking_id=token.booking_id,
+            pump_id=pump_id,
+            status=token.status,
+            expiry_time=token.expiry_time,
+            booking_status=booking_status,
+            confirmation_status=confirmation_status
+        )
+    
+    def _cache_token_state(self, state: TokenState):
+        if state.status in FINAL_TOKEN_STATUSES:
+            self.token_state_cache.set(state.token_code, state)
+        else:
+            self.token_state_cache.delete(state.token_code)
+    
+    def refresh_token_states(self, db: Session, *criteria) -> List[TokenState]:
         """
-        Generate an e-token with QR code for a booking.
+        Load the states of the tokens matching criteria and write them through to the cache.
         
         Args:
             db (Session): Database session
-            booking_id (UUID): Booking ID
-            expiry_minutes (int): Expiry time in minutes
+            criteria: SQLAlchemy filter expressions on Token
             
         Returns:
-            Tuple[Token, str]: Token object and QR code as base64 string
+            List[TokenState]: Current token states
+        """
+        rows = db.query(
+            Token, Booking.pump_id, Booking.booking_status, Booking.confirmation_status
+        ).outerjoin(Booking, Booking.id == Token.booking_id).filter(*criteria).all()
+        
+        states = []
+        for token, pump_id, booking_status, confirmation_status in rows:
+            state = self._token_state(token, pump_id, booking_status, confirmation_status)
+            self._cache_token_state(state)
+            states.append(state)
+        return states
+    
+    def get_token_state(self, db: Session, token_code: str) -> Optional[TokenState]:
+        """Get a token's state, from the cache if it is final and from the database otherwise"""
+        state = self.token_state_cache.get(token_code)
+        if state is not MISSING:
+            return state
+        
+        states = self.refresh_token_states(db, Token.token_code == token_code)
+        return states[0] if states else None
+    
+    def generate_e_token(self, db: Session, booking_id: UUID, expiry_minutes: Optional[int] = None,
+                         pump_id: Optional[UUID] = None) -> Token:
         """
-        # Generate unique token code
-        token_code = generate_token_code(db)
+        Generate an e-token for a booking.
         
-        # Generate QR code
-        qr_data = f"CNG_TOKEN:{token_code}:{booking_id}"
-        qr_image, _ = generate_qr_code(qr_data)
+        The token stores only the compact QR payload, signed so that pumps can
+        verify it offline (see utils.token_signing). The default QR image is
+        pre-rendered in the background QR worker pool so booking requests do not
+        wait for it, and is served by GET /api/tokens/{id}/qr.
+        
+        Args:
+            db (Session): Database session
+            booking_id (UUID): Booking ID
+            expiry_minutes (int): Expiry time in minutes, by default set by the
+                expiry policy from the pump's traffic and weather
+            pump_id (UUID): Pump of the booking, looked up when not given
+            
+        Returns:
+            Token: Token object
+        """
+        if pump_id is None:
+            pump_id = db.query(Booking.pump_id).filter(Booking.id == str(booking_id)).scalar()
         
         # Calculate expiry time
+        if expiry_minutes is None:
+            pump = pump_service.get_cached_pump(db, pump_id) if pump_id else None
+            expiry_minutes = expiry_policy.get_expiry_minutes(
+                pump_id, pump.latitude if pump else None, pump.longitude if pump else None
+            )
         expiry_time = datetime.utcnow() + timedelta(minutes=expiry_minutes)
         
-        # Create token record
-        token_create = TokenCreate(
-            booking_id=booking_id,
-            token_code=token_code,
-            qr_data=f"data:image/png;base64,{qr_image}",
-            expiry_time=expiry_time
-        )
+        # Sequence codes never repeat, but may match a random code issued before
+        # codes were allocated from the sequence, so retry on a unique violation
+        for _ in range(TOKEN_CODE_ATTEMPTS):
+            token_code = generate_token_code(db)
+            token_create = TokenCreate(
+                booking_id=booking_id,
+                token_code=token_code,
+                qr_data=token_signer.sign(token_code, booking_id, pump_id, expiry_time),
+                expiry_time=expiry_time
+            )
+            try:
+                token = self.create_token(db, token_create)
+                break
+            except IntegrityError:
+                db.rollback()
+                logger.warning(f"Token code {token_code} already in use, generating another")
+        else:
+            raise RuntimeError(f"Could not create a token for booking {booking_id}")
         
-        token = self.create_token(db, token_create)
-        return token, qr_image
+        # Pre-render the QR image so the first request for it is a cache hit
+        try:
+            qr_renderer.submit(str(token.id), token.qr_data)
+        except Exception as e:
+            logger.error(f"Error scheduling QR render for token {token.id}: {str(e)}")
+        return token
+    
+    def get_qr_payload(self, token: Token) -> str:
+        """
+        Get the data encoded in a token's QR code.
+        
+        Tokens created before qr_data was compacted hold a rendered data URI, so the
+        payload is rebuilt from the token code and booking id.
+        """
+        if token.qr_data.startswith(QR_PAYLOAD_PREFIX):
+            return token.qr_data
+        return f"{QR_PAYLOAD_PREFIX}{token.token_code}:{token.booking_id}"
+    
+    def get_qr_etag(self, token: Token, image_format: str = "png", scale: int = 10, border: int = 4) -> str:
+        """Strong ETag for a rendered QR image, derived from everything that affects its bytes"""
+        digest = hashlib.sha1(f"{self.get_qr_payload(token)}|{image_format}|{scale}|{border}".encode()).hexdigest()
+        return f'"{digest}"'
+    
+    def get_qr_image(self, token: Token, image_format: str = "png", scale: int = 10, border: int = 4) -> bytes:
+        """Get the QR image for a token, rendering it on first request"""
+        return qr_renderer.render(str(token.id), self.get_qr_payload(token), image_format, scale, border)
+    
+    def validation_result(self, state: Optional[TokenState]) -> dict:
+        """Build the validation result for a token state"""
+        if not state:
+            return {"valid": False, "message": "Invalid token"}
+        
+        if state.status == "used":
+            return {"valid": False, "message": "Token already used"}
+        
+        if state.status == "expired" or state.expiry_time < datetime.utcnow():
+            return {"valid": False, "message": "Token expired"}
+        
+        return {"valid": True, "token": state}
     
     def validate_token(self, db: Session, token_code: str) -> dict:
         """
         Validate a token and return its status.
         
+        Used and expired tokens are answered from the token state cache. Other
+        tokens are read from the database, so a token used through another
+        worker is never reported valid. Validation never writes:
+        tokens past their expiry time are reported as expired and are marked
+        expired by the expiry sweeper (expire_tokens).
+        
         Args:
             db (Session): Database session
             token_code (str): Token code to validate
@@ -92,20 +251,73 @@ class TokenService:
         Returns:
             dict: Validation result with status and message
         """
-        token = self.get_token_by_code(db, token_code)
+        return self.validation_result(self.get_token_state(db, token_code))
+    
+    def expire_tokens(self, db: Session, now: Optional[datetime] = None,
+                      batch_size: int = TOKEN_EXPIRY_BATCH_SIZE) -> dict:
+        """
+        Mark valid tokens past their expiry time as expired, together with their bookings.
         
-        if not token:
-            return {"valid": False, "message": "Invalid token"}
+        Tokens are expired in chunks of set-based UPDATEs, each in its own short
+        transaction, using the (status, expiry_time) index. Active and confirmed
+        bookings of the expired tokens are expired in the same transaction and
+        their slot places are released.
         
-        if token.status == "used":
-            return {"valid": False, "message": "Token already used"}
+        Args:
+            db (Session): Database session
+            now (datetime): Expiry cutoff, defaults to the current UTC time
+            batch_size (int): Tokens expired per chunk
+            
+        Returns:
+            dict: Numbers of tokens, bookings and chunks processed and the duration in seconds
+        """
+        from services.slot_capacity_service import slot_capacity_service
         
-        if token.status == "expired" or token.expiry_time < datetime.utcnow():
-            # Update token status to expired
-            self.update_token(db, token.id, TokenUpdate(status="expired"))
-            return {"valid": False, "message": "Token expired"}
+        started = time.monotonic()
+        now = now or datetime.utcnow()
+        result = {"tokens": 0, "bookings": 0, "batches": 0}
+        
+        while True:
+            # Rows locked by a concurrent sweep or scan are left for the next run
+            tokens = db.query(Token.id, Token.booking_id, Token.token_code).filter(
+                Token.status == "valid",
+                Token.expiry_time < now
+            ).limit(batch_size).with_for_update(skip_locked=True).all()
+            if not tokens:
+                break
+            
+            db.query(Token).filter(
+                Token.id.in_([token.id for token in tokens]),
+                Token.status == "valid"
+            ).update({Token.status: "expired", Token.updated_at: now}, synchronize_session=False)
+            
+            bookings = db.query(Booking.id, Booking.pump_id, Booking.slot_date, Booking.slot_time).filter(
+                Booking.id.in_({token.booking_id for token in tokens}),
+                Booking.booking_status.in_(EXPIRABLE_BOOKING_STATUSES)
+            ).with_for_update().all()
+            if bookings:
+                db.query(Booking).filter(
+                    Booking.id.in_([booking.id for booking in bookings])
+                ).update({Booking.booking_status: "expired", Booking.updated_at: now}, synchronize_session=False)
+                slot_capacity_service.release_many(db, Counter(
+                    (str(booking.pump_id), booking.slot_date, booking.slot_time) for booking in bookings
+                ))
+            db.commit()
+            
+            for token in tokens:
+                self.token_state_cache.delete(token.token_code)
+            result["tokens"] += len(tokens)
+            result["bookings"] += len(bookings)
+            result["batches"] += 1
+            if len(tokens) < batch_size:
+                break
         
-        return {"valid": True, "token": token}
+        result["duration_seconds"] = round(time.monotonic() - started, 3)
+        logger.info(
+            f"Expired {result['tokens']} tokens and {result['bookings']} bookings "
+            f"in {result['batches']} batches ({result['duration_seconds']}s)"
+        )
+        return result
     
     def use_token(self, db: Session, token_id: UUID) -> Token:
         """
@@ -123,10 +335,28 @@ class TokenService:
             status="used"
         ))
     
+    def _complete_booking(self, db: Session, token: Token, booking: Booking, scan_time: datetime):
+        """
+        Mark a token used and its booking completed, without committing.
+        
+        Callers reject cancelled and expired bookings first, so the booking still
+        holds its slot and the slot counter does not change.
+        """
+        now = datetime.utcnow()
+        token.status = "used"
+        token.scan_time = scan_time
+        token.updated_at = now
+        booking.booking_status = "completed"
+        booking.updated_at = now
+    
     def scan_token_and_complete_booking(self, db: Session, token_code: str):
         """
         Scan a token and mark the associated booking as completed.
         
+        The token and its booking are loaded with one joined query that locks the
+        token row, and the token, booking and scan record are written in a single
+        transaction, so a scan either completes fully or not at all.
+        
         Args:
             db (Session): Database session
             token_code (str): Token code to scan
@@ -134,47 +364,53 @@ class TokenService:
         Returns:
             dict: Result of the operation
         """
-        from services.booking_service import booking_service
+        from services.booking_service import RELEASED_BOOKING_STATUSES
         
-        # Get token by code
-        token = self.get_token_by_code(db, token_code)
-        if not token:
+        # Used and expired are final, so a cached final state can be rejected
+        # straight away. Anything else is checked against the database.
+        state = self.token_state_cache.get(token_code)
+        if state is not MISSING and state.status in FINAL_TOKEN_STATUSES:
+            return {"success": False, "message": self.validation_result(state)["message"]}
+        
+        # Load the token and its booking, locking the token against concurrent scans
+        row = db.query(Token, Booking).outerjoin(
+            Booking, Booking.id == Token.booking_id
+        ).filter(Token.token_code == token_code).with_for_update(of=Token).first()
+        if not row:
             return {"success": False, "message": "Invalid token"}
+        token, booking = row
         
-        # Check if token is already used
+        now = datetime.utcnow()
+        message = None
         if token.status == "used":
-            return {"success": False, "message": "Token already used"}
-        
-        # Check if token is expired
-        if token.expiry_time < datetime.utcnow():
-            return {"success": False, "message": "Token expired"}
-        
-        # Get the associated booking
-        booking = booking_service.get_booking_by_id(db, token.booking_id)
-        if not booking:
-            return {"success": False, "message": "Booking not found"}
-        
-        # Check if booking is in 'coming' status
-        if booking.confirmation_status != "coming":
-            return {"success": False, "message": "Booking not confirmed as coming"}
-        
-        # Mark token as used
-        self.use_token(db, token.id)
+            message = "Token already used"
+        elif token.expiry_time < now:
+            message = "Token expired"
+        elif not booking:
+            message = "Booking not found"
+        elif booking.booking_status in RELEASED_BOOKING_STATUSES:
+            message = f"Booking {booking.booking_status}"
+        elif booking.confirmation_status != "coming":
+            message = "Booking not confirmed as coming"
+        if message:
+            # Release the row lock
+            db.rollback()
+            return {"success": False, "message": message}
         
-        # Mark booking as completed
-        updated_booking = booking_service.complete_booking(db, booking.id)
-        
-        # Create scan record
-        from schemas.token import TokenScanCreate
-        scan_record = TokenScanCreate(
+        self._complete_booking(db, token, booking, now)
+        db.add(TokenScan(
             token_id=token.id,
-            scan_time=datetime.utcnow(),
-            scan_type="completion",
-            location="pump_entry"
-        )
-        self.create_token_scan_record(db, scan_record)
+            pump_id=booking.pump_id,
+            scan_time=now,
+            result="completion",
+            token_code=token.token_code
+        ))
+        used_state = self._token_state(token, booking.pump_id, booking.booking_status, booking.confirmation_status)
+        db.commit()
         
-        return {"success": True, "message": "Booking completed successfully", "booking": updated_booking}
+        self._cache_token_state(used_state)
+        logger.info(f"Scanned token {token_code} and completed booking {used_state.booking_id}")
+        return {"success": True, "message": "Booking completed successfully", "booking": booking}
     
     def create_token_scan_record(self, db: Session, scan: TokenScanCreate) -> TokenScan:
         """
@@ -187,11 +423,206 @@ class TokenService:
         Returns:
             TokenScan: Created scan record
         """
-        db_scan = TokenScan(**scan.dict())
+        db_scan = TokenScan(**scan.dict(exclude={"qr_payload"}))
         db.add(db_scan)
         db.commit()
         db.refresh(db_scan)
         logger.info(f"Created token scan record for token {scan.token_id}")
         return db_scan
 
-token_service = TokenService()
\ No newline at end of file
+    def _offline_scan_rejection(self, token: Token, booking: Optional[Booking],
+                                scan: TokenScanCreate) -> Optional[str]:
+        """
+        Check an offline accepted scan the way scan_token_and_complete_booking checks
+        an online one.
+        
+        Returns:
+            Optional[str]: Why the scan cannot complete the booking, or None if it can
+        """
+        from services.booking_service import RELEASED_BOOKING_STATUSES
+        
+        signed = token_signer.verify(scan.qr_payload or "")
+        if signed is None:
+            return "Invalid token signature"
+        if signed.token_code != token.token_code or signed.booking_id != str(token.booking_id):
+            return "Signed payload is for another token"
+        if scan.scan_time is None:
+            return "Scan time missing"
+        scan_time = scan.scan_time
+        if scan_time.tzinfo is not None:
+            scan_time = scan_time.astimezone(timezone.utc).replace(tzinfo=None)
+        if scan_time > token.expiry_time:
+            return "Token expired"
+        if booking is None:
+            return "Booking not found"
+        if booking.booking_status in RELEASED_BOOKING_STATUSES:
+            return f"Booking {booking.booking_status}"
+        if booking.confirmation_status != "coming":
+            return "Booking not confirmed as coming"
+        return None
+    
+    def record_scans(self, db: Session, scans: List[TokenScanCreate], complete_accepted: bool = False) -> List[dict]:
+        """
+        Record a batch of token scans in one transaction.
+        
+        The referenced tokens are loaded with one IN query and the scan rows are
+        written with a single executemany INSERT. Scans naming a token that does
+        not exist are skipped.
+        
+        Args:
+            db (Session): Database session
+            scans (List[TokenScanCreate]): Scan records
+            complete_accepted (bool): Use the token and complete the booking of scans
+                accepted by an offline verifier, like scan_token_and_complete_booking.
+                The token rows are locked, and each scan's signed payload, scan time
+                and booking are checked again first.
+            
+        Returns:
+            List[dict]: Per-scan result with the scan index, token code and a status of
+            recorded, unknown_token, or with complete_accepted also completed, conflict
+            or rejected. Rejected results carry the reason as message.
+        """
+        if not scans:
+            return []
+        
+        token_codes = {scan.token_code for scan in scans if scan.token_code}
+        token_ids = {str(scan.token_id) for scan in scans if scan.token_id}
+        query = db.query(Token, Booking).outerjoin(Booking, Booking.id == Token.booking_id)
+        if token_codes and token_ids:
+            query = query.filter(or_(Token.token_code.in_(token_codes), Token.id.in_(token_ids)))
+        elif token_codes:
+            query = query.filter(Token.token_code.in_(token_codes))
+        elif token_ids:
+            query = query.filter(Token.id.in_(token_ids))
+        else:
+            query = None
+        if query is not None and complete_accepted:
+            # Lock the tokens against concurrent scans, in a fixed order so batches cannot deadlock
+            query = query.with_for_update(of=Token).order_by(Token.id)
+        
+        tokens_by_code, tokens_by_id = {}, {}
+        for token, booking in (query.all() if query is not None else []):
+            tokens_by_code[token.token_code] = tokens_by_id[str(token.id)] = (token, booking)
+        
+        rows = []
+        results = []
+        used_token_ids = []
+        for index, scan in enumerate(scans):
+            token, booking = None, None
+            if scan.token_code or scan.token_id:
+                token, booking = tokens_by_code.get(scan.token_code) or tokens_by_id.get(str(scan.token_id), (None, None))
+                if token is None:
+                    results.append({"index": index, "token_code": scan.token_code, "status": "unknown_token"})
+                    continue
+            
+            scan_status, message = "recorded", None
+            if complete_accepted and token is not None and scan.result == OFFLINE_SCAN_ACCEPTED:
+                if token.status == "used":
+                    scan_status = "conflict"
+                    logger.warning(f"Token {token.token_code} was accepted offline after it had been used")
+                else:
+                    message = self._offline_scan_rejection(token, booking, scan)
+                    if message:
+                        scan_status = "rejected"
+                        logger.warning(f"Rejected offline scan of token {token.token_code}: {message}")
+                    else:
+                        self._complete_booking(db, token, booking, scan.scan_time)
+                        used_token_ids.append(token.id)
+                        scan_status = "completed"
+            
+            rows.append({
+                "token_id": token.id if token else None,
+                "pump_id": str(scan.pump_id) if scan.pump_id else None,
+                "scanned_by": str(scan.scanned_by),
+                "scan_time": scan.scan_time,
+                "result": scan.result,
+                "token_code": token.token_code if token else scan.token_code
+            })
+            result = {
+                "index": index,
+                "token_code": token.token_code if token else scan.token_code,
+                "status": scan_status
+            }
+            if message:
+                result["message"] = message
+            results.append(result)
+        
+        if rows:
+            db.execute(insert(TokenScan), rows)
+        db.commit()
+        if used_token_ids:
+            self.refresh_token_states(db, Token.id.in_(used_token_ids))
+        logger.info(f"Recorded {len(rows)} of {len(scans)} token scans")
+        return results
+    
+    def sync_offline_scans(self, db: Session, scans: List[TokenScanCreate]) -> List[dict]:
+        """
+        Record scans that pump-side verifiers made while offline.
+        
+        Scans accepted offline use their token and complete its booking once the
+        server has verified the signed payload, that the scan happened before the
+        token expired, and that the booking is confirmed as coming and not
+        released. Scans failing those checks are recorded but reported as
+        rejected, and scans of a token that was already used as a conflict.
+        See record_scans.
+        """
+        return self.record_scans(db, scans, complete_accepted=True)
+
+token_service = TokenService()
+
+
+class AsyncTokenService:
+    """
+    Async version of TokenService for ``async def`` routes.
+    
+    Each call runs the TokenService implementation on the AsyncSession's
+    connection through ``run_sync``.
+    """
+    
+    async def get_token_by_id(self, db: AsyncSession, token_id: UUID) -> Token:
+        return await db.run_sync(token_service.get_token_by_id, token_id)
+    
+    async def get_token_by_booking_id(self, db: AsyncSession, booking_id: UUID) -> Token:
+        return await db.run_sync(token_service.get_token_by_booking_id, booking_id)
+    
+    async def get_token_by_code(self, db: AsyncSession, token_code: str) -> Token:
+        return await db.run_sync(token_service.get_token_by_code, token_code)
+    
+    async def create_token(self, db: AsyncSession, token: TokenCreate) -> Token:
+        return await db.run_sync(token_service.create_token, token)
+    
+    async def update_token(self, db: AsyncSession, token_id: UUID, token_update: TokenUpdate) -> Token:
+        return await db.run_sync(token_service.update_token, token_id, token_update)
+    
+    async def generate_e_token(self, db: AsyncSession, booking_id: UUID, expiry_minutes: Optional[int] = None,
+                               pump_id: Optional[UUID] = None) -> Token:
+        return await db.run_sync(token_service.generate_e_token, booking_id, expiry_minutes, pump_id)
+    
+    async def get_qr_image(self, token: Token, image_format: str = "png", scale: int = 10, border: int = 4) -> bytes:
+        return await qr_renderer.render_async(
+            str(token.id), token_service.get_qr_payload(token), image_format, scale, border
+        )
+    
+    async def validate_token(self, db: AsyncSession, token_code: str) -> dict:
+        # Memory hits are answered without touching the database connection
+        state = token_service.token_state_cache.local.get(token_code)
+        if state is not MISSING:
+            return token_service.validation_result(state)
+        return await db.run_sync(token_service.validate_token, token_code)
+    
+    async def use_token(self, db: AsyncSession, token_id: UUID) -> Token:
+        return await db.run_sync(token_service.use_token, token_id)
+    
+    async def scan_token_and_complete_booking(self, db: AsyncSession, token_code: str):
+        return await db.run_sync(token_service.scan_token_and_complete_booking, token_code)
+    
+    async def create_token_scan_record(self, db: AsyncSession, scan: TokenScanCreate) -> TokenScan:
+        return await db.run_sync(token_service.create_token_scan_record, scan)
+    
+    async def record_scans(self, db: AsyncSession, scans: List[TokenScanCreate]) -> List[dict]:
+        return await db.run_sync(token_service.record_scans, scans)
+    
+    async def sync_offline_scans(self, db: AsyncSession, scans: List[TokenScanCreate]) -> List[dict]:
+        return await db.run_sync(token_service.sync_offline_scans, scans)
+
+async_token_service = AsyncTokenService()
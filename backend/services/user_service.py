@@ -1,18 +1,27 @@
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from models.user import User, UserProfile
 from schemas.user import UserCreate, UserUpdate
 from utils.security import get_password_hash, verify_password, SECRET_KEY, ALGORITHM
 from fastapi import HTTPException, status, Depends
+from fastapi.concurrency import run_in_threadpool
 from utils.security import oauth2_scheme
 from jose import jwt
 from typing import Optional
-from db import get_db
+from db import get_db, get_async_db
 from uuid import UUID
 import logging
 
 logger = logging.getLogger(__name__)
 
+def credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
 class UserService:
     def get_user_by_email(self, db: Session, email: str) -> User:
         return db.query(User).filter(User.email == email).first()
@@ -32,10 +41,10 @@ class UserService:
     def get_user_by_id(self, db: Session, user_id: UUID) -> User:
         return db.query(User).filter(User.id == user_id).first()
     
-    def create_user(self, db: Session, user: UserCreate) -> User:
+    def create_user(self, db: Session, user: UserCreate, hashed_password: Optional[str] = None) -> User:
         db_user = User(
             email=user.email,
-            hashed_password=get_password_hash(user.password),
+            hashed_password=hashed_password or get_password_hash(user.password),
             full_name=user.full_name,
             phone=user.phone,
             vehicle_number=user.vehicle_number
@@ -95,22 +104,22 @@ class UserService:
             return None
         return user
     
-    def get_current_user(self, db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
-        credentials_exception = HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    def get_token_subject(self, token: str) -> str:
+        """Return the email or phone a bearer token was issued for, or raise 401"""
         try:
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
             identifier: str = payload.get("sub")
             if identifier is None:
-                raise credentials_exception
+                raise credentials_exception()
         except jwt.JWTError:
-            raise credentials_exception
+            raise credentials_exception()
+        return identifier
+    
+    def get_current_user(self, db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+        identifier = self.get_token_subject(token)
         user = self.get_user_by_email_or_phone(db, identifier=identifier)
         if user is None:
-            raise credentials_exception
+            raise credentials_exception()
         return user
     
     def search_users(self, db: Session, query: str):
@@ -126,4 +135,60 @@ class UserService:
         
         return users
 
-user_service = UserService()
\ No newline at end of file
+user_service = UserService()
+
+
+class AsyncUserService:
+    """
+    Async version of UserService for ``async def`` routes.
+    
+    Queries run on the AsyncSession's connection through ``run_sync``. Password
+    hashing and verification are CPU bound, so they run in the threadpool to
+    keep the event loop free.
+    """
+    
+    async def get_user_by_email(self, db: AsyncSession, email: str) -> User:
+        return await db.run_sync(user_service.get_user_by_email, email)
+    
+    async def get_user_by_phone(self, db: AsyncSession, phone: str) -> User:
+        return await db.run_sync(user_service.get_user_by_phone, phone)
+    
+    async def get_user_by_email_or_phone(self, db: AsyncSession, identifier: str) -> User:
+        return await db.run_sync(user_service.get_user_by_email_or_phone, identifier)
+    
+    async def get_user_by_id(self, db: AsyncSession, user_id: UUID) -> User:
+        return await db.run_sync(user_service.get_user_by_id, user_id)
+    
+    async def create_user(self, db: AsyncSession, user: UserCreate) -> User:
+        hashed_password = await run_in_threadpool(get_password_hash, user.password)
+        return await db.run_sync(user_service.create_user, user, hashed_password)
+    
+    async def update_user(self, db: AsyncSession, user_id: UUID, user_update: UserUpdate) -> User:
+        return await db.run_sync(user_service.update_user, user_id, user_update)
+    
+    async def authenticate_user(self, db: AsyncSession, email: Optional[str], password: str,
+                                phone: Optional[str] = None) -> User:
+        if email:
+            user = await self.get_user_by_email(db, email)
+        elif phone:
+            user = await self.get_user_by_phone(db, phone)
+        else:
+            return None
+            
+        if not user:
+            return None
+        if not await run_in_threadpool(verify_password, password, user.hashed_password):
+            return None
+        return user
+    
+    async def get_current_user(self, db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)):
+        identifier = user_service.get_token_subject(token)
+        user = await self.get_user_by_email_or_phone(db, identifier)
+        if user is None:
+            raise credentials_exception()
+        return user
+    
+    async def search_users(self, db: AsyncSession, query: str):
+        return await db.run_sync(user_service.search_users, query)
+
+async_user_service = AsyncUserService()
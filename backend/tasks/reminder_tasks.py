@@ -36,15 +36,21 @@ def send_reminder_notifications():
 
 @celery_app.task
 def check_expired_tokens():
-    """Check for and expire tokens that have passed their expiry time"""
+    """Expire tokens that have passed their expiry time, along with their bookings"""
     logger.info("Starting token expiration check task")
     
-    # In a real implementation, you would:
-    # 1. Query the database for tokens with expiry_time < current_time
-    # 2. Update their status to "expired"
+    from services.token_service import token_service
     
-    # For demonstration, we'll just log
-    logger.info("Token expiration check task completed")
+    db = SessionLocal()
+    try:
+        result = token_service.expire_tokens(db)
+        logger.info(f"Token expiration check task completed: {result}")
+        return result
+    except Exception as e:
+        logger.error(f"Error in check_expired_tokens: {str(e)}")
+        raise
+    finally:
+        db.close()
 
 @celery_app.task
 def update_pump_capacities():
@@ -63,13 +69,43 @@ def train_ai_model():
     """Train the AI demand prediction model with new data"""
     logger.info("Starting AI model training task")
     
-    # In a real implementation, you would:
-    # 1. Fetch recent booking data
-    # 2. Retrain the demand prediction model
-    # 3. Save the updated model
+    from ai_models.training import run_training
     
-    # For demonstration, we'll just log
-    logger.info("AI model training task completed")
+    try:
+        report = run_training()
+        logger.info(f"AI model training task completed: {report}")
+        return report
+    except Exception as e:
+        logger.error(f"Error in train_ai_model: {str(e)}")
+        raise
+
+@celery_app.task
+def refresh_demand_forecast(pump_ids=None, conditions=None):
+    """
+    Recompute the stored demand forecasts.
+    
+    Runs hourly so forecasts roll forward day by day. The expiry policy
+    queues it for a single pump with the new (weather, traffic) condition
+    when that pump's traffic or weather signals change category.
+    """
+    logger.info("Starting demand forecast refresh task")
+    
+    from services.forecast_service import forecast_service
+    
+    db = SessionLocal()
+    try:
+        result = forecast_service.refresh(
+            db,
+            pump_ids=pump_ids,
+            conditions=[tuple(condition) for condition in conditions] if conditions else None
+        )
+        logger.info(f"Demand forecast refresh task completed: {result}")
+        return result
+    except Exception as e:
+        logger.error(f"Error in refresh_demand_forecast: {str(e)}")
+        raise
+    finally:
+        db.close()
 
 @celery_app.task
 def cleanup_old_bookings():
@@ -106,10 +142,10 @@ celery_app.conf.beat_schedule = {
         "task": "tasks.reminder_tasks.send_reminder_notifications",
         "schedule": crontab(minute="*/15"),
     },
-    # Check expired tokens every hour
+    # Expire tokens every 5 minutes, releasing the slots of their bookings
     "check-expired-tokens": {
         "task": "tasks.reminder_tasks.check_expired_tokens",
-        "schedule": crontab(minute=0, hour="*"),
+        "schedule": crontab(minute="*/5"),
     },
     # Update pump capacities daily at midnight
     "update-pump-capacities": {
@@ -121,6 +157,11 @@ celery_app.conf.beat_schedule = {
         "task": "tasks.reminder_tasks.train_ai_model",
         "schedule": crontab(minute=0, hour=2, day_of_week=1),  # Every Monday at 2 AM
     },
+    # Roll demand forecasts forward hourly; training also refreshes them
+    "refresh-demand-forecast": {
+        "task": "tasks.reminder_tasks.refresh_demand_forecast",
+        "schedule": crontab(minute=30),
+    },
     # Clean up old bookings daily
     "cleanup-old-bookings": {
         "task": "tasks.reminder_tasks.cleanup_old_bookings",
@@ -1,14 +1,24 @@
+import os
+
+# Tests sign tokens with a key derived from the default SECRET_KEY
+os.environ.setdefault("TOKEN_SIGNING_ALLOW_DERIVED_KEY", "true")
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from db import Base, get_db
+from sqlalchemy.pool import NullPool, StaticPool
+from db import get_db, get_async_db, get_async_read_db, get_read_db
 from main import app
+from models.base import Base
 
 # Test database configuration
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 @pytest.fixture(scope="session")
 def test_db():
@@ -19,7 +29,15 @@ def test_db():
 
 @pytest.fixture(scope="function")
 def test_client(test_db):
-    """Create a test client with a clean database for each test"""
+    """
+    Create a test client with a clean database for each test.
+    
+    Both the sync and the async session dependencies are overridden, so the
+    async routes run against the test database too.
+    """
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    
     def override_get_db():
         try:
             db = TestingSessionLocal()
@@ -27,9 +45,16 @@ def test_client(test_db):
         finally:
             db.close()
     
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
+    
     app.dependency_overrides[get_db] = override_get_db
-    with TestClient(app) as client:
-        yield client
+    app.dependency_overrides[get_read_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_async_read_db] = override_get_async_db
+    # Without the context manager, so the app's shutdown handlers do not run between tests
+    yield TestClient(app)
     app.dependency_overrides.clear()
 
 @pytest.fixture(scope="function")
@@ -40,4 +65,20 @@ def clean_db(test_db):
         yield db
     finally:
         db.rollback()
-        db.close()
\ No newline at end of file
+        db.close()
+
+@pytest.fixture(scope="function")
+def service_db():
+    """Provide a session on a fresh in-memory database with every model table"""
+    service_engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=service_engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=service_engine)()
+    try:
+        yield db
+    finally:
+        db.close()
+        service_engine.dispose()
@@ -1,6 +1,9 @@
 import pytest
 import pandas as pd
+import numpy as np
+from datetime import date
 from ai_models.demand_predictor import DemandPredictor
+from ai_models.registry import ModelRegistry
 
 def test_demand_predictor_initialization():
     """Test DemandPredictor initialization"""
@@ -49,6 +52,62 @@ def test_predict_demand_without_model():
     assert isinstance(prediction, float)
     assert prediction >= 0
 
+def train_predictor(tmp_path):
+    predictor = DemandPredictor(ModelRegistry(root=str(tmp_path)))
+    rows = []
+    for day in range(1, 15):
+        for hour in range(6, 18):
+            rows.append({
+                'pump_id': 'pump1',
+                'slot_date': f'2023-01-{day:02d}',
+                'slot_time': f'{hour:02d}:00:00',
+                'demand_count': hour % 5 + day % 3,
+                'weather': 'rainy' if day % 2 else 'clear',
+                'traffic': ['low', 'medium', 'high'][hour % 3]
+            })
+    predictor.train(pd.DataFrame(rows))
+    return predictor
+
+def test_predict_batch_matches_single_predictions(tmp_path):
+    """Test batch predictions match the one-slot-at-a-time DataFrame path"""
+    predictor = train_predictor(tmp_path)
+    slot_dates = [date(2023, 2, 1), date(2023, 2, 4), date(2023, 2, 5)]
+    hours = [7, 12, 17]
+    weather = ['clear', 'rainy', 'snowy']
+    traffic = ['high', 'low', 'medium']
+
+    batch = predictor.predict_batch(['pump1'] * 3, slot_dates, hours, weather, traffic)
+
+    for i, slot_date in enumerate(slot_dates):
+        features = pd.DataFrame({
+            'hour': [hours[i]],
+            'day_of_week': [slot_date.weekday()],
+            'month': [slot_date.month],
+            'weather': [weather[i]],
+            'traffic': [traffic[i]]
+        })
+        features = pd.get_dummies(features, columns=['weather', 'traffic'], dummy_na=True)
+        features = features.reindex(columns=predictor.feature_columns, fill_value=0)
+        assert batch[i] == pytest.approx(max(0, predictor.model.predict(features.to_numpy(dtype=float))[0]))
+        assert predictor.predict_demand('pump1', slot_date, f'{hours[i]:02d}:00', weather[i], traffic[i]) == pytest.approx(batch[i])
+
+def test_predict_batch_calls_model_once(tmp_path):
+    """Test a batch is scored with a single predict call in the saved column layout"""
+    train_predictor(tmp_path)
+    predictor = DemandPredictor(ModelRegistry(root=str(tmp_path)))
+    assert predictor.load_model()
+    assert 'weather_rainy' in predictor.feature_columns
+
+    calls = []
+    predict = predictor.model.predict
+    predictor.model.predict = lambda features: calls.append(features.shape) or predict(features)
+
+    predictions = predictor.predict_batch(['pump1'] * 360, [date(2023, 3, 1)] * 360, [10] * 360)
+
+    assert calls == [(360, len(predictor.feature_columns))]
+    assert predictions.shape == (360,)
+    assert np.all(predictions >= 0)
+
 def test_generate_token_code_format():
     """Test that generated token codes have the correct format"""
     from utils.qr_generator import generate_token_code
@@ -74,4 +133,56 @@ def test_qr_code_generation():
     assert qr_data == data
     # QR code should be a base64 string
     assert len(qr_image) > 100
-    assert qr_image.startswith("iVBORw0KGgo") or "base64" in qr_image.lower()
\ No newline at end of file
+    assert qr_image.startswith("iVBORw0KGgo") or "base64" in qr_image.lower()
+def test_model_bundle_round_trip(tmp_path):
+    """Test the saved bundle carries the layout, vocabularies and training metadata"""
+    import joblib
+    predictor = train_predictor(tmp_path)
+
+    bundle = joblib.load(predictor.registry.version_path(predictor.serving.version))
+    assert bundle["feature_names"] == predictor.feature_columns
+    assert bundle["vocabularies"] == {"weather": ["clear", "rainy"], "traffic": ["high", "low", "medium"]}
+    assert bundle["metadata"]["samples"] == 168
+    assert "trained_at" in bundle["metadata"]
+
+    loaded = DemandPredictor(ModelRegistry(root=str(tmp_path)))
+    assert loaded.load_model()
+    assert loaded.metadata == bundle["metadata"]
+    assert loaded.predict_demand('pump1', date(2023, 2, 1), '09:00', 'rainy', 'high') == pytest.approx(
+        predictor.predict_demand('pump1', date(2023, 2, 1), '09:00', 'rainy', 'high'))
+
+def test_legacy_estimator_loads_with_its_column_layout(tmp_path):
+    """Test a bare estimator fitted on get_dummies columns is still served"""
+    import joblib
+    from sklearn.ensemble import RandomForestRegressor
+    X = pd.get_dummies(pd.DataFrame({
+        'hour': [8, 9, 10, 11],
+        'day_of_week': [0, 1, 2, 3],
+        'month': [1, 1, 1, 1],
+        'weather': ['clear', 'rainy', 'clear', 'rainy'],
+        'traffic': ['low', 'high', 'low', 'high']
+    }), columns=['weather', 'traffic'], dummy_na=True)
+    model = RandomForestRegressor(n_estimators=5, random_state=42).fit(X, [1, 9, 1, 9])
+    joblib.dump(model, tmp_path / "demand_model.pkl")
+
+    predictor = DemandPredictor(ModelRegistry(root=str(tmp_path / "registry")))
+    predictor.model_path = str(tmp_path / "demand_model.pkl")
+    assert predictor.load_model()
+    assert predictor.feature_columns == list(X.columns)
+    assert predictor.metadata["legacy"] is True
+
+    expected = model.predict(X.iloc[[1]])[0]
+    assert predictor.predict_demand('pump1', date(2023, 1, 3), '09:00', 'rainy', 'high') == pytest.approx(expected)
+
+def test_feature_encoder_ignores_unseen_categories():
+    """Test unseen and missing categories leave their one-hot columns at zero"""
+    from ai_models.feature_encoder import FeatureEncoder
+    encoder = FeatureEncoder.fit(weather=['clear', 'rainy', None], traffic=['low'])
+
+    assert encoder.feature_names == ['hour', 'day_of_week', 'month', 'weather_clear', 'weather_rainy', 'traffic_low']
+    features = encoder.encode([date(2023, 1, 2)] * 3, [6, 7, 8], ['rainy', 'snowy', None], 'low')
+    assert features.tolist() == [
+        [6, 0, 1, 0, 1, 1],
+        [7, 0, 1, 0, 0, 1],
+        [8, 0, 1, 0, 0, 1],
+    ]
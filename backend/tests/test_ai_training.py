@@ -0,0 +1,83 @@
+import os
+import pytest
+from datetime import date, time, timedelta
+from ai_models import demand_predictor as demand_predictor_module
+from ai_models.demand_predictor import DemandPredictor
+from ai_models.registry import ModelRegistry
+from ai_models.training import train_from_database
+from models.ai_data import AIData
+from models.booking import Booking
+
+PUMP_ID = "00000000-0000-0000-0000-0000000000d1"
+
+def add_history(db, days=10):
+    start = date(2024, 1, 1)
+    for day in range(days):
+        for hour in (8, 12, 18):
+            for _ in range(1 + (hour + day) % 3):
+                db.add(Booking(
+                    user_id="00000000-0000-0000-0000-0000000000d2",
+                    pump_id=PUMP_ID,
+                    slot_date=start + timedelta(days=day),
+                    slot_time=time(hour=hour),
+                    amount=500.0
+                ))
+    db.add(Booking(
+        user_id="00000000-0000-0000-0000-0000000000d2",
+        pump_id=PUMP_ID,
+        slot_date=start,
+        slot_time=time(hour=8),
+        amount=500.0,
+        booking_status="cancelled"
+    ))
+    db.add(AIData(pump_id=1, slot_date=start, slot_time=time(hour=20), demand_count=7,
+                  weather="rainy", traffic="high"))
+    db.commit()
+
+def test_train_from_database_streams_and_aggregates(service_db, tmp_path):
+    """Test training aggregates bookings per slot, reads in chunks and saves the model"""
+    add_history(service_db)
+    predictor = DemandPredictor(ModelRegistry(root=str(tmp_path)))
+
+    report = train_from_database(service_db, predictor, chunk_size=7, n_jobs=1)
+
+    # 59 bookings that were not cancelled, plus one AI data row
+    assert report["status"] == "trained"
+    assert report["samples"] == 60
+    assert report["training_rows"] == 31
+    assert report["fit_seconds"] >= 0 and report["duration_seconds"] >= report["fit_seconds"]
+    assert report["version"] == predictor.registry.current_version()
+    assert predictor.metadata["samples"] == 60
+    assert predictor.encoder.vocabularies == {"weather": ["clear", "rainy"], "traffic": ["high", "low"]}
+
+def test_train_from_database_skips_without_enough_data(service_db, tmp_path):
+    """Test too little history leaves the current model alone"""
+    add_history(service_db, days=1)
+    predictor = DemandPredictor(ModelRegistry(root=str(tmp_path)))
+
+    report = train_from_database(service_db, predictor, since=date(2024, 1, 1), n_jobs=1)
+
+    assert report["status"] == "skipped"
+    assert report["training_rows"] == 4
+    assert predictor.registry.current_version() is None
+    assert not predictor.is_trained
+
+def test_serving_process_picks_up_retrained_model(service_db, tmp_path, monkeypatch):
+    """Test a predictor polling the registry swaps in a version published elsewhere"""
+    add_history(service_db)
+    trainer = DemandPredictor(ModelRegistry(root=str(tmp_path)))
+    train_from_database(service_db, trainer, n_jobs=1)
+
+    server = DemandPredictor(ModelRegistry(root=str(tmp_path)))
+    assert server.current_model() is not None
+    first = server.serving
+    assert first.version == trainer.registry.current_version()
+
+    monkeypatch.setattr(demand_predictor_module, "MODEL_RELOAD_CHECK_SECONDS", 0)
+    assert server.current_model() is first
+
+    train_from_database(service_db, trainer, n_jobs=1)
+    manifest_path = trainer.registry.manifest_path
+    os.utime(manifest_path, (first.manifest_mtime + 10, first.manifest_mtime + 10))
+    assert server.current_model().version == trainer.registry.current_version() != first.version
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
@@ -1,31 +1,7 @@
 import pytest
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from db import Base, get_db
-from main import app
 from datetime import date, time
 
-# Create test database
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-# Create tables
-Base.metadata.create_all(bind=engine)
-
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
-        yield db
-    finally:
-        db.close()
-
-app.dependency_overrides[get_db] = override_get_db
-
-client = TestClient(app)
-
-def create_test_user_and_pump():
+def create_test_user_and_pump(test_client):
     """Helper function to create a test user and pump"""
     # Create a user
     user_data = {
@@ -33,7 +9,7 @@ def create_test_user_and_pump():
         "password": "bookingpassword",
         "full_name": "Booking Test User"
     }
-    user_response = client.post("/api/users/register", json=user_data)
+    user_response = test_client.post("/api/users/register", json=user_data)
     user_id = user_response.json()["id"]
     
     # Create a pump
@@ -42,14 +18,14 @@ def create_test_user_and_pump():
         "address": "Booking Test Address",
         "city": "Booking Test City"
     }
-    pump_response = client.post("/api/pumps/", json=pump_data)
+    pump_response = test_client.post("/api/pumps/", json=pump_data)
     pump_id = pump_response.json()["id"]
     
     return user_id, pump_id
 
-def test_create_booking():
+def test_create_booking(test_client):
     """Test creating a new booking"""
-    user_id, pump_id = create_test_user_and_pump()
+    user_id, pump_id = create_test_user_and_pump(test_client)
     
     booking_data = {
         "user_id": user_id,
@@ -60,16 +36,16 @@ def test_create_booking():
         "amount": 500.0
     }
     
-    response = client.post("/api/bookings/", json=booking_data)
+    response = test_client.post("/api/bookings/", json=booking_data)
     assert response.status_code == 200
     data = response.json()
     assert data["user_id"] == user_id
     assert data["pump_id"] == pump_id
     assert data["booking_status"] == "active"
 
-def test_get_user_bookings():
+def test_get_user_bookings(test_client):
     """Test getting bookings for a user"""
-    user_id, pump_id = create_test_user_and_pump()
+    user_id, pump_id = create_test_user_and_pump(test_client)
     
     # Create a booking
     booking_data = {
@@ -80,18 +56,18 @@ def test_get_user_bookings():
         "fuel_quantity": 15.0,
         "amount": 700.0
     }
-    client.post("/api/bookings/", json=booking_data)
+    test_client.post("/api/bookings/", json=booking_data)
     
     # Get user bookings
-    response = client.get(f"/api/bookings/?user_id={user_id}")
+    response = test_client.get(f"/api/bookings/?user_id={user_id}")
     assert response.status_code == 200
     data = response.json()
     assert isinstance(data, list)
     assert len(data) >= 1
 
-def test_cancel_booking():
+def test_cancel_booking(test_client):
     """Test cancelling a booking"""
-    user_id, pump_id = create_test_user_and_pump()
+    user_id, pump_id = create_test_user_and_pump(test_client)
     
     # Create a booking
     booking_data = {
@@ -102,26 +78,45 @@ def test_cancel_booking():
         "fuel_quantity": 12.0,
         "amount": 600.0
     }
-    create_response = client.post("/api/bookings/", json=booking_data)
+    create_response = test_client.post("/api/bookings/", json=booking_data)
     booking_id = create_response.json()["id"]
     
-    # Cancel the booking
-    response = client.delete(f"/api/bookings/{booking_id}")
+    # Cancel the booking, as the web app does
+    response = test_client.put(f"/api/bookings/{booking_id}", json={"booking_status": "cancelled"})
     assert response.status_code == 200
     
     # Verify booking is cancelled
-    get_response = client.get(f"/api/bookings/{booking_id}")
+    get_response = test_client.get(f"/api/bookings/{booking_id}")
     assert get_response.status_code == 200
     data = get_response.json()
     assert data["booking_status"] == "cancelled"
 
-def test_get_available_slots():
+def test_delete_booking(test_client):
+    """Test deleting a booking removes it"""
+    user_id, pump_id = create_test_user_and_pump(test_client)
+    
+    booking_data = {
+        "user_id": user_id,
+        "pump_id": pump_id,
+        "slot_date": str(date.today()),
+        "slot_time": "13:00",
+        "fuel_quantity": 8.0,
+        "amount": 400.0
+    }
+    create_response = test_client.post("/api/bookings/", json=booking_data)
+    booking_id = create_response.json()["id"]
+    
+    response = test_client.delete(f"/api/bookings/{booking_id}")
+    assert response.status_code == 200
+    assert test_client.get(f"/api/bookings/{booking_id}").status_code == 404
+
+def test_get_available_slots(test_client):
     """Test getting available slots for a pump"""
-    user_id, pump_id = create_test_user_and_pump()
+    user_id, pump_id = create_test_user_and_pump(test_client)
     
     # Get available slots
     test_date = date.today()
-    response = client.get(f"/api/bookings/{pump_id}/slots/{test_date}")
+    response = test_client.get(f"/api/bookings/{pump_id}/slots/{test_date}")
     assert response.status_code == 200
     data = response.json()
     assert isinstance(data, list)
\ No newline at end of file
@@ -0,0 +1,105 @@
+import pytest
+from sqlalchemy import event
+from models.pump import Pump
+from schemas.pump import PumpUpdate
+from services.pump_service import pump_service
+from utils.cache import TTLCache, TieredCache, MISSING
+
+class DictRedis:
+    """In-memory stand-in for the few Redis commands TieredCache uses"""
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+def count_queries(db):
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+def test_ttl_cache_evicts_least_recently_used():
+    """Test the cache drops the least recently used entry when full"""
+    cache = TTLCache(max_size=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+def test_ttl_cache_expires_entries():
+    """Test entries are not returned after their TTL"""
+    cache = TTLCache(ttl_seconds=60)
+    cache.set("a", None, ttl_seconds=0)
+    cache.set("b", None)
+    assert cache.get("a") is MISSING
+    assert cache.get("b") is None
+
+def test_tiered_cache_reads_through_shared_layer():
+    """Test a second worker is filled from the shared layer and deletes reach both layers"""
+    redis = DictRedis()
+    first = TieredCache("test", serialize=str, deserialize=int, redis_client=redis)
+    second = TieredCache("test", serialize=str, deserialize=int, redis_client=redis)
+
+    first.set("answer", 42)
+    assert redis.values == {"test:answer": "42"}
+    assert second.get("answer") == 42
+
+    second.delete("answer")
+    assert redis.values == {}
+    assert second.get("answer") is MISSING
+
+def test_pump_catalog_serves_repeat_lookups_from_memory(service_db):
+    """Test repeated pump lookups skip the database until the pump changes"""
+    pump_service.pump_cache.clear()
+    pump = Pump(name="Cached Pump", address="Cache Address", city="Cache City", booked_lanes=3)
+    service_db.add(pump)
+    service_db.commit()
+
+    statements = count_queries(service_db)
+    assert pump_service.get_cached_pump(service_db, pump.id).booked_lanes == 3
+    queries = len(statements)
+    assert queries > 0
+    assert pump_service.pump_exists(service_db, pump.id)
+    assert pump_service.get_cached_pump(service_db, pump.id).name == "Cached Pump"
+    assert len(statements) == queries
+
+    pump_service.update_pump(
+        service_db, pump.id,
+        PumpUpdate(name="Renamed Pump", address="Cache Address", city="Cache City", booked_lanes=1)
+    )
+    assert pump_service.get_cached_pump(service_db, pump.id).booked_lanes == 1
+
+    pump_service.delete_pump(service_db, pump.id)
+    assert not pump_service.pump_exists(service_db, pump.id)
+
+def test_pump_writes_refill_the_catalog_from_the_primary(service_db):
+    """Test reads after a pump write are answered without going back to a (possibly lagging) replica"""
+    pump_service.pump_cache.clear()
+    pump = Pump(name="Primary Pump", address="Primary Address", city="Primary City", booked_lanes=2)
+    service_db.add(pump)
+    service_db.commit()
+
+    pump_service.update_pump(
+        service_db, pump.id,
+        PumpUpdate(name="Updated Pump", address="Primary Address", city="Primary City", booked_lanes=4)
+    )
+    statements = count_queries(service_db)
+    assert pump_service.get_cached_pump(service_db, pump.id).booked_lanes == 4
+    assert statements == []
+
+    pump_service.delete_pump(service_db, pump.id)
+    statements.clear()
+    assert pump_service.get_cached_pump(service_db, pump.id) is None
+    assert not pump_service.pump_exists(service_db, pump.id)
+    assert statements == []
@@ -0,0 +1,123 @@
+import asyncio
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, insert, select, text
+from sqlalchemy.orm import sessionmaker
+from db import ReplicaPool, RoutingSession, create_async_db_engine, create_db_engine, get_pool_metrics
+
+metadata = MetaData()
+items = Table("items", metadata, Column("id", Integer, primary_key=True), Column("source", String(20)))
+
+def make_database(path, source):
+    engine = create_db_engine(f"sqlite:///{path}")
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(items).values(source=source))
+    return engine
+
+def routing_session(primary, replicas):
+    session_class = type("TestRoutingSession", (RoutingSession,), {"primary": primary, "replicas": replicas})
+    return sessionmaker(class_=session_class, autoflush=False)()
+
+def test_sqlite_engine_uses_wal(tmp_path):
+    """Test file based SQLite engines get the configured pragmas"""
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'pragmas.db'}")
+    try:
+        with engine.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+            assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+    finally:
+        engine.dispose()
+
+def test_pool_metrics_track_checkouts(tmp_path):
+    """Test pool metrics count checkouts, checkins and waits"""
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'metrics.db'}", pool_size=2, max_overflow=0)
+    try:
+        with engine.connect() as first:
+            with engine.connect() as second:
+                in_use = get_pool_metrics(engine)
+                assert in_use["in_use"] == 2
+                assert in_use["checked_out"] == 2
+
+        metrics = get_pool_metrics(engine)
+        assert metrics["pool_class"] == "InstrumentedQueuePool"
+        assert metrics["pool_size"] == 2
+        assert metrics["checkouts"] == 2
+        assert metrics["checkins"] == 2
+        assert metrics["in_use"] == 0
+        assert metrics["max_in_use"] == 2
+        assert metrics["connects"] == 2
+
+        # Pool metrics survive the pool being recreated
+        engine.dispose()
+        with engine.connect():
+            pass
+        assert get_pool_metrics(engine)["checkouts"] == 3
+    finally:
+        engine.dispose()
+
+def test_async_pool_metrics_track_checkouts(tmp_path):
+    """Test the async engine's pool records the same metrics as the sync one"""
+    engine = create_async_db_engine(f"sqlite:///{tmp_path / 'async_metrics.db'}", pool_size=1, max_overflow=0)
+
+    async def use_connection():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            await asyncio.sleep(0.01)
+
+    async def run():
+        try:
+            await asyncio.gather(use_connection(), use_connection())
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+    metrics = get_pool_metrics(engine)
+    assert metrics["pool_class"] == "InstrumentedAsyncAdaptedQueuePool"
+    assert metrics["checkouts"] == 2
+    assert metrics["checkins"] == 2
+    assert metrics["max_in_use"] == 1
+    assert metrics["max_wait_ms"] > 0
+
+def test_routing_session_reads_from_replica_and_writes_to_primary(tmp_path):
+    """Test reads use the replica until the session writes"""
+    primary = make_database(tmp_path / "primary.db", "primary")
+    replica = make_database(tmp_path / "replica.db", "replica")
+    db = routing_session(primary, ReplicaPool([replica]))
+    try:
+        assert db.execute(select(items.c.source)).scalar() == "replica"
+
+        db.execute(insert(items).values(source="written"))
+        db.commit()
+
+        # After writing, the session keeps reading from the primary
+        sources = db.execute(select(items.c.source).order_by(items.c.id)).scalars().all()
+        assert sources == ["primary", "written"]
+        with replica.connect() as conn:
+            assert conn.execute(select(items.c.source)).scalars().all() == ["replica"]
+    finally:
+        db.close()
+        primary.dispose()
+        replica.dispose()
+
+def test_lagging_replica_falls_back_to_primary(tmp_path):
+    """Test replicas past the lag limit are skipped until they catch up"""
+    primary = make_database(tmp_path / "primary.db", "primary")
+    replica = make_database(tmp_path / "replica.db", "replica")
+    replicas = ReplicaPool([replica], max_lag_seconds=5, check_interval=0)
+    lag = {"seconds": 30.0}
+    replicas.measure_lag = lambda engine: lag["seconds"]
+    try:
+        db = routing_session(primary, replicas)
+        assert db.execute(select(items.c.source)).scalar() == "primary"
+        assert replicas.snapshot()[0]["healthy"] is False
+        db.close()
+
+        lag["seconds"] = 0.5
+        db = routing_session(primary, replicas)
+        assert db.execute(select(items.c.source)).scalar() == "replica"
+        db.close()
+    finally:
+        primary.dispose()
+        replica.dispose()
+
@@ -0,0 +1,85 @@
+import pytest
+import threading
+import time
+from datetime import date, datetime, time as slot_time
+from models.booking import Booking
+from models.pump import Pump
+from services.expiry_policy import ExpiryPolicy, PumpSignals, TOKEN_MAX_EXPIRY_MINUTES, forecast_condition
+from services.token_service import token_service
+from utils.cache import MISSING
+
+PUMP_ID = "00000000-0000-0000-0000-0000000000e1"
+
+def signals(traffic_factor=1.0, weather=None):
+    return PumpSignals(traffic_factor=traffic_factor, weather=weather, fetched_at=time.monotonic())
+
+def test_expiry_follows_traffic_and_weather():
+    """Test expiry grows with traffic and bad weather, within bounds"""
+    policy = ExpiryPolicy(fetch_signals=lambda lat, lng: signals(), base_minutes=20)
+
+    assert policy.expiry_minutes_for(signals()) == 20
+    assert policy.expiry_minutes_for(signals(traffic_factor=0.8)) == 20
+    assert policy.expiry_minutes_for(signals(traffic_factor=1.5)) == 30
+    assert policy.expiry_minutes_for(signals(weather="light rain")) == 30
+    assert policy.expiry_minutes_for(signals(traffic_factor=5, weather="thunderstorm")) == 55
+    assert ExpiryPolicy(base_minutes=40).expiry_minutes_for(signals(traffic_factor=2)) == TOKEN_MAX_EXPIRY_MINUTES
+
+def test_condition_changes_queue_forecast_refreshes():
+    """Test a pump's forecast is refreshed only when its signals change forecast category"""
+    assert forecast_condition(signals()) == ("clear", "low")
+    assert forecast_condition(signals(traffic_factor=1.3, weather="overcast clouds")) == ("cloudy", "medium")
+    assert forecast_condition(signals(traffic_factor=1.8, weather="light rain")) == ("rainy", "high")
+
+    fetched = iter([signals(), signals(traffic_factor=1.1), signals(weather="light rain"), signals(weather="heavy rain")])
+    changes = []
+    policy = ExpiryPolicy(fetch_signals=lambda lat, lng: next(fetched),
+                          on_condition_change=lambda pump_id, condition: changes.append((pump_id, condition)))
+    for _ in range(4):
+        policy.refresh(PUMP_ID, 12.9, 77.6)
+    assert changes == [(PUMP_ID, ("rainy", "low"))]
+
+def test_expiry_never_waits_for_signals():
+    """Test a pump without signals gets the base expiry while they are fetched in the background"""
+    release = threading.Event()
+    calls = []
+
+    def fetch_signals(latitude, longitude):
+        calls.append((latitude, longitude))
+        release.wait(5)
+        return signals(traffic_factor=1.5)
+
+    policy = ExpiryPolicy(fetch_signals=fetch_signals, base_minutes=20, refresh_rate=0)
+    try:
+        started = time.monotonic()
+        assert policy.get_expiry_minutes(PUMP_ID, 12.9, 77.6) == 20
+        assert policy.get_expiry_minutes(PUMP_ID, 12.9, 77.6) == 20
+        assert time.monotonic() - started < 1
+
+        release.set()
+        for _ in range(50):
+            if policy.signals.get(PUMP_ID) is not MISSING:
+                break
+            time.sleep(0.05)
+        assert policy.get_expiry_minutes(PUMP_ID, 12.9, 77.6) == 30
+        # Concurrent requests for the same pump share one fetch
+        assert calls == [(12.9, 77.6)]
+    finally:
+        policy.shutdown()
+
+def test_generate_e_token_uses_expiry_policy(service_db, monkeypatch):
+    """Test generated tokens take their expiry from the pump's signals"""
+    pump = Pump(id=PUMP_ID, name="Signal Pump", address="Signal Address", city="Signal City",
+                latitude=12.9, longitude=77.6)
+    booking = Booking(user_id=PUMP_ID, pump_id=PUMP_ID, slot_date=date.today(), slot_time=slot_time(hour=9),
+                      amount=300.0)
+    service_db.add_all([pump, booking])
+    service_db.commit()
+
+    policy = ExpiryPolicy(fetch_signals=lambda lat, lng: signals(weather="heavy rain"), base_minutes=20)
+    policy.refresh(PUMP_ID, 12.9, 77.6)
+    monkeypatch.setattr("services.token_service.expiry_policy", policy)
+
+    token = token_service.generate_e_token(service_db, booking.id)
+    minutes = (token.expiry_time - datetime.utcnow()).total_seconds() / 60
+    assert 29 < minutes <= 30
+    assert token_service.generate_e_token(service_db, booking.id, expiry_minutes=5).expiry_time < token.expiry_time
@@ -0,0 +1,108 @@
+import pytest
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from utils.external_apis import ExternalAPIService
+
+class ProviderStub(BaseHTTPRequestHandler):
+    """Answers the Distance Matrix and OpenWeatherMap endpoints with canned data"""
+
+    requests = []
+    delay = 0.0
+    description = "clear sky"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        ProviderStub.requests.append((url.path, parse_qs(url.query)))
+        time.sleep(ProviderStub.delay)
+        if url.path == "/maps/api/distancematrix/json":
+            element = {"status": "OK", "distance": {"value": 2000}, "duration": {"value": 300}}
+            if "departure_time" in parse_qs(url.query):
+                element["duration_in_traffic"] = {"value": 450}
+            body = {"status": "OK", "rows": [{"elements": [element]}]}
+        else:
+            body = {
+                "main": {"temp": 30.5, "humidity": 70},
+                "weather": [{"description": ProviderStub.description}],
+                "wind": {"speed": 3.2}
+            }
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def provider():
+    ProviderStub.requests = []
+    ProviderStub.delay = 0.0
+    ProviderStub.description = "clear sky"
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ProviderStub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    service = ExternalAPIService(
+        google_maps_api_key="test", weather_api_key="test",
+        google_maps_api_url=f"{base_url}/maps/api", weather_api_url=f"{base_url}/data/2.5"
+    )
+    try:
+        yield service
+    finally:
+        service.close()
+        server.shutdown()
+        server.server_close()
+
+def test_weather_is_cached_per_geo_cell(provider):
+    """Test lookups inside one ~1 km cell share a request"""
+    weather = provider.get_weather_data(12.9712, 77.5941)
+    assert weather == {"temperature": 30.5, "humidity": 70, "description": "clear sky", "wind_speed": 3.2}
+    assert provider.get_weather_data(12.9703, 77.5938) == weather
+    assert len(ProviderStub.requests) == 1
+
+    provider.get_weather_data(12.9912, 77.5941)
+    assert len(ProviderStub.requests) == 2
+
+def test_distance_is_cached_per_cell_pair(provider):
+    """Test distance lookups are keyed by origin and destination cells, with traffic kept apart"""
+    trip = provider.get_distance_and_duration("12.9712,77.5941", "12.9892,77.5941")
+    assert trip == {"distance": 2000, "duration": 300}
+    assert provider.get_distance_and_duration("12.9709,77.5943", "12.9890,77.5939") == trip
+
+    traffic = provider.get_distance_and_duration("12.9712,77.5941", "12.9892,77.5941", departure_time="now")
+    assert traffic["duration_in_traffic"] == 450
+    assert len(ProviderStub.requests) == 2
+
+def test_concurrent_lookups_share_one_request(provider):
+    """Test identical lookups in flight at the same time are coalesced"""
+    ProviderStub.delay = 0.2
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: provider.get_weather_data(12.97, 77.59), range(8)))
+
+    assert all(result["description"] == "clear sky" for result in results)
+    assert len(ProviderStub.requests) == 1
+
+def test_stale_weather_is_served_while_refreshing(provider):
+    """Test an expired entry is returned immediately and refreshed in the background"""
+    provider.get_weather_data(12.97, 77.59)
+    fresh_until, value = provider.cache.entries.get(("weather", "12.97,77.59"))
+    provider.cache.entries.set(("weather", "12.97,77.59"), (time.monotonic() - 1, value))
+
+    ProviderStub.delay = 0.2
+    ProviderStub.description = "light rain"
+    started = time.monotonic()
+    assert provider.get_weather_data(12.97, 77.59)["description"] == "clear sky"
+    assert time.monotonic() - started < 0.2
+
+    for _ in range(50):
+        if provider.get_weather_data(12.97, 77.59)["description"] == "light rain":
+            break
+        time.sleep(0.05)
+    assert provider.get_weather_data(12.97, 77.59)["description"] == "light rain"
+    assert len(ProviderStub.requests) == 2
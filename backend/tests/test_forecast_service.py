@@ -0,0 +1,103 @@
+import pytest
+from datetime import date, timedelta
+from sqlalchemy import event
+from ai_models.demand_predictor import DemandPredictor
+from ai_models.registry import ModelRegistry
+from ai_models.training import train_from_database
+from models.demand_forecast import DemandForecast
+from models.pump import Pump
+from services.forecast_service import ForecastService
+from tests.test_ai_training import add_history
+
+START = date(2024, 3, 4)
+
+def count_queries(db):
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+class CountingPredictor:
+    """Predictor wrapper that records the size of each live inference call"""
+
+    def __init__(self, predictor):
+        self.predictor = predictor
+        self.calls = []
+
+    def current_model(self):
+        return self.predictor.current_model()
+
+    def predict_batch(self, pump_ids, slot_dates, hours, weather="clear", traffic="low"):
+        self.calls.append(len(hours))
+        return self.predictor.predict_batch(pump_ids, slot_dates, hours, weather, traffic)
+
+@pytest.fixture
+def forecasts(service_db, tmp_path):
+    add_history(service_db)
+    pumps = [Pump(name=f"Forecast Pump {i}", address="Forecast Address", city="Forecast City") for i in range(2)]
+    service_db.add_all(pumps)
+    service_db.commit()
+
+    predictor = DemandPredictor(ModelRegistry(root=str(tmp_path)))
+    train_from_database(service_db, predictor, n_jobs=1)
+    counting = CountingPredictor(predictor)
+    return ForecastService(counting), counting, pumps
+
+def test_refresh_only_scores_missing_days(service_db, forecasts):
+    """Test the first refresh fills the window and later ones only add new or stale days"""
+    service, predictor, pumps = forecasts
+
+    report = service.refresh(service_db, days=3, start_date=START)
+    assert report["rows"] == service_db.query(DemandForecast).count() == 2 * 3 * 24
+    assert predictor.calls == [2 * 3 * 24]
+
+    assert service.refresh(service_db, days=3, start_date=START)["rows"] == 0
+
+    # The window moved forward a day: only the new day is scored and the past one is dropped
+    report = service.refresh(service_db, days=3, start_date=START + timedelta(days=1))
+    assert report["rows"] == 2 * 24
+    assert service_db.query(DemandForecast).filter(DemandForecast.slot_date < START + timedelta(days=1)).count() == 0
+
+    # A new weather condition for one pump adds just its rows
+    report = service.refresh(service_db, pump_ids=[pumps[0].id], days=3, start_date=START + timedelta(days=1),
+                             conditions=[("rainy", "high")])
+    assert report["rows"] == 3 * 24
+
+def test_predict_reads_cube_and_falls_back_on_misses(service_db, forecasts):
+    """Test forecast hits need no model call and at most one query, and misses use live inference"""
+    service, predictor, pumps = forecasts
+    service.refresh(service_db, days=2, start_date=START)
+    pump_id = pumps[0].id
+    predictor.calls.clear()
+
+    statements = count_queries(service_db)
+
+    dates = [START, START + timedelta(days=1)] * 12
+    hours = list(range(6, 18)) * 2
+    cached = service.predict(service_db, pump_id, dates, hours)
+    assert predictor.calls == []
+    assert len(statements) == 1
+
+    live = predictor.predictor.predict_batch([str(pump_id)] * len(hours), dates, hours)
+    assert cached == pytest.approx(live)
+
+    assert service.predict(service_db, pump_id, dates, hours) == pytest.approx(cached)
+    assert len(statements) == 1
+
+    # Days outside the window and unforecast conditions are scored live, only for the misses
+    service.predict(service_db, pump_id, [START, START + timedelta(days=5)], [9, 9])
+    assert predictor.calls == [1]
+    service.predict(service_db, pump_id, [START], [9], weather="rainy")
+    assert predictor.calls == [1, 1]
+
+def test_predict_ignores_forecasts_from_another_model_version(service_db, forecasts):
+    """Test forecasts made by a previous model are not served after retraining"""
+    service, predictor, pumps = forecasts
+    service.refresh(service_db, days=1, start_date=START)
+
+    train_from_database(service_db, predictor.predictor, n_jobs=1)
+    predictor.calls.clear()
+
+    service.predict(service_db, pumps[0].id, [START], [9])
+    assert predictor.calls == [1]
+
+    assert service.refresh(service_db, days=1, start_date=START)["rows"] == 2 * 24
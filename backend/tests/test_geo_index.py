@@ -0,0 +1,119 @@
+import random
+import numpy as np
+import pytest
+from utils.geo_index import PumpGeoIndex, haversine_distance, haversine_vector
+
+def brute_force(points, latitude, longitude, radius):
+    """Reference implementation scanning every point"""
+    results = []
+    for pump_id, lat, lon in points:
+        distance = haversine_distance(latitude, longitude, lat, lon)
+        if distance <= radius:
+            results.append((pump_id, distance))
+    results.sort(key=lambda item: item[1])
+    return results
+
+def random_points(count, seed=7):
+    rng = random.Random(seed)
+    return [(f"pump-{i}", rng.uniform(-60, 60), rng.uniform(-180, 180)) for i in range(count)]
+
+def test_haversine_distance():
+    """Test distance between two known locations"""
+    # New Delhi to Mumbai is roughly 1150 km
+    distance = haversine_distance(28.613939, 77.209021, 19.076090, 72.877426)
+    assert 1140 < distance < 1160
+    assert haversine_distance(10.0, 10.0, 10.0, 10.0) == 0
+
+def test_query_radius_matches_brute_force():
+    """Test radius queries return the same pumps as a full scan"""
+    points = random_points(2000)
+    index = PumpGeoIndex()
+    index.rebuild(points)
+
+    rng = random.Random(11)
+    for _ in range(25):
+        latitude, longitude = rng.uniform(-60, 60), rng.uniform(-180, 180)
+        radius = rng.choice([5, 50, 500, 3000])
+        expected = brute_force(points, latitude, longitude, radius)
+        actual = index.query_radius(latitude, longitude, radius)
+        assert [pump_id for pump_id, _ in actual] == [pump_id for pump_id, _ in expected]
+
+def test_query_radius_across_antimeridian():
+    """Test pumps on the other side of the date line are found"""
+    index = PumpGeoIndex()
+    index.upsert("east", 0.0, 179.95)
+    index.upsert("west", 0.0, -179.95)
+
+    results = index.query_radius(0.0, 179.99, 25)
+    assert {pump_id for pump_id, _ in results} == {"east", "west"}
+
+def test_query_nearest_matches_brute_force():
+    """Test k-nearest queries return the closest pumps in order"""
+    points = random_points(1000)
+    index = PumpGeoIndex()
+    index.rebuild(points)
+
+    expected = brute_force(points, 12.97, 77.59, 50000)[:7]
+    actual = index.query_nearest(12.97, 77.59, 7)
+    assert [pump_id for pump_id, _ in actual] == [pump_id for pump_id, _ in expected]
+    assert actual[0][1] == pytest.approx(expected[0][1])
+
+def test_upsert_and_remove_keep_index_in_sync():
+    """Test moving and deleting pumps"""
+    index = PumpGeoIndex()
+    index.upsert("pump", 28.61, 77.20)
+    assert len(index.query_radius(28.61, 77.20, 1)) == 1
+
+    # Moving the pump takes it out of the old cell
+    index.upsert("pump", 19.07, 72.87)
+    assert index.query_radius(28.61, 77.20, 1) == []
+    assert len(index.query_radius(19.07, 72.87, 1)) == 1
+
+    # Clearing the coordinates removes the pump
+    index.upsert("pump", None, None)
+    assert len(index) == 0
+
+    index.upsert("pump", 19.07, 72.87)
+    assert index.remove("pump") is True
+    assert index.remove("pump") is False
+    assert index.query_radius(19.07, 72.87, 1) == []
+
+def test_haversine_vector_matches_scalar():
+    """Test the vectorized kernel against the scalar formula"""
+    points = random_points(200)
+    latitudes = np.array([lat for _, lat, _ in points])
+    longitudes = np.array([lon for _, _, lon in points])
+
+    distances = haversine_vector(28.61, 77.20, latitudes, longitudes)
+    expected = [haversine_distance(28.61, 77.20, lat, lon) for _, lat, lon in points]
+    assert np.allclose(distances, expected)
+
+def test_query_radius_batch_matches_single_queries():
+    """Test batch lookups answer each location like a single query"""
+    points = random_points(3000)
+    index = PumpGeoIndex()
+    index.rebuild(points)
+
+    rng = random.Random(5)
+    locations = [(rng.uniform(-60, 60), rng.uniform(-180, 180)) for _ in range(40)]
+    batch = index.query_radius_batch(locations, 400)
+
+    assert len(batch) == len(locations)
+    for (latitude, longitude), results in zip(locations, batch):
+        expected = brute_force(points, latitude, longitude, 400)
+        assert [pump_id for pump_id, _ in results] == [pump_id for pump_id, _ in expected]
+
+def test_remove_keeps_columns_dense():
+    """Test removing pumps from the middle of the column store"""
+    points = random_points(50)
+    index = PumpGeoIndex(initial_capacity=4)
+    index.rebuild(points)
+
+    for pump_id, _, _ in points[::2]:
+        index.remove(pump_id)
+
+    remaining = points[1::2]
+    assert len(index) == len(remaining)
+    expected = brute_force(remaining, 0.0, 0.0, 50000)
+    actual = index.query_radius(0.0, 0.0, 50000)
+    assert [pump_id for pump_id, _ in actual] == [pump_id for pump_id, _ in expected]
@@ -0,0 +1,46 @@
+import json
+import numpy as np
+from ai_models.registry import ModelRegistry
+
+class RecordingRedis:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+
+def test_publish_makes_version_current_and_prunes_old_ones(tmp_path):
+    """Test each publish replaces the manifest and only the newest versions stay on disk"""
+    registry = ModelRegistry(root=str(tmp_path), keep_versions=2)
+    assert registry.current_version() is None
+    assert registry.manifest_mtime() is None
+
+    versions = [registry.publish({"model": i}, {"samples": i}) for i in range(3)]
+
+    manifest = json.loads((tmp_path / "demand-manifest.json").read_text())
+    assert manifest["current"] == versions[-1] == registry.current_version()
+    assert [entry["version"] for entry in manifest["versions"]] == versions[1:]
+    assert manifest["versions"][-1]["metadata"] == {"samples": 2}
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(
+        ["demand-manifest.json"] + [f"demand-{version}.joblib" for version in versions[1:]]
+    )
+
+def test_load_memory_maps_arrays(tmp_path):
+    """Test arrays in a published bundle are mapped read-only instead of copied"""
+    registry = ModelRegistry(root=str(tmp_path))
+    version = registry.publish({"model": None, "weights": np.arange(10000, dtype=np.float64)})
+
+    weights = registry.load(version)["weights"]
+
+    assert isinstance(weights, np.memmap)
+    assert not weights.flags.writeable
+    assert weights[9999] == 9999
+
+def test_publish_announces_version_on_redis(tmp_path):
+    """Test new versions are announced on the registry's channel"""
+    redis = RecordingRedis()
+    registry = ModelRegistry(root=str(tmp_path), redis_client=redis)
+
+    version = registry.publish({"model": None})
+
+    assert redis.published == [(registry.channel, version)]
@@ -1,30 +1,6 @@
 import pytest
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from db import Base, get_db
-from main import app
 
-# Create test database
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-# Create tables
-Base.metadata.create_all(bind=engine)
-
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
-        yield db
-    finally:
-        db.close()
-
-app.dependency_overrides[get_db] = override_get_db
-
-client = TestClient(app)
-
-def test_create_pump():
+def test_create_pump(test_client):
     """Test creating a new pump"""
     pump_data = {
         "name": "Test Pump",
@@ -40,21 +16,21 @@ def test_create_pump():
         "is_open": True
     }
     
-    response = client.post("/api/pumps/", json=pump_data)
+    response = test_client.post("/api/pumps/", json=pump_data)
     assert response.status_code == 200
     data = response.json()
     assert data["name"] == pump_data["name"]
     assert data["city"] == pump_data["city"]
     assert "id" in data
 
-def test_get_pumps():
+def test_get_pumps(test_client):
     """Test getting all pumps"""
-    response = client.get("/api/pumps/")
+    response = test_client.get("/api/pumps/")
     assert response.status_code == 200
     data = response.json()
     assert isinstance(data, list)
 
-def test_get_pump():
+def test_get_pump(test_client):
     """Test getting a specific pump"""
     # First create a pump
     pump_data = {
@@ -63,17 +39,17 @@ def test_get_pump():
         "city": "Test City 2"
     }
     
-    create_response = client.post("/api/pumps/", json=pump_data)
+    create_response = test_client.post("/api/pumps/", json=pump_data)
     assert create_response.status_code == 200
     pump_id = create_response.json()["id"]
     
     # Then get the pump
-    response = client.get(f"/api/pumps/{pump_id}")
+    response = test_client.get(f"/api/pumps/{pump_id}")
     assert response.status_code == 200
     data = response.json()
     assert data["name"] == pump_data["name"]
 
-def test_update_pump():
+def test_update_pump(test_client):
     """Test updating a pump"""
     # First create a pump
     pump_data = {
@@ -82,7 +58,7 @@ def test_update_pump():
         "city": "Original City"
     }
     
-    create_response = client.post("/api/pumps/", json=pump_data)
+    create_response = test_client.post("/api/pumps/", json=pump_data)
     assert create_response.status_code == 200
     pump_id = create_response.json()["id"]
     
@@ -93,13 +69,13 @@ def test_update_pump():
         "city": "Updated City"
     }
     
-    response = client.put(f"/api/pumps/{pump_id}", json=update_data)
+    response = test_client.put(f"/api/pumps/{pump_id}", json=update_data)
     assert response.status_code == 200
     data = response.json()
     assert data["name"] == update_data["name"]
     assert data["address"] == update_data["address"]
 
-def test_delete_pump():
+def test_delete_pump(test_client):
     """Test deleting a pump"""
     # First create a pump
     pump_data = {
@@ -108,14 +84,14 @@ def test_delete_pump():
         "city": "Deletion City"
     }
     
-    create_response = client.post("/api/pumps/", json=pump_data)
+    create_response = test_client.post("/api/pumps/", json=pump_data)
     assert create_response.status_code == 200
     pump_id = create_response.json()["id"]
     
     # Then delete the pump
-    response = client.delete(f"/api/pumps/{pump_id}")
+    response = test_client.delete(f"/api/pumps/{pump_id}")
     assert response.status_code == 200
     
     # Verify pump is deleted
-    get_response = client.get(f"/api/pumps/{pump_id}")
+    get_response = test_client.get(f"/api/pumps/{pump_id}")
     assert get_response.status_code == 404
\ No newline at end of file
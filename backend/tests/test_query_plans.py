@@ -0,0 +1,92 @@
+import re
+import pytest
+from datetime import date, time
+from sqlalchemy import event
+from models.pump import Pump
+from models.user import User, UserProfile
+from schemas.booking import BookingCreate
+from schemas.user import UserUpdate
+from services.booking_service import booking_service
+from services.payment_service import payment_service
+from services.pump_service import pump_service
+from services.reminder_service import reminder_service
+from services.token_service import token_service
+from services.user_service import user_service
+
+# A plan step that walks a whole table instead of searching an index
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+USER_ID = "00000000-0000-0000-0000-000000000001"
+
+def seed(db):
+    pump = Pump(name="Plan Test Pump", address="Plan Test Address", city="Plan City")
+    user = User(email="plans@example.com", hashed_password="x", phone="+910000000000")
+    db.add_all([pump, user])
+    db.commit()
+    db.add(UserProfile(user_id=user.id, full_name="Plan Tester"))
+    db.commit()
+    booking = booking_service.create_booking(db, BookingCreate(
+        user_id=USER_ID,
+        pump_id=pump.id,
+        slot_date=date.today(),
+        slot_time=time(10, 0),
+        amount=500.0
+    ))
+    return pump, user, booking
+
+def run_service_queries(db, pump, user, booking):
+    """Call every hot lookup in the services layer"""
+    booking_service.get_booking_by_id(db, booking.id)
+    booking_service.get_bookings_by_user(db, USER_ID)
+    booking_service.get_bookings_by_pump(db, str(pump.id))
+    booking_service.get_bookings_by_date(db, str(pump.id), date.today())
+    booking_service.is_slot_available(db, pump.id, date.today(), time(10, 0))
+    booking_service.get_availability_matrix(db, [pump.id], date.today(), date.today())
+    booking_service.create_booking(db, BookingCreate(
+        user_id=USER_ID,
+        pump_id=pump.id,
+        slot_date=date.today(),
+        slot_time=time(11, 0),
+        amount=500.0
+    ), capacity=8)
+    booking_service.cancel_booking(db, booking.id)
+    token_service.get_token_by_booking_id(db, booking.id)
+    token_service.get_token_by_code(db, "CNG-ABCDEF")
+    reminder_service.get_reminders_by_booking_id(db, str(booking.id))
+    payment_service.get_payments_by_booking_id(db, str(booking.id))
+    pump_service.get_pump_by_id(db, pump.id)
+    pump_service.get_pumps_by_city(db, "Plan City")
+    pump_service.get_pumps_for_admin(db, USER_ID)
+    pump_service.assign_admin_to_pump(db, USER_ID, str(pump.id))
+    user_service.get_user_by_email(db, "plans@example.com")
+    user_service.get_user_by_phone(db, "+910000000000")
+    user_service.update_user(db, user.id, UserUpdate(email="plans@example.com", full_name="Plan Tester 2"))
+
+def test_service_queries_use_indexes(service_db):
+    """Fail if any service query plans a full table scan"""
+    pump, user, booking = seed(service_db)
+
+    statements = []
+    connection = service_db.connection()
+    engine = connection.engine
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        run_service_queries(service_db, pump, user, booking)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    assert statements
+
+    full_scans = []
+    for statement, parameters in statements:
+        plan = service_db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+        for row in plan:
+            if FULL_SCAN.match(row[-1]):
+                full_scans.append(f"{row[-1]}: {statement}")
+
+    assert full_scans == [], "\n".join(full_scans)
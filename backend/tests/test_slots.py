@@ -0,0 +1,180 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from migrations.create_slot_counters import upgrade as create_slot_counters
+from models.base import Base
+from models.booking import Booking
+from models.pump import Pump
+from models.slot_counter import SlotCounter
+from schemas.booking import BookingCreate, BookingUpdate
+from services.booking_service import booking_service
+from services.slot_capacity_service import slot_capacity_service, SlotUnavailableError, VEHICLES_PER_LANE_SLOT
+
+def create_pump(db, name="Slot Test Pump", booked_lanes=2):
+    pump = Pump(name=name, address="Slot Test Address", city="Slot Test City", booked_lanes=booked_lanes)
+    db.add(pump)
+    db.commit()
+    return pump
+
+def booking_request(pump_id, slot_date, slot_time, booking_status="active"):
+    return BookingCreate(
+        user_id="00000000-0000-0000-0000-000000000001",
+        pump_id=pump_id,
+        slot_date=slot_date,
+        slot_time=slot_time,
+        amount=500.0,
+        booking_status=booking_status
+    )
+
+def create_booking(db, pump, slot_date, slot_time, booking_status="active"):
+    return booking_service.create_booking(db, booking_request(pump.id, slot_date, slot_time, booking_status))
+
+def test_availability_matrix(service_db):
+    """Test the multi-pump, multi-day availability matrix"""
+    first_pump = create_pump(service_db, "First Pump", booked_lanes=1)
+    second_pump = create_pump(service_db, "Second Pump", booked_lanes=2)
+    today = date.today()
+    tomorrow = today + timedelta(days=1)
+
+    create_booking(service_db, first_pump, today, time(10, 0))
+    create_booking(service_db, second_pump, tomorrow, time(6, 0))
+    # Cancelled bookings do not hold their slot
+    create_booking(service_db, second_pump, today, time(7, 0), booking_status="cancelled")
+
+    matrix = booking_service.get_availability_matrix(
+        service_db, [first_pump.id, second_pump.id], today, tomorrow
+    )
+
+    assert matrix["dates"] == [today, tomorrow]
+    assert matrix["slots"][0] == "06:00"
+    ten_am = matrix["slots"].index("10:00")
+
+    first_rows = matrix["availability"][str(first_pump.id)]
+    assert first_rows[0][ten_am] == VEHICLES_PER_LANE_SLOT - 1
+    assert first_rows[1] == [VEHICLES_PER_LANE_SLOT] * len(matrix["slots"])
+
+    second_rows = matrix["availability"][str(second_pump.id)]
+    assert second_rows[0] == [2 * VEHICLES_PER_LANE_SLOT] * len(matrix["slots"])
+    assert second_rows[1][0] == 2 * VEHICLES_PER_LANE_SLOT - 1
+
+def test_slot_fills_up_at_lane_capacity(service_db):
+    """Test a slot holds booked_lanes x vehicles-per-slot bookings"""
+    pump = create_pump(service_db, booked_lanes=1)
+    today = date.today()
+    capacity = slot_capacity_service.get_slot_capacity(pump)
+
+    for _ in range(capacity):
+        assert booking_service.is_slot_available(service_db, pump.id, today, time(9, 0))
+        create_booking(service_db, pump, today, time(9, 0))
+
+    assert booking_service.is_slot_available(service_db, pump.id, today, time(9, 0)) is False
+    slots = booking_service.get_available_slots(service_db, pump.id, today)
+    assert time(9, 0) not in slots
+    assert time(10, 0) in slots
+
+def test_cancel_and_delete_release_the_slot(service_db):
+    """Test the counter follows cancellation, reactivation and deletion"""
+    pump = create_pump(service_db)
+    today = date.today()
+    first = create_booking(service_db, pump, today, time(8, 0))
+    second = create_booking(service_db, pump, today, time(8, 0))
+    assert slot_capacity_service.get_booked_count(service_db, pump.id, today, time(8, 0)) == 2
+
+    booking_service.cancel_booking(service_db, first.id)
+    assert slot_capacity_service.get_booked_count(service_db, pump.id, today, time(8, 0)) == 1
+
+    booking_service.update_booking(service_db, first.id, BookingUpdate(booking_status="active"))
+    assert slot_capacity_service.get_booked_count(service_db, pump.id, today, time(8, 0)) == 2
+
+    booking_service.delete_booking(service_db, second.id)
+    assert slot_capacity_service.get_booked_count(service_db, pump.id, today, time(8, 0)) == 1
+
+def test_reactivation_rejects_full_slot(service_db):
+    """Test a released booking cannot take its slot back once the slot is full"""
+    pump = create_pump(service_db, booked_lanes=1)
+    today = date.today()
+    capacity = slot_capacity_service.get_slot_capacity(pump)
+
+    cancelled = create_booking(service_db, pump, today, time(14, 0))
+    booking_service.cancel_booking(service_db, cancelled.id)
+    for _ in range(capacity):
+        booking_service.create_booking(service_db, booking_request(pump.id, today, time(14, 0)), capacity)
+
+    with pytest.raises(SlotUnavailableError):
+        booking_service.update_booking(service_db, cancelled.id, BookingUpdate(booking_status="active"))
+    assert booking_service.get_booking_by_id(service_db, cancelled.id).booking_status == "cancelled"
+    assert slot_capacity_service.get_booked_count(service_db, pump.id, today, time(14, 0)) == capacity
+
+def test_create_slot_counters_migration(service_db):
+    """Test the migration creates the counters table and backfills it from bookings"""
+    pump = create_pump(service_db)
+    today = date.today()
+    create_booking(service_db, pump, today, time(11, 0))
+    create_booking(service_db, pump, today, time(11, 0))
+    create_booking(service_db, pump, today, time(12, 0), booking_status="cancelled")
+
+    service_db.commit()
+    SlotCounter.__table__.drop(service_db.get_bind())
+
+    assert create_slot_counters(service_db.get_bind()) == 1
+    assert create_slot_counters(service_db.get_bind()) == 1
+    assert slot_capacity_service.get_booked_count(service_db, pump.id, today, time(11, 0)) == 2
+    assert slot_capacity_service.get_booked_count(service_db, pump.id, today, time(12, 0)) == 0
+
+def test_reserve_rejects_full_slot(service_db):
+    """Test a reservation beyond capacity fails and leaves no booking behind"""
+    pump = create_pump(service_db, booked_lanes=1)
+    today = date.today()
+    capacity = slot_capacity_service.get_slot_capacity(pump)
+
+    for _ in range(capacity):
+        booking_service.create_booking(service_db, booking_request(pump.id, today, time(13, 0)), capacity)
+
+    with pytest.raises(SlotUnavailableError):
+        booking_service.create_booking(service_db, booking_request(pump.id, today, time(13, 0)), capacity)
+
+    assert service_db.query(Booking).count() == capacity
+    assert slot_capacity_service.get_booked_count(service_db, pump.id, today, time(13, 0)) == capacity
+
+def test_concurrent_reservations_never_overbook(tmp_path):
+    """Fire hundreds of parallel bookings at one slot and check none is over-admitted"""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'concurrency.db'}",
+        connect_args={"check_same_thread": False, "timeout": 60},
+        pool_size=32,
+        max_overflow=0
+    )
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    setup_db = SessionLocal()
+    pump = create_pump(setup_db, booked_lanes=2)
+    pump_id = pump.id
+    capacity = slot_capacity_service.get_slot_capacity(pump)
+    setup_db.close()
+    today = date.today()
+
+    def attempt(_):
+        db = SessionLocal()
+        try:
+            booking_service.create_booking(db, booking_request(pump_id, today, time(9, 0)), capacity)
+            return True
+        except SlotUnavailableError:
+            return False
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        results = list(executor.map(attempt, range(300)))
+
+    check_db = SessionLocal()
+    try:
+        assert results.count(True) == capacity
+        assert results.count(False) == 300 - capacity
+        assert check_db.query(Booking).count() == capacity
+        assert slot_capacity_service.get_booked_count(check_db, pump_id, today, time(9, 0)) == capacity
+    finally:
+        check_db.close()
+        engine.dispose()
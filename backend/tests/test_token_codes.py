@@ -0,0 +1,67 @@
+import pytest
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine, event
+from models.base import Base
+from models.id_block import IdBlock
+from models.token import Token
+from services.token_service import token_service
+from utils.token_codes import (
+    TOKEN_CODE_ALPHABET, TOKEN_CODE_SPACE, TokenCodeAllocator, encode_token_code, permute_sequence
+)
+
+def test_permutation_is_collision_free():
+    """Test consecutive sequence numbers map to distinct, valid codes"""
+    codes = {encode_token_code(permute_sequence(value)) for value in range(200000)}
+    assert len(codes) == 200000
+    
+    # The ends of the code space are still in range
+    for value in (0, TOKEN_CODE_SPACE - 1):
+        assert 0 <= permute_sequence(value) < TOKEN_CODE_SPACE
+
+    code = encode_token_code(permute_sequence(12345))
+    assert code.startswith("CNG-") and len(code) == 10
+    assert all(char in TOKEN_CODE_ALPHABET for char in code[4:])
+
+def test_allocators_share_the_sequence(tmp_path):
+    """Test workers with their own allocators never hand out the same code"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'codes.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    workers = [TokenCodeAllocator(block_size=7) for _ in range(4)]
+    try:
+        def allocate(allocator):
+            return [allocator.next_code(engine) for _ in range(50)]
+        
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            batches = list(pool.map(allocate, workers * 2))
+        
+        codes = [code for batch in batches for code in batch]
+        assert len(codes) == len(set(codes)) == 400
+    finally:
+        engine.dispose()
+
+def test_generate_e_token_does_not_probe_tokens(service_db):
+    """Test token creation never looks up codes in the tokens table"""
+    statements = []
+    event.listen(service_db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    
+    tokens = [token_service.generate_e_token(service_db, f"00000000-0000-0000-0000-00000000000{i}") for i in range(3)]
+    
+    assert len({token.token_code for token in tokens}) == 3
+    assert not [sql for sql in statements if "tokens.token_code =" in sql]
+
+def test_generate_e_token_retries_on_existing_code(service_db):
+    """Test a sequence code that matches an older random code is skipped"""
+    from utils.token_codes import token_code_allocator
+    
+    token_code_allocator._blocks.clear()
+    value = token_code_allocator.next_value(service_db.get_bind())
+    taken_code = encode_token_code(permute_sequence(value + 1))
+    service_db.add(Token(
+        booking_id="00000000-0000-0000-0000-0000000000ab", token_code=taken_code,
+        qr_data="legacy", expiry_time=datetime.utcnow() + timedelta(minutes=20)
+    ))
+    service_db.commit()
+    
+    token = token_service.generate_e_token(service_db, "00000000-0000-0000-0000-0000000000ac")
+    assert token.token_code == encode_token_code(permute_sequence(value + 2))
@@ -0,0 +1,57 @@
+import pytest
+from datetime import datetime, timedelta
+from migrations.compact_token_qr_data import upgrade as compact_token_qr_data
+from models.token import Token
+from services.token_service import token_service
+from utils.qr_generator import generate_qr_code
+
+BOOKING_ID = "00000000-0000-0000-0000-0000000000b1"
+
+def create_token(db, token_code, qr_data):
+    token = Token(
+        booking_id=BOOKING_ID,
+        token_code=token_code,
+        qr_data=qr_data,
+        expiry_time=datetime.utcnow() + timedelta(minutes=20)
+    )
+    db.add(token)
+    db.commit()
+    return token
+
+def test_legacy_tokens_render_from_rebuilt_payload(service_db):
+    """Test tokens still holding a data URI encode the same payload as new ones"""
+    qr_image, _ = generate_qr_code(f"CNG_TOKEN:CNG-LEGACY:{BOOKING_ID}")
+    legacy = create_token(service_db, "CNG-LEGACY", f"data:image/png;base64,{qr_image}")
+    compact = create_token(service_db, "CNG-COMPCT", f"CNG_TOKEN:CNG-COMPCT:{BOOKING_ID}")
+
+    assert token_service.get_qr_payload(legacy) == f"CNG_TOKEN:CNG-LEGACY:{BOOKING_ID}"
+    assert token_service.get_qr_payload(compact) == compact.qr_data
+
+def test_qr_etag_depends_on_payload_and_options(service_db):
+    """Test ETags change with anything that changes the image bytes"""
+    token = create_token(service_db, "CNG-ETAGGD", f"CNG_TOKEN:CNG-ETAGGD:{BOOKING_ID}")
+    other = create_token(service_db, "CNG-OTHERS", f"CNG_TOKEN:CNG-OTHERS:{BOOKING_ID}")
+
+    etag = token_service.get_qr_etag(token)
+    assert etag == token_service.get_qr_etag(token, "png", 10, 4)
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag != token_service.get_qr_etag(other)
+    assert etag != token_service.get_qr_etag(token, "svg")
+    assert etag != token_service.get_qr_etag(token, "png", 5)
+    assert etag != token_service.get_qr_etag(token, "png", 10, 0)
+
+def test_compact_token_qr_data_migration(service_db):
+    """Test the migration rewrites data URIs in batches and leaves compact rows alone"""
+    qr_image, _ = generate_qr_code("legacy")
+    for i in range(5):
+        create_token(service_db, f"CNG-OLD00{i}", f"data:image/png;base64,{qr_image}")
+    create_token(service_db, "CNG-NEW000", f"CNG_TOKEN:CNG-NEW000:{BOOKING_ID}")
+
+    assert compact_token_qr_data(service_db.get_bind(), batch_size=2) == 5
+    assert compact_token_qr_data(service_db.get_bind()) == 0
+
+    service_db.expire_all()
+    payloads = {token.token_code: token.qr_data for token in service_db.query(Token).all()}
+    assert payloads["CNG-OLD003"] == f"CNG_TOKEN:CNG-OLD003:{BOOKING_ID}"
+    assert payloads["CNG-NEW000"] == f"CNG_TOKEN:CNG-NEW000:{BOOKING_ID}"
+    assert all(not qr_data.startswith("data:") for qr_data in payloads.values())
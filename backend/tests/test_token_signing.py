@@ -0,0 +1,115 @@
+import pytest
+from datetime import date, datetime, time, timedelta
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from models.booking import Booking
+from models.token import Token, TokenScan
+from schemas.token import TokenScanCreate
+from services.token_service import token_service
+from utils.token_signing import (
+    OFFLINE_SCAN_ACCEPTED, TokenSigner, TokenVerifier, encode_public_key, load_signing_key, token_signer
+)
+
+PUMP_ID = "00000000-0000-0000-0000-0000000000d1"
+BOOKING_ID = "00000000-0000-0000-0000-0000000000d2"
+SCANNER_ID = "00000000-0000-0000-0000-0000000000d3"
+
+def test_verifier_accepts_signed_payloads_once():
+    """Test a signed payload verifies at its pump, and only once"""
+    signer = TokenSigner(Ed25519PrivateKey.generate())
+    verifier = TokenVerifier(encode_public_key(signer.public_key), pump_id=PUMP_ID)
+    payload = signer.sign("CNG-SIGNED", BOOKING_ID, PUMP_ID, datetime.utcnow() + timedelta(minutes=20))
+
+    result = verifier.verify(payload)
+    assert result["valid"]
+    assert result["token"].booking_id == BOOKING_ID
+
+    record = verifier.scan(payload, SCANNER_ID)
+    assert record["result"] == OFFLINE_SCAN_ACCEPTED
+    assert record["token_code"] == "CNG-SIGNED"
+    assert verifier.scan(payload, SCANNER_ID)["validation"]["message"] == "Token already used"
+
+def test_verifier_rejects_bad_payloads():
+    """Test tampered, foreign, expired and unsigned payloads are rejected"""
+    signer = TokenSigner(Ed25519PrivateKey.generate())
+    verifier = TokenVerifier(signer.public_key, pump_id=PUMP_ID)
+    payload = signer.sign("CNG-SIGNED", BOOKING_ID, PUMP_ID, datetime.utcnow() + timedelta(minutes=20))
+
+    assert verifier.verify(payload.replace("CNG-SIGNED", "CNG-FORGED"))["message"] == "Invalid token"
+    assert TokenVerifier(Ed25519PrivateKey.generate().public_key()).verify(payload)["message"] == "Invalid token"
+    assert TokenVerifier(signer.public_key, pump_id=BOOKING_ID).verify(payload)["message"] == "Token is for another pump"
+    assert verifier.verify(payload, now=datetime.utcnow() + timedelta(hours=1))["message"] == "Token expired"
+    assert verifier.verify(f"CNG_TOKEN:CNG-SIGNED:{BOOKING_ID}")["message"] == "Unsigned token, validate online"
+
+def test_signing_key_must_be_configured():
+    """Test the key is only derived from SECRET_KEY when explicitly allowed"""
+    with pytest.raises(RuntimeError):
+        load_signing_key("", allow_derived_key=False)
+    assert load_signing_key("", allow_derived_key=True)
+
+def test_offline_scans_sync_completes_bookings(service_db):
+    """Test generated tokens verify offline and synced scans complete their bookings"""
+    booking = Booking(
+        id=BOOKING_ID, user_id=SCANNER_ID, pump_id=PUMP_ID,
+        slot_date=date.today(), slot_time=time(hour=9), amount=400.0, confirmation_status="coming"
+    )
+    service_db.add(booking)
+    service_db.commit()
+    token = token_service.generate_e_token(service_db, BOOKING_ID)
+
+    verifier = TokenVerifier(token_signer.public_key, pump_id=PUMP_ID)
+    record = verifier.scan(token.qr_data, SCANNER_ID)
+    assert record["result"] == OFFLINE_SCAN_ACCEPTED
+
+    scans = [TokenScanCreate(**record), TokenScanCreate(**record),
+             TokenScanCreate(scanned_by=SCANNER_ID, token_code="CNG-UNKNWN", result=OFFLINE_SCAN_ACCEPTED)]
+    results = token_service.sync_offline_scans(service_db, scans)
+    assert [result["status"] for result in results] == ["completed", "conflict", "unknown_token"]
+
+    service_db.expire_all()
+    assert service_db.get(Token, token.id).status == "used"
+    assert service_db.get(Booking, BOOKING_ID).booking_status == "completed"
+    assert service_db.query(TokenScan).count() == 2
+    assert token_service.validate_token(service_db, token.token_code)["message"] == "Token already used"
+
+def test_offline_scans_sync_rejects_unverified_scans(service_db):
+    """Test synced scans only complete bookings after the server repeats the online checks"""
+    bookings = {}
+    for index, (confirmation_status, booking_status) in enumerate(
+        [("coming", "active"), ("coming", "active"), ("pending", "active"), ("coming", "cancelled"), ("coming", "active")]
+    ):
+        booking = Booking(
+            id=f"00000000-0000-0000-0000-0000000000e{index}", user_id=SCANNER_ID, pump_id=PUMP_ID,
+            slot_date=date.today(), slot_time=time(hour=10), amount=400.0,
+            confirmation_status=confirmation_status, booking_status=booking_status
+        )
+        service_db.add(booking)
+        bookings[index] = booking
+    service_db.commit()
+    tokens = [token_service.generate_e_token(service_db, bookings[index].id) for index in range(5)]
+
+    verifier = TokenVerifier(token_signer.public_key, pump_id=PUMP_ID)
+    records = [verifier.scan(token.qr_data, SCANNER_ID) for token in tokens]
+    forged = TokenSigner(Ed25519PrivateKey.generate()).sign(
+        tokens[0].token_code, bookings[0].id, PUMP_ID, tokens[0].expiry_time
+    )
+    scans = [
+        TokenScanCreate(**{**records[0], "qr_payload": forged}),
+        TokenScanCreate(**{**records[1], "scan_time": tokens[1].expiry_time + timedelta(minutes=1)}),
+        TokenScanCreate(**records[2]),
+        TokenScanCreate(**records[3]),
+        TokenScanCreate(**{**records[4], "qr_payload": None}),
+    ]
+    results = token_service.sync_offline_scans(service_db, scans)
+    assert [result["status"] for result in results] == ["rejected"] * 5
+    assert [result["message"] for result in results] == [
+        "Invalid token signature",
+        "Token expired",
+        "Booking not confirmed as coming",
+        "Booking cancelled",
+        "Invalid token signature",
+    ]
+
+    service_db.expire_all()
+    assert service_db.query(TokenScan).count() == 5
+    assert all(service_db.get(Token, token.id).status == "valid" for token in tokens)
+    assert service_db.get(Booking, bookings[3].id).booking_status == "cancelled"
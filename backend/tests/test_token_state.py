@@ -0,0 +1,176 @@
+import pytest
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import event
+from models.booking import Booking
+from models.token import Token, TokenScan
+from schemas.booking import BookingCreate, BookingUpdate
+from schemas.token import TokenScanCreate
+from services.booking_service import booking_service
+from services.slot_capacity_service import slot_capacity_service
+from services.token_service import token_service
+
+def count_queries(db):
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+def create_token(db, token_code, expiry_time=None):
+    booking = Booking(
+        user_id="00000000-0000-0000-0000-0000000000c1",
+        pump_id="00000000-0000-0000-0000-0000000000c2",
+        slot_date=date.today(),
+        slot_time=time(hour=10),
+        amount=500.0
+    )
+    db.add(booking)
+    db.commit()
+    token = Token(
+        booking_id=booking.id,
+        token_code=token_code,
+        qr_data=f"CNG_TOKEN:{token_code}:{booking.id}",
+        expiry_time=expiry_time or datetime.utcnow() + timedelta(minutes=20)
+    )
+    db.add(token)
+    db.commit()
+    return token
+
+def test_valid_tokens_are_checked_against_the_database(service_db):
+    """Test a valid state is never cached, so a use through another worker is seen at once"""
+    token_service.token_state_cache.clear()
+    token = create_token(service_db, "CNG-STATE1")
+
+    result = token_service.validate_token(service_db, "CNG-STATE1")
+    assert result["valid"]
+    assert str(result["token"].pump_id) == "00000000-0000-0000-0000-0000000000c2"
+    assert result["token"].confirmation_status == "pending"
+
+    # Another worker uses the token without touching this worker's cache
+    service_db.query(Token).filter(Token.id == token.id).update({Token.status: "used"})
+    service_db.commit()
+    assert token_service.validate_token(service_db, "CNG-STATE1")["message"] == "Token already used"
+
+    statements = count_queries(service_db)
+    assert token_service.validate_token(service_db, "CNG-STATE1")["message"] == "Token already used"
+    assert statements == []
+
+def test_use_token_writes_through(service_db):
+    """Test a used token is reported as used straight after use_token"""
+    token_service.token_state_cache.clear()
+    token = create_token(service_db, "CNG-STATE2")
+    assert token_service.validate_token(service_db, "CNG-STATE2")["valid"]
+
+    token_service.use_token(service_db, token.id)
+    statements = count_queries(service_db)
+    assert token_service.validate_token(service_db, "CNG-STATE2")["message"] == "Token already used"
+    assert token_service.scan_token_and_complete_booking(service_db, "CNG-STATE2")["message"] == "Token already used"
+    assert statements == []
+
+def test_booking_changes_refresh_token_state(service_db):
+    """Test confirming arrival is visible in the cached token state"""
+    token_service.token_state_cache.clear()
+    token = create_token(service_db, "CNG-STATE3")
+    assert token_service.get_token_state(service_db, "CNG-STATE3").confirmation_status == "pending"
+
+    booking_service.update_booking(service_db, token.booking_id, BookingUpdate(confirmation_status="coming"))
+    assert token_service.get_token_state(service_db, "CNG-STATE3").confirmation_status == "coming"
+
+def test_validation_never_writes(service_db):
+    """Test a token past its expiry is reported as expired without an UPDATE"""
+    token_service.token_state_cache.clear()
+    token = create_token(service_db, "CNG-STATE4", expiry_time=datetime.utcnow() - timedelta(minutes=1))
+
+    statements = count_queries(service_db)
+    assert token_service.validate_token(service_db, "CNG-STATE4")["message"] == "Token expired"
+    assert all(sql.startswith("SELECT") for sql in statements)
+
+def test_expiry_sweeper_expires_tokens_and_bookings(service_db):
+    """Test the sweeper expires tokens in chunks, cascades to bookings and releases their slots"""
+    token_service.token_state_cache.clear()
+    slot_date = date.today() + timedelta(days=1)
+    expired_at = datetime.utcnow() - timedelta(minutes=1)
+    pump_id = "00000000-0000-0000-0000-0000000000c2"
+
+    tokens = []
+    for i, booking_status in enumerate(["active", "confirmed", "completed", "active"]):
+        booking = booking_service.create_booking(service_db, BookingCreate(
+            user_id="00000000-0000-0000-0000-0000000000c1", pump_id=pump_id, slot_date=slot_date,
+            slot_time=time(hour=10), amount=500.0, booking_status=booking_status
+        ))
+        expiry_time = expired_at if i < 3 else datetime.utcnow() + timedelta(minutes=20)
+        token = Token(booking_id=booking.id, token_code=f"CNG-SWEEP{i}", qr_data="sweep", expiry_time=expiry_time)
+        service_db.add(token)
+        service_db.commit()
+        tokens.append(token)
+    assert token_service.get_token_state(service_db, "CNG-SWEEP0").booking_status == "active"
+    assert slot_capacity_service.get_booked_count(service_db, pump_id, slot_date, time(hour=10)) == 4
+
+    result = token_service.expire_tokens(service_db, batch_size=2)
+    assert (result["tokens"], result["bookings"], result["batches"]) == (3, 2, 2)
+    assert result["duration_seconds"] >= 0
+    assert token_service.expire_tokens(service_db)["tokens"] == 0
+
+    service_db.expire_all()
+    assert [service_db.get(Token, token.id).status for token in tokens] == ["expired", "expired", "expired", "valid"]
+    assert [service_db.get(Booking, token.booking_id).booking_status for token in tokens] == \
+        ["expired", "expired", "completed", "active"]
+    assert slot_capacity_service.get_booked_count(service_db, pump_id, slot_date, time(hour=10)) == 2
+    assert token_service.get_token_state(service_db, "CNG-SWEEP0").booking_status == "expired"
+
+def test_scan_completes_booking_in_one_transaction(service_db):
+    """Test a scan uses the token, completes the booking and records the scan with one commit"""
+    token_service.token_state_cache.clear()
+    token = create_token(service_db, "CNG-STATE5")
+    booking_id = token.booking_id
+    assert token_service.scan_token_and_complete_booking(service_db, "CNG-STATE5")["message"] == \
+        "Booking not confirmed as coming"
+    booking_service.update_booking(service_db, booking_id, BookingUpdate(confirmation_status="coming"))
+
+    commits = []
+    event.listen(service_db, "after_commit", lambda session: commits.append(session))
+    statements = count_queries(service_db)
+    result = token_service.scan_token_and_complete_booking(service_db, "CNG-STATE5")
+    assert result["success"]
+    assert len(commits) == 1
+    assert len([sql for sql in statements if sql.startswith("SELECT")]) == 1
+
+    service_db.expire_all()
+    assert service_db.get(Token, token.id).status == "used"
+    assert service_db.get(Booking, booking_id).booking_status == "completed"
+    assert service_db.query(TokenScan).filter(TokenScan.token_id == token.id).one().result == "completion"
+    assert token_service.validate_token(service_db, "CNG-STATE5")["message"] == "Token already used"
+
+def test_scan_rejects_released_bookings(service_db):
+    """Test a scan does not complete a cancelled booking or take its slot back"""
+    token_service.token_state_cache.clear()
+    token = create_token(service_db, "CNG-STATE6")
+    booking = service_db.get(Booking, token.booking_id)
+    booking.confirmation_status = "coming"
+    booking.booking_status = "cancelled"
+    service_db.commit()
+
+    result = token_service.scan_token_and_complete_booking(service_db, "CNG-STATE6")
+    assert result == {"success": False, "message": "Booking cancelled"}
+
+    service_db.expire_all()
+    assert service_db.get(Token, token.id).status == "valid"
+    assert service_db.get(Booking, booking.id).booking_status == "cancelled"
+    assert slot_capacity_service.get_booked_count(service_db, booking.pump_id, booking.slot_date, booking.slot_time) == 0
+
+def test_record_scans_in_bulk(service_db):
+    """Test a scan batch is validated with one query and inserted with one statement"""
+    tokens = [create_token(service_db, f"CNG-BULK0{i}") for i in range(3)]
+    scans = [
+        TokenScanCreate(token_code=tokens[i % 3].token_code, scanned_by=tokens[0].booking_id, result="entry")
+        for i in range(300)
+    ]
+    scans.append(TokenScanCreate(token_id=tokens[1].id, scanned_by=tokens[0].booking_id, result="entry"))
+    scans.append(TokenScanCreate(token_code="CNG-NOSUCH", scanned_by=tokens[0].booking_id, result="entry"))
+
+    statements = count_queries(service_db)
+    results = token_service.record_scans(service_db, scans)
+
+    assert len([sql for sql in statements if sql.startswith("SELECT")]) == 1
+    assert len([sql for sql in statements if sql.startswith("INSERT")]) == 1
+    assert results[300] == {"index": 300, "token_code": "CNG-BULK01", "status": "recorded"}
+    assert results[301]["status"] == "unknown_token"
+    assert service_db.query(TokenScan).filter(TokenScan.token_id == tokens[1].id).count() == 101
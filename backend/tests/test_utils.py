@@ -1,5 +1,6 @@
 import pytest
-from utils.qr_generator import generate_qr_code, generate_token_code
+from utils.qr_generator import generate_qr_code, generate_token_code, render_qr
+from utils.qr_renderer import QRRenderer
 from utils.security import get_password_hash, verify_password, create_access_token
 
 def test_generate_qr_code():
@@ -12,6 +13,41 @@ def test_generate_qr_code():
     # Check that the QR code is a valid base64 string
     assert qr_image.startswith("iVBORw0KGgo") or len(qr_image) > 100
 
+def test_qr_renderer_caches_renders():
+    """Test background QR rendering is shared per key and cached"""
+    renderer = QRRenderer(workers=0)
+    try:
+        first = renderer.submit("token-1", "CNG_TOKEN:CNG-ABCDEF:booking")
+        second = renderer.submit("token-1", "CNG_TOKEN:CNG-ABCDEF:booking")
+        png = first.result(timeout=10)
+        
+        assert second.result(timeout=10) == png
+        assert png == render_qr("CNG_TOKEN:CNG-ABCDEF:booking")
+        assert renderer.render("token-1", "ignored once cached") == png
+    finally:
+        renderer.shutdown()
+
+def test_render_qr_formats():
+    """Test PNG and SVG output and the scale/border parameters"""
+    from io import BytesIO
+    from PIL import Image
+    
+    small = Image.open(BytesIO(render_qr("CNG_TOKEN:CNG-ABCDEF:booking", scale=2, border=0)))
+    large = Image.open(BytesIO(render_qr("CNG_TOKEN:CNG-ABCDEF:booking", scale=4, border=0)))
+    assert large.size == (small.size[0] * 2, small.size[1] * 2)
+    
+    svg = render_qr("CNG_TOKEN:CNG-ABCDEF:booking", image_format="svg")
+    assert b"<svg" in svg
+
+def test_qr_renderer_process_pool():
+    """Test QR codes render in worker processes"""
+    renderer = QRRenderer(workers=1)
+    try:
+        png = renderer.render("token-2", "CNG_TOKEN:CNG-GHJKLM:booking", timeout=60)
+        assert png.startswith(b"\x89PNG")
+    finally:
+        renderer.shutdown()
+
 def test_generate_token_code():
     """Test token code generation"""
     token_code = generate_token_code()
@@ -0,0 +1,253 @@
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+import logging
+import os
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Shared Redis layer for the in-process caches, off unless explicitly enabled
+CACHE_REDIS_ENABLED = os.getenv("CACHE_REDIS_ENABLED", "false").lower() in ("1", "true", "yes")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Sentinel for cache misses, so that falsy values can be cached
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe in-process LRU cache whose entries expire after a TTL.
+
+    Once ``max_size`` entries are stored, the least recently used entry is
+    evicted to make room for a new one.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 60.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class StaleWhileRevalidateCache:
+    """
+    In-process cache that keeps serving an expired value while it is refreshed.
+
+    A loaded value is fresh for ``ttl_seconds``. For ``stale_seconds`` after
+    that it is still returned, and one background refresh is started. Concurrent
+    misses for the same key share a single load. ``None`` results are not cached,
+    so failed lookups are retried.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 60.0, stale_seconds: float = 300.0,
+                 refresh_workers: int = 2):
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.refresh_workers = refresh_workers
+        self.entries = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds + stale_seconds)
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _claim(self, key: Hashable) -> Tuple[Future, bool]:
+        """Return the in-flight load for a key, and whether the caller has to run it"""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._inflight[key] = future
+            return future, True
+
+    def _load(self, key: Hashable, loader: Callable[[], Any], future: Future, ttl_seconds: float) -> Any:
+        try:
+            value = loader()
+            if value is not None:
+                self.entries.set(key, (time.monotonic() + ttl_seconds, value), ttl_seconds + self.stale_seconds)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any], ttl_seconds: float):
+        future, owner = self._claim(key)
+        if not owner:
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.refresh_workers, thread_name_prefix="cache-refresh")
+            executor = self._executor
+
+        def refresh():
+            try:
+                self._load(key, loader, future, ttl_seconds)
+            except Exception as e:
+                logger.warning(f"Background refresh failed for {key}: {str(e)}")
+
+        executor.submit(refresh)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl_seconds: Optional[float] = None) -> Any:
+        """
+        Get a value, loading it with loader on a miss.
+
+        Args:
+            key (Hashable): Cache key
+            loader (Callable[[], Any]): Loads the current value
+            ttl_seconds (float): Freshness for this value instead of the configured TTL
+
+        Returns:
+            Any: The cached, stale or freshly loaded value
+        """
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        entry = self.entries.get(key)
+        if entry is not MISSING:
+            fresh_until, value = entry
+            if time.monotonic() >= fresh_until:
+                self._refresh(key, loader, ttl_seconds)
+            return value
+
+        future, owner = self._claim(key)
+        if not owner:
+            return future.result()
+        return self._load(key, loader, future, ttl_seconds)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_redis_client(url: str = REDIS_URL):
+    """
+    Create a Redis client for the shared cache layer.
+
+    Args:
+        url (str): Redis connection URL
+
+    Returns:
+        Redis client, or None if the redis package is not installed
+    """
+    try:
+        import redis
+    except ImportError:
+        logger.warning("redis package not installed, caching in-process only")
+        return None
+    return redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+
+class TieredCache:
+    """
+    In-process TTLCache in front of an optional shared Redis layer.
+
+    Values are read from memory first, then from Redis, and a Redis hit is
+    copied into memory. Deleting a key removes it from both layers. Other
+    workers keep their own in-process copy until its (short) local TTL runs
+    out, so ``local_ttl_seconds`` bounds how stale a worker can be after an
+    invalidation. Redis errors are logged and treated as misses.
+    """
+
+    def __init__(self, namespace: str, max_size: int = 1024, local_ttl_seconds: float = 30.0,
+                 shared_ttl_seconds: float = 300.0, serialize: Callable[[Any], str] = None,
+                 deserialize: Callable[[str], Any] = None, redis_client: Any = None):
+        self.namespace = namespace
+        self.local = TTLCache(max_size=max_size, ttl_seconds=local_ttl_seconds)
+        self.shared_ttl_seconds = shared_ttl_seconds
+        self.serialize = serialize
+        self.deserialize = deserialize
+        self.redis = redis_client
+        if self.redis is None and CACHE_REDIS_ENABLED and serialize and deserialize:
+            self.redis = get_redis_client()
+
+    def _redis_key(self, key: Hashable) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        value = self.local.get(key)
+        if value is not MISSING:
+            return value
+        if self.redis is None:
+            return default
+
+        try:
+            raw = self.redis.get(self._redis_key(key))
+        except Exception as e:
+            logger.warning(f"Redis cache read failed for {self._redis_key(key)}: {str(e)}")
+            return default
+        if raw is None:
+            return default
+
+        value = self.deserialize(raw)
+        self.local.set(key, value)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """Store a value in both layers, optionally with a TTL other than the configured ones"""
+        self.local.set(key, value, ttl_seconds)
+        if self.redis is None:
+            return
+        try:
+            ex = int(self.shared_ttl_seconds if ttl_seconds is None else ttl_seconds)
+            self.redis.set(self._redis_key(key), self.serialize(value), ex=max(ex, 1))
+        except Exception as e:
+            logger.warning(f"Redis cache write failed for {self._redis_key(key)}: {str(e)}")
+
+    def delete(self, key: Hashable):
+        self.local.delete(key)
+        if self.redis is None:
+            return
+        try:
+            self.redis.delete(self._redis_key(key))
+        except Exception as e:
+            logger.warning(f"Redis cache delete failed for {self._redis_key(key)}: {str(e)}")
+
+    def clear(self):
+        """Clear the in-process layer. Shared entries expire on their own TTL."""
+        self.local.clear()
@@ -1,71 +1,155 @@
 import requests
+from requests.adapters import HTTPAdapter
+import logging
 import os
 from dotenv import load_dotenv
 from typing import Optional, Dict, Any
+from utils.cache import StaleWhileRevalidateCache
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Provider endpoints, overridable to point at a proxy or a local stub
+GOOGLE_MAPS_API_URL = os.getenv("GOOGLE_MAPS_API_URL", "https://maps.googleapis.com/maps/api")
+WEATHER_API_URL = os.getenv("WEATHER_API_URL", "https://api.openweathermap.org/data/2.5")
+
+# Seconds to wait for Google Maps or OpenWeatherMap before giving up
+EXTERNAL_API_TIMEOUT_SECONDS = float(os.getenv("EXTERNAL_API_TIMEOUT_SECONDS", "5"))
+EXTERNAL_API_POOL_SIZE = int(os.getenv("EXTERNAL_API_POOL_SIZE", "10"))
+
+# Lookups are cached per geo cell: coordinates are rounded to this many decimal
+# places, and 2 places is a cell of about 1 km
+EXTERNAL_API_GEO_PRECISION = int(os.getenv("EXTERNAL_API_GEO_PRECISION", "2"))
+
+# Seconds a result is fresh, and how long after that a stale result is still
+# served while it is refreshed in the background
+WEATHER_CACHE_TTL_SECONDS = float(os.getenv("WEATHER_CACHE_TTL_SECONDS", "600"))
+DISTANCE_CACHE_TTL_SECONDS = float(os.getenv("DISTANCE_CACHE_TTL_SECONDS", "86400"))
+TRAFFIC_CACHE_TTL_SECONDS = float(os.getenv("TRAFFIC_CACHE_TTL_SECONDS", "300"))
+EXTERNAL_API_STALE_SECONDS = float(os.getenv("EXTERNAL_API_STALE_SECONDS", "1800"))
+EXTERNAL_API_CACHE_SIZE = int(os.getenv("EXTERNAL_API_CACHE_SIZE", "10000"))
+
 class ExternalAPIService:
-    def __init__(self):
-        self.google_maps_api_key = os.getenv("GOOGLE_MAPS_API_KEY")
-        self.weather_api_key = os.getenv("WEATHER_API_KEY")
+    """
+    Client for Google Maps and OpenWeatherMap.
+    
+    Requests share a pooled HTTP session. Results are cached per geo cell with
+    stale-while-revalidate, and concurrent identical lookups share one request.
+    """
     
-    def get_distance_and_duration(self, origin: str, destination: str) -> Optional[Dict[str, Any]]:
+    def __init__(self, google_maps_api_key: Optional[str] = None, weather_api_key: Optional[str] = None,
+                 google_maps_api_url: str = GOOGLE_MAPS_API_URL, weather_api_url: str = WEATHER_API_URL,
+                 stale_seconds: float = EXTERNAL_API_STALE_SECONDS):
+        self.google_maps_api_key = google_maps_api_key or os.getenv("GOOGLE_MAPS_API_KEY")
+        self.weather_api_key = weather_api_key or os.getenv("WEATHER_API_KEY")
+        self.google_maps_api_url = google_maps_api_url.rstrip("/")
+        self.weather_api_url = weather_api_url.rstrip("/")
+        self.cache = StaleWhileRevalidateCache(
+            max_size=EXTERNAL_API_CACHE_SIZE,
+            ttl_seconds=WEATHER_CACHE_TTL_SECONDS,
+            stale_seconds=stale_seconds
+        )
+        
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=EXTERNAL_API_POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+    
+    def _cell(self, latitude: float, longitude: float) -> str:
+        return f"{round(float(latitude), EXTERNAL_API_GEO_PRECISION)},{round(float(longitude), EXTERNAL_API_GEO_PRECISION)}"
+    
+    def _location_key(self, location: str) -> str:
+        """Geo cell of a "lat,lng" location, or the normalized address"""
+        parts = location.split(",")
+        if len(parts) == 2:
+            try:
+                return self._cell(float(parts[0]), float(parts[1]))
+            except ValueError:
+                pass
+        return " ".join(location.lower().split())
+    
+    def get_distance_and_duration(self, origin: str, destination: str,
+                                  departure_time: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
         Get distance and estimated travel time between two locations using Google Maps API.
         
+        Results are cached per origin/destination cell pair. Lookups with a
+        departure_time include traffic and are cached for a shorter time.
+        
         Args:
             origin (str): Starting location
             destination (str): Destination location
-            
+            departure_time (str): "now" or a timestamp, to also get the travel time in traffic
+        
         Returns:
-            Optional[Dict[str, Any]]: Dictionary with distance and duration, or None if failed
+            Optional[Dict[str, Any]]: Dictionary with distance and duration, plus
+            duration_in_traffic when departure_time is given, or None if failed
         """
         if not self.google_maps_api_key:
-            print("Google Maps API key not configured")
+            logger.warning("Google Maps API key not configured")
             return None
-            
+        
+        key = ("distance", self._location_key(origin), self._location_key(destination), departure_time)
+        ttl_seconds = TRAFFIC_CACHE_TTL_SECONDS if departure_time else DISTANCE_CACHE_TTL_SECONDS
+        return self.cache.get_or_load(
+            key, lambda: self._fetch_distance_and_duration(origin, destination, departure_time), ttl_seconds
+        )
+    
+    def _fetch_distance_and_duration(self, origin: str, destination: str,
+                                     departure_time: Optional[str]) -> Optional[Dict[str, Any]]:
         try:
-            url = "https://maps.googleapis.com/maps/api/distancematrix/json"
+            url = f"{self.google_maps_api_url}/distancematrix/json"
             params = {
                 "origins": origin,
                 "destinations": destination,
                 "key": self.google_maps_api_key
             }
+            if departure_time:
+                params["departure_time"] = departure_time
             
-            response = requests.get(url, params=params)
+            response = self.session.get(url, params=params, timeout=EXTERNAL_API_TIMEOUT_SECONDS)
             data = response.json()
             
             if data["status"] == "OK" and data["rows"]:
                 element = data["rows"][0]["elements"][0]
                 if element["status"] == "OK":
-                    return {
+                    result = {
                         "distance": element["distance"]["value"],  # in meters
                         "duration": element["duration"]["value"]   # in seconds
                     }
+                    if "duration_in_traffic" in element:
+                        result["duration_in_traffic"] = element["duration_in_traffic"]["value"]  # in seconds
+                    return result
             
             return None
         except Exception as e:
-            print(f"Error getting distance and duration: {str(e)}")
+            logger.error(f"Error getting distance and duration: {str(e)}")
             return None
     
     def get_weather_data(self, lat: float, lng: float) -> Optional[Dict[str, Any]]:
         """
         Get weather data for a location using OpenWeatherMap API.
         
+        Results are cached per geo cell of about 1 km.
+        
         Args:
             lat (float): Latitude
             lng (float): Longitude
-            
+        
         Returns:
             Optional[Dict[str, Any]]: Dictionary with weather data, or None if failed
         """
         if not self.weather_api_key:
-            print("Weather API key not configured")
+            logger.warning("Weather API key not configured")
             return None
-            
+        
+        key = ("weather", self._cell(lat, lng))
+        return self.cache.get_or_load(key, lambda: self._fetch_weather_data(lat, lng), WEATHER_CACHE_TTL_SECONDS)
+    
+    def _fetch_weather_data(self, lat: float, lng: float) -> Optional[Dict[str, Any]]:
         try:
-            url = "https://api.openweathermap.org/data/2.5/weather"
+            url = f"{self.weather_api_url}/weather"
             params = {
                 "lat": lat,
                 "lon": lng,
@@ -73,7 +157,7 @@ class ExternalAPIService:
                 "units": "metric"
             }
             
-            response = requests.get(url, params=params)
+            response = self.session.get(url, params=params, timeout=EXTERNAL_API_TIMEOUT_SECONDS)
             data = response.json()
             
             if "weather" in data and "main" in data:
@@ -86,8 +170,12 @@ class ExternalAPIService:
             
             return None
         except Exception as e:
-            print(f"Error getting weather data: {str(e)}")
+            logger.error(f"Error getting weather data: {str(e)}")
             return None
+    
+    def close(self):
+        self.cache.shutdown()
+        self.session.close()
 
 # Global instance
-external_api_service = ExternalAPIService()
\ No newline at end of file
+external_api_service = ExternalAPIService()
@@ -0,0 +1,297 @@
+from math import radians, cos, sin, asin, sqrt, floor
+from threading import RLock
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import numpy as np
+
+# Mean radius of the earth in kilometers
+EARTH_RADIUS_KM = 6371.0
+
+# Length of one degree of latitude in kilometers
+KM_PER_DEGREE = 111.195
+
+# Half the circumference of the earth, the largest possible great circle distance
+MAX_DISTANCE_KM = 20015.1
+
+
+def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Calculate the great circle distance between two points on earth.
+
+    Args:
+        lat1 (float): Latitude of the first point in decimal degrees
+        lon1 (float): Longitude of the first point in decimal degrees
+        lat2 (float): Latitude of the second point in decimal degrees
+        lon2 (float): Longitude of the second point in decimal degrees
+
+    Returns:
+        float: Distance in kilometers
+    """
+    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
+    c = 2 * asin(min(1.0, sqrt(a)))
+
+    return c * EARTH_RADIUS_KM
+
+
+def haversine_vector(latitude, longitude, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """
+    Vectorized haversine distance.
+
+    All arguments broadcast against each other, so this scores one location
+    against many pumps or many (location, pump) pairs in a single call.
+
+    Args:
+        latitude: Latitude(s) of the origin in decimal degrees
+        longitude: Longitude(s) of the origin in decimal degrees
+        latitudes (np.ndarray): Latitudes of the targets in decimal degrees
+        longitudes (np.ndarray): Longitudes of the targets in decimal degrees
+
+    Returns:
+        np.ndarray: Distances in kilometers
+    """
+    lat1 = np.radians(latitude)
+    lon1 = np.radians(longitude)
+    lat2 = np.radians(latitudes)
+    lon2 = np.radians(longitudes)
+
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class PumpGeoIndex:
+    """
+    In-memory grid index of pump coordinates.
+
+    Coordinates live in float64 column arrays kept alongside a list of pump
+    ids, so distances are computed with one NumPy call over all candidates.
+    Pumps are also bucketed into fixed size latitude/longitude cells so that
+    a radius query only scores pumps in cells overlapping the search circle
+    instead of every pump in the system.
+    """
+
+    def __init__(self, cell_size_degrees: float = 0.25, initial_capacity: int = 1024):
+        self.cell_size = cell_size_degrees
+        self.lon_cells = int(round(360.0 / cell_size_degrees))
+        self._ids: List[Any] = []
+        self._latitudes = np.empty(initial_capacity, dtype=np.float64)
+        self._longitudes = np.empty(initial_capacity, dtype=np.float64)
+        self._rows: Dict[str, int] = {}
+        self._cells: Dict[Tuple[int, int], Set[str]] = {}
+        self._lock = RLock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _cell_for(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        row = int(floor((latitude + 90.0) / self.cell_size))
+        col = int(floor((longitude + 180.0) / self.cell_size)) % self.lon_cells
+        return row, col
+
+    def _grow(self, size: int):
+        capacity = len(self._latitudes)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        latitudes = np.empty(capacity, dtype=np.float64)
+        longitudes = np.empty(capacity, dtype=np.float64)
+        latitudes[:len(self._ids)] = self._latitudes[:len(self._ids)]
+        longitudes[:len(self._ids)] = self._longitudes[:len(self._ids)]
+        self._latitudes, self._longitudes = latitudes, longitudes
+
+    def clear(self):
+        with self._lock:
+            self._ids = []
+            self._rows.clear()
+            self._cells.clear()
+
+    def upsert(self, pump_id: Any, latitude: Optional[float], longitude: Optional[float]):
+        """Add or move a pump. Pumps without coordinates are removed from the index."""
+        key = str(pump_id)
+        with self._lock:
+            self.remove(key)
+            if latitude is None or longitude is None:
+                return
+
+            latitude, longitude = float(latitude), float(longitude)
+            row = len(self._ids)
+            self._grow(row + 1)
+            self._ids.append(pump_id)
+            self._latitudes[row] = latitude
+            self._longitudes[row] = longitude
+            self._rows[key] = row
+            self._cells.setdefault(self._cell_for(latitude, longitude), set()).add(key)
+
+    def remove(self, pump_id: Any) -> bool:
+        key = str(pump_id)
+        with self._lock:
+            row = self._rows.pop(key, None)
+            if row is None:
+                return False
+
+            cell = self._cell_for(self._latitudes[row], self._longitudes[row])
+            bucket = self._cells.get(cell)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._cells[cell]
+
+            # Keep the columns dense by moving the last pump into the freed row
+            last = len(self._ids) - 1
+            if row != last:
+                moved_id = self._ids[last]
+                self._ids[row] = moved_id
+                self._latitudes[row] = self._latitudes[last]
+                self._longitudes[row] = self._longitudes[last]
+                self._rows[str(moved_id)] = row
+            self._ids.pop()
+            return True
+
+    def rebuild(self, points: Iterable[Tuple[Any, Optional[float], Optional[float]]]):
+        """Replace the index contents with the given (pump_id, latitude, longitude) rows."""
+        with self._lock:
+            self.clear()
+            for pump_id, latitude, longitude in points:
+                self.upsert(pump_id, latitude, longitude)
+
+    def _candidate_keys(self, latitude: float, longitude: float, radius_km: float) -> Iterable[str]:
+        """Return the keys of every pump in a cell that overlaps the search circle."""
+        lat_span = radius_km / KM_PER_DEGREE
+        min_lat = latitude - lat_span
+        max_lat = latitude + lat_span
+
+        # Longitude degrees shrink towards the poles, so widen the window using
+        # the latitude closest to a pole that the circle can reach.
+        widest_lat = min(90.0, max(abs(min_lat), abs(max_lat)))
+        cos_lat = cos(radians(widest_lat))
+        if widest_lat >= 90.0 or cos_lat <= 1e-9:
+            lon_span = 180.0
+        else:
+            lon_span = min(180.0, lat_span / cos_lat)
+
+        min_row, _ = self._cell_for(max(-90.0, min_lat), 0.0)
+        max_row, _ = self._cell_for(min(90.0, max_lat), 0.0)
+
+        if lon_span >= 180.0:
+            cols = range(self.lon_cells)
+        else:
+            first_col = int(floor((longitude - lon_span + 180.0) / self.cell_size))
+            last_col = int(floor((longitude + lon_span + 180.0) / self.cell_size))
+            cols = {col % self.lon_cells for col in range(first_col, last_col + 1)}
+
+        # Walk whichever side is smaller: the cell window or the occupied cells
+        window_size = (max_row - min_row + 1) * len(cols)
+        if window_size > len(self._cells):
+            col_set = set(cols)
+            for (row, col), bucket in self._cells.items():
+                if min_row <= row <= max_row and col in col_set:
+                    yield from bucket
+            return
+
+        for row in range(min_row, max_row + 1):
+            for col in cols:
+                bucket = self._cells.get((row, col))
+                if bucket:
+                    yield from bucket
+
+    def _candidate_rows(self, latitude: float, longitude: float, radius_km: float) -> np.ndarray:
+        rows = self._rows
+        return np.fromiter(
+            (rows[key] for key in self._candidate_keys(latitude, longitude, radius_km)),
+            dtype=np.intp
+        )
+
+    def query_radius(self, latitude: float, longitude: float, radius_km: float) -> List[Tuple[Any, float]]:
+        """
+        Find all pumps within a radius of a location.
+
+        Args:
+            latitude (float): Latitude of the search center
+            longitude (float): Longitude of the search center
+            radius_km (float): Search radius in kilometers
+
+        Returns:
+            List[Tuple[Any, float]]: (pump_id, distance) pairs sorted by distance
+        """
+        return self.query_radius_batch([(latitude, longitude)], radius_km)[0]
+
+    def query_radius_batch(self, locations: Sequence[Tuple[float, float]],
+                           radius_km: float) -> List[List[Tuple[Any, float]]]:
+        """
+        Find the pumps within a radius of each of many locations.
+
+        Candidate pumps for every location are gathered from the grid into
+        flat (location, pump row) pair arrays and scored with a single call
+        to the vectorized kernel.
+
+        Args:
+            locations (Sequence[Tuple[float, float]]): (latitude, longitude) search centers
+            radius_km (float): Search radius in kilometers
+
+        Returns:
+            List[List[Tuple[Any, float]]]: For each location, (pump_id, distance) pairs sorted by distance
+        """
+        if not locations:
+            return []
+
+        with self._lock:
+            candidate_rows = [self._candidate_rows(lat, lon, radius_km) for lat, lon in locations]
+            counts = np.fromiter((len(rows) for rows in candidate_rows), dtype=np.intp, count=len(locations))
+            if counts.sum() == 0:
+                return [[] for _ in locations]
+
+            origins = np.asarray(locations, dtype=np.float64)
+            pair_origins = np.repeat(np.arange(len(locations)), counts)
+            pair_rows = np.concatenate(candidate_rows)
+            distances = haversine_vector(
+                origins[pair_origins, 0],
+                origins[pair_origins, 1],
+                self._latitudes[pair_rows],
+                self._longitudes[pair_rows]
+            )
+
+            results = []
+            offsets = np.concatenate(([0], np.cumsum(counts)))
+            for i in range(len(locations)):
+                rows = pair_rows[offsets[i]:offsets[i + 1]]
+                scores = distances[offsets[i]:offsets[i + 1]]
+                inside = scores <= radius_km
+                rows, scores = rows[inside], scores[inside]
+                order = np.argsort(scores, kind="stable")
+                results.append([(self._ids[row], float(score)) for row, score in zip(rows[order], scores[order])])
+            return results
+
+    def query_nearest(self, latitude: float, longitude: float, k: int,
+                      max_distance: Optional[float] = None) -> List[Tuple[Any, float]]:
+        """
+        Find the k pumps closest to a location.
+
+        The search radius starts at one cell and doubles until it holds at
+        least k pumps. Anything outside the radius is farther away than
+        everything inside it, so the first k results are exact.
+
+        Args:
+            latitude (float): Latitude of the search center
+            longitude (float): Longitude of the search center
+            k (int): Number of pumps to return
+            max_distance (Optional[float]): Optional upper bound on distance in kilometers
+
+        Returns:
+            List[Tuple[Any, float]]: Up to k (pump_id, distance) pairs sorted by distance
+        """
+        if k <= 0:
+            return []
+
+        limit = MAX_DISTANCE_KM if max_distance is None else min(max_distance, MAX_DISTANCE_KM)
+        radius = min(self.cell_size * KM_PER_DEGREE, limit)
+
+        with self._lock:
+            total = len(self._ids)
+            while True:
+                results = self.query_radius(latitude, longitude, radius)
+                if len(results) >= k or len(results) == total or radius >= limit:
+                    return results[:k]
+                radius = min(radius * 2, limit)
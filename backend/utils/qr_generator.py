@@ -1,18 +1,20 @@
 import qrcode
+from qrcode.image.svg import SvgPathImage
 from io import BytesIO
 import base64
 from typing import Tuple
+from utils.token_codes import TOKEN_CODE_ALPHABET, TOKEN_CODE_LENGTH, TOKEN_CODE_PREFIX, token_code_allocator
 
-def generate_qr_code(data: str, size: Tuple[int, int] = (300, 300)) -> Tuple[str, str]:
+def render_qr_png(data: str, size: Tuple[int, int] = (300, 300)) -> bytes:
     """
-    Generate a QR code from the provided data.
+    Render a QR code as PNG bytes.
     
     Args:
         data (str): The data to encode in the QR code
         size (Tuple[int, int]): The size of the QR code image (width, height)
         
     Returns:
-        Tuple[str, str]: A tuple containing the QR code as base64 string and the data
+        bytes: The PNG encoded image
     """
     # Create QR code instance
     qr = qrcode.QRCode(
@@ -32,42 +34,71 @@ def generate_qr_code(data: str, size: Tuple[int, int] = (300, 300)) -> Tuple[str
     # Resize image
     img = img.resize(size)
     
-    # Convert to base64
     buffered = BytesIO()
     img.save(buffered, format="PNG")
-    img_str = base64.b64encode(buffered.getvalue()).decode()
+    return buffered.getvalue()
+
+def render_qr(data: str, image_format: str = "png", scale: int = 10, border: int = 4) -> bytes:
+    """
+    Render a QR code at its natural size as PNG or SVG.
     
-    return img_str, data
+    Args:
+        data (str): The data to encode in the QR code
+        image_format (str): "png" or "svg"
+        scale (int): Size of one QR module, in pixels for PNG and in mm/10 for SVG
+        border (int): Width of the quiet zone around the code, in modules
+        
+    Returns:
+        bytes: The encoded image
+    """
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=scale,
+        border=border,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    
+    buffered = BytesIO()
+    if image_format == "svg":
+        img = qr.make_image(image_factory=SvgPathImage)
+        img.save(buffered)
+    else:
+        img = qr.make_image(fill_color="black", back_color="white")
+        img.save(buffered, format="PNG")
+    return buffered.getvalue()
 
-def generate_token_code(db_session=None) -> str:
+def generate_qr_code(data: str, size: Tuple[int, int] = (300, 300)) -> Tuple[str, str]:
     """
-    Generate a unique token code.
+    Generate a QR code from the provided data.
     
     Args:
-        db_session: Optional database session to check for uniqueness
+        data (str): The data to encode in the QR code
+        size (Tuple[int, int]): The size of the QR code image (width, height)
         
     Returns:
-        str: A unique token code in the format CNG-XXXXXX
+        Tuple[str, str]: A tuple containing the QR code as base64 string and the data
     """
-    import random
+    img_str = base64.b64encode(render_qr_png(data, size)).decode()
+    return img_str, data
+
+def generate_token_code(db_session=None) -> str:
+    """
+    Generate a unique token code.
     
-    chars = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+    With a database session the code is taken from the token code sequence
+    (see utils.token_codes), which is unique without querying the tokens table.
     
-    # Try up to 10 times to generate a unique code
-    for _ in range(10):
-        result = 'CNG-'
-        for _ in range(6):
-            result += random.choice(chars)
+    Args:
+        db_session: Optional database session whose database issues the code
         
-        # If we have a database session, check if the code already exists
-        if db_session:
-            from models.token import Token
-            existing_token = db_session.query(Token).filter(Token.token_code == result).first()
-            if not existing_token:
-                return result
-        else:
-            # If no database session, just return the generated code
-            return result
+    Returns:
+        str: A token code in the format CNG-XXXXXX
+    """
+    if db_session is not None:
+        return token_code_allocator.next_code(db_session.get_bind())
     
-    # If we couldn't generate a unique code after 10 tries, raise an exception
-    raise Exception("Could not generate unique token code after 10 attempts")
\ No newline at end of file
+    # Without a database, fall back to a random code
+    import random
+    return TOKEN_CODE_PREFIX + ''.join(random.choice(TOKEN_CODE_ALPHABET) for _ in range(TOKEN_CODE_LENGTH))
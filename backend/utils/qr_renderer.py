@@ -0,0 +1,110 @@
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from threading import RLock
+from typing import Dict, Optional
+import asyncio
+import logging
+import multiprocessing
+import os
+from dotenv import load_dotenv
+from utils.cache import TTLCache, MISSING
+from utils.qr_generator import render_qr
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Worker processes per API/Celery process that render QR codes. 0 renders on a
+# background thread instead, which is enough for tests and small deployments.
+QR_RENDER_WORKERS = int(os.getenv("QR_RENDER_WORKERS", "2"))
+QR_CACHE_SIZE = int(os.getenv("QR_CACHE_SIZE", "2048"))
+QR_CACHE_TTL_SECONDS = float(os.getenv("QR_CACHE_TTL_SECONDS", "3600"))
+QR_RENDER_TIMEOUT_SECONDS = float(os.getenv("QR_RENDER_TIMEOUT_SECONDS", "10"))
+
+
+class QRRenderer:
+    """
+    Renders QR code images off the request path and caches them by key.
+
+    Rendering runs in a process pool that is created on first use. The pool
+    uses the spawn start method because API workers already run threads.
+    Concurrent requests for the same key share one render.
+    """
+
+    def __init__(self, workers: int = QR_RENDER_WORKERS, cache_size: int = QR_CACHE_SIZE,
+                 cache_ttl_seconds: float = QR_CACHE_TTL_SECONDS):
+        self.workers = workers
+        self.cache = TTLCache(max_size=cache_size, ttl_seconds=cache_ttl_seconds)
+        self._executor: Optional[Executor] = None
+        self._pending: Dict[str, Future] = {}
+        self._lock = RLock()
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.workers > 0:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="qr-render")
+        return self._executor
+
+    def _finish(self, key: str, future: Future):
+        if not future.cancelled():
+            if future.exception() is not None:
+                logger.error(f"Error rendering QR code {key}: {str(future.exception())}")
+            else:
+                self.cache.set(key, future.result())
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def submit(self, key: str, data: str, image_format: str = "png", scale: int = 10, border: int = 4) -> Future:
+        """
+        Start rendering a QR code unless it is cached or already being rendered.
+
+        Args:
+            key (str): Cache key, normally the token id
+            data (str): The data to encode in the QR code
+            image_format (str): "png" or "svg"
+            scale (int): Size of one QR module
+            border (int): Quiet zone width in modules
+
+        Returns:
+            Future: Resolves to the encoded image bytes
+        """
+        cache_key = f"{key}:{image_format}:{scale}:{border}"
+        image = self.cache.get(cache_key)
+        if image is not MISSING:
+            future = Future()
+            future.set_result(image)
+            return future
+
+        with self._lock:
+            future = self._pending.get(cache_key)
+            if future is None:
+                future = self._get_executor().submit(render_qr, data, image_format, scale, border)
+                self._pending[cache_key] = future
+                future.add_done_callback(lambda done: self._finish(cache_key, done))
+        return future
+
+    def render(self, key: str, data: str, image_format: str = "png", scale: int = 10, border: int = 4,
+               timeout: float = QR_RENDER_TIMEOUT_SECONDS) -> bytes:
+        """Return the image for a key, waiting for the render if needed"""
+        return self.submit(key, data, image_format, scale, border).result(timeout=timeout)
+
+    async def render_async(self, key: str, data: str, image_format: str = "png", scale: int = 10,
+                           border: int = 4, timeout: float = QR_RENDER_TIMEOUT_SECONDS) -> bytes:
+        """Async version of render that waits without blocking the event loop"""
+        future = self.submit(key, data, image_format, scale, border)
+        if future.done():
+            return future.result()
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+qr_renderer = QRRenderer()
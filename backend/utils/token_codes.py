@@ -0,0 +1,143 @@
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from models.id_block import IdBlock
+from threading import Lock
+from typing import Dict, Tuple
+import logging
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Token code alphabet, without the easily confused 0/O and 1/I
+TOKEN_CODE_ALPHABET = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+TOKEN_CODE_PREFIX = 'CNG-'
+TOKEN_CODE_LENGTH = 6
+
+# 32 ** 6 == 2 ** 30 distinct codes
+TOKEN_CODE_BITS = 30
+TOKEN_CODE_SPACE = 1 << TOKEN_CODE_BITS
+
+# Sequence values each worker reserves from the id_blocks table at a time
+TOKEN_CODE_BLOCK_SIZE = int(os.getenv("TOKEN_CODE_BLOCK_SIZE", "1000"))
+
+# Round keys of the permutation that turns sequence numbers into codes. These
+# must never change once codes have been issued.
+_ROUND_KEYS = (0x2F1A7, 0x13C55, 0x3B0E9, 0x06D3B)
+_HALF_BITS = TOKEN_CODE_BITS // 2
+_HALF_MASK = (1 << _HALF_BITS) - 1
+
+
+def permute_sequence(value: int) -> int:
+    """
+    Map a 30-bit sequence number onto a 30-bit code number.
+
+    A balanced Feistel network is a bijection, so distinct sequence numbers
+    always give distinct codes, while consecutive bookings get unrelated
+    looking codes.
+
+    Args:
+        value (int): Sequence number in [0, 2**30)
+
+    Returns:
+        int: Code number in [0, 2**30)
+    """
+    left, right = value >> _HALF_BITS, value & _HALF_MASK
+    for key in _ROUND_KEYS:
+        mixed = ((right * 0x9E3779B1) ^ key) & 0xFFFFFFFF
+        mixed = ((mixed >> 13) ^ mixed) & _HALF_MASK
+        left, right = right, left ^ mixed
+    return (left << _HALF_BITS) | right
+
+
+def encode_token_code(number: int) -> str:
+    """
+    Encode a code number as CNG-XXXXXX.
+
+    Args:
+        number (int): Code number in [0, 2**30)
+
+    Returns:
+        str: Token code
+    """
+    chars = []
+    for _ in range(TOKEN_CODE_LENGTH):
+        number, index = divmod(number, len(TOKEN_CODE_ALPHABET))
+        chars.append(TOKEN_CODE_ALPHABET[index])
+    return TOKEN_CODE_PREFIX + ''.join(reversed(chars))
+
+
+class TokenCodeAllocator:
+    """
+    Hands out unique token codes without checking the tokens table.
+
+    Each process reserves blocks of sequence numbers from the ``id_blocks``
+    table with a single UPDATE in its own short transaction (hi-lo
+    allocation), then serves codes from the block in memory. Blocks never
+    overlap across processes, so token creation costs one INSERT.
+    """
+
+    def __init__(self, name: str = "token_code", block_size: int = TOKEN_CODE_BLOCK_SIZE):
+        self.name = name
+        self.block_size = block_size
+        self._blocks: Dict[str, Tuple[int, int]] = {}
+        self._lock = Lock()
+
+    def _reserve_block(self, engine: Engine) -> Tuple[int, int]:
+        """Reserve the next block of sequence numbers and return its [start, end) range"""
+        table = IdBlock.__table__
+        for _ in range(2):
+            with engine.begin() as conn:
+                updated = conn.execute(
+                    table.update()
+                    .where(table.c.name == self.name)
+                    .values(next_value=table.c.next_value + self.block_size)
+                ).rowcount
+                if updated:
+                    end = conn.execute(
+                        table.select().with_only_columns(table.c.next_value).where(table.c.name == self.name)
+                    ).scalar_one()
+                    return end - self.block_size, end
+
+            # First allocation for this sequence: create its row, tolerating a concurrent creator
+            try:
+                with engine.begin() as conn:
+                    conn.execute(table.insert().values(name=self.name, next_value=0))
+            except IntegrityError:
+                pass
+
+        raise RuntimeError(f"Could not reserve a block from id_blocks for {self.name}")
+
+    def next_value(self, engine: Engine) -> int:
+        """Return the next unused sequence number for the database behind engine"""
+        key = str(engine.url)
+        with self._lock:
+            start, end = self._blocks.get(key, (0, 0))
+            if start < end:
+                self._blocks[key] = (start + 1, end)
+                return start
+
+        # The lock is not held during IO: under an AsyncSession this runs on the
+        # event loop thread, where waiting on the lock would block other requests
+        block = self._reserve_block(engine)
+        logger.info(f"Reserved {self.name} block [{block[0]}, {block[1]})")
+
+        with self._lock:
+            start, end = self._blocks.get(key, (0, 0))
+            if start >= end:
+                # Otherwise another caller installed a block first and ours is left unused
+                start, end = block
+            self._blocks[key] = (start + 1, end)
+        return start
+
+    def next_code(self, engine: Engine) -> str:
+        """Return the next unique token code for the database behind engine"""
+        value = self.next_value(engine)
+        if value >= TOKEN_CODE_SPACE:
+            raise RuntimeError("Token code space exhausted")
+        return encode_token_code(permute_sequence(value))
+
+
+token_code_allocator = TokenCodeAllocator()
@@ -0,0 +1,255 @@
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+from datetime import datetime
+from threading import Lock
+from typing import NamedTuple, Optional, Union
+import base64
+import calendar
+import hashlib
+import logging
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Token QR codes encode "CNG_TOKEN:<token_code>:<booking_id>", and signed tokens
+# append ":<pump_id>:<expiry>:<signature>" so pumps can verify them offline
+QR_PAYLOAD_PREFIX = "CNG_TOKEN:"
+
+# Base64 encoded 32 byte Ed25519 private key seed. Pumps only need the public
+# key, from GET /api/tokens/signing-key, so they cannot issue tokens themselves.
+TOKEN_SIGNING_PRIVATE_KEY = os.getenv("TOKEN_SIGNING_PRIVATE_KEY", "")
+
+# Development only: without a configured key, derive one from SECRET_KEY. The
+# default SECRET_KEY is public, so anyone could then sign tokens pumps accept.
+TOKEN_SIGNING_ALLOW_DERIVED_KEY = os.getenv("TOKEN_SIGNING_ALLOW_DERIVED_KEY", "false").lower() in ("1", "true", "yes")
+
+# Allowed difference between a pump's clock and the server's, in seconds
+TOKEN_CLOCK_SKEW_SECONDS = int(os.getenv("TOKEN_CLOCK_SKEW_SECONDS", "60"))
+
+# TokenScan.result values written by pump-side verifiers
+OFFLINE_SCAN_ACCEPTED = "offline_accepted"
+OFFLINE_SCAN_REJECTED = "offline_rejected"
+
+
+class SignedTokenPayload(NamedTuple):
+    token_code: str
+    booking_id: str
+    pump_id: str
+    expiry: int
+    signature: str
+
+    @property
+    def expiry_time(self) -> datetime:
+        return datetime.utcfromtimestamp(self.expiry)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def load_signing_key(encoded_key: str = TOKEN_SIGNING_PRIVATE_KEY,
+                     allow_derived_key: bool = TOKEN_SIGNING_ALLOW_DERIVED_KEY) -> Ed25519PrivateKey:
+    """
+    Load the Ed25519 key that signs token payloads.
+
+    Without a configured key, one is derived from SECRET_KEY only when
+    TOKEN_SIGNING_ALLOW_DERIVED_KEY is set, for development setups.
+
+    Args:
+        encoded_key (str): Base64 encoded 32 byte private key seed
+        allow_derived_key (bool): Fall back to a key derived from SECRET_KEY
+
+    Returns:
+        Ed25519PrivateKey: The signing key
+
+    Raises:
+        RuntimeError: If no key is configured and deriving one is not allowed
+    """
+    if encoded_key:
+        return Ed25519PrivateKey.from_private_bytes(_b64decode(encoded_key))
+
+    if not allow_derived_key:
+        raise RuntimeError(
+            "TOKEN_SIGNING_PRIVATE_KEY is not set. Configure a key, or set "
+            "TOKEN_SIGNING_ALLOW_DERIVED_KEY=true for development only."
+        )
+
+    from utils.security import SECRET_KEY
+    logger.warning("TOKEN_SIGNING_PRIVATE_KEY is not set, deriving the token signing key from SECRET_KEY")
+    return Ed25519PrivateKey.from_private_bytes(hashlib.sha256(f"token-signing:{SECRET_KEY}".encode()).digest())
+
+
+def encode_public_key(public_key: Ed25519PublicKey) -> str:
+    """Encode a public key as URL-safe base64 of its 32 raw bytes"""
+    return _b64encode(public_key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw))
+
+
+def parse_token_payload(payload: str) -> Optional[SignedTokenPayload]:
+    """
+    Split a signed token payload into its fields.
+
+    Args:
+        payload (str): Data read from a token QR code
+
+    Returns:
+        Optional[SignedTokenPayload]: The fields, or None for unsigned or malformed payloads
+    """
+    if not payload.startswith(QR_PAYLOAD_PREFIX):
+        return None
+    parts = payload[len(QR_PAYLOAD_PREFIX):].split(":")
+    if len(parts) != 5 or not parts[3].isdigit():
+        return None
+    token_code, booking_id, pump_id, expiry, signature = parts
+    return SignedTokenPayload(token_code, booking_id, pump_id, int(expiry), signature)
+
+
+def _has_valid_signature(public_key: Ed25519PublicKey, payload: str, token: SignedTokenPayload) -> bool:
+    message = payload[:-(len(token.signature) + 1)].encode()
+    try:
+        public_key.verify(_b64decode(token.signature), message)
+        return True
+    except (InvalidSignature, ValueError):
+        return False
+
+
+class TokenSigner:
+    """Signs token payloads with the server's Ed25519 key"""
+
+    def __init__(self, private_key: Optional[Ed25519PrivateKey] = None):
+        self._private_key = private_key
+        self._lock = Lock()
+
+    @property
+    def private_key(self) -> Ed25519PrivateKey:
+        # Loaded on first use so that importing this module never needs the key
+        with self._lock:
+            if self._private_key is None:
+                self._private_key = load_signing_key()
+            return self._private_key
+
+    @property
+    def public_key(self) -> Ed25519PublicKey:
+        return self.private_key.public_key()
+
+    def sign(self, token_code: str, booking_id, pump_id, expiry_time: datetime) -> str:
+        """
+        Build the signed QR payload for a token.
+
+        Args:
+            token_code (str): Token code
+            booking_id: Booking ID
+            pump_id: ID of the pump the booking is for
+            expiry_time (datetime): Token expiry time in UTC
+
+        Returns:
+            str: CNG_TOKEN:<token_code>:<booking_id>:<pump_id>:<expiry>:<signature>
+        """
+        expiry = calendar.timegm(expiry_time.utctimetuple())
+        message = f"{QR_PAYLOAD_PREFIX}{token_code}:{booking_id}:{pump_id}:{expiry}"
+        return f"{message}:{_b64encode(self.private_key.sign(message.encode()))}"
+
+    def verify(self, payload: str) -> Optional[SignedTokenPayload]:
+        """
+        Check that a payload was signed with this signer's key.
+
+        Args:
+            payload (str): Signed QR payload
+
+        Returns:
+            Optional[SignedTokenPayload]: The payload fields, or None for unsigned, malformed
+            or forged payloads
+        """
+        token = parse_token_payload(payload)
+        if token is None or not _has_valid_signature(self.public_key, payload, token):
+            return None
+        return token
+
+
+class TokenVerifier:
+    """
+    Pump-side verifier for signed token payloads.
+
+    Needs only the public signing key, so a gate scanner can check tokens
+    without reaching the API. Codes accepted by this verifier are remembered
+    so a token cannot be used twice at the same pump while offline; the scan
+    records it produces are uploaded later through POST /api/tokens/scans/sync.
+    """
+
+    def __init__(self, public_key: Union[Ed25519PublicKey, str], pump_id: Optional[str] = None,
+                 clock_skew_seconds: int = TOKEN_CLOCK_SKEW_SECONDS):
+        if isinstance(public_key, str):
+            public_key = Ed25519PublicKey.from_public_bytes(_b64decode(public_key))
+        self.public_key = public_key
+        self.pump_id = str(pump_id) if pump_id else None
+        self.clock_skew_seconds = clock_skew_seconds
+        self.used_codes = set()
+
+    def verify(self, payload: str, now: Optional[datetime] = None) -> dict:
+        """
+        Check a token payload's signature, pump and expiry.
+
+        Args:
+            payload (str): Data read from the token QR code
+            now (datetime): Current UTC time, defaults to the local clock
+
+        Returns:
+            dict: Validation result with status and message, like /api/tokens/validate
+        """
+        token = parse_token_payload(payload)
+        if token is None:
+            return {"valid": False, "message": "Unsigned token, validate online"}
+
+        if not _has_valid_signature(self.public_key, payload, token):
+            return {"valid": False, "message": "Invalid token"}
+
+        if self.pump_id and token.pump_id != self.pump_id:
+            return {"valid": False, "message": "Token is for another pump"}
+
+        now = now or datetime.utcnow()
+        if token.expiry + self.clock_skew_seconds < calendar.timegm(now.utctimetuple()):
+            return {"valid": False, "message": "Token expired"}
+
+        if token.token_code in self.used_codes:
+            return {"valid": False, "message": "Token already used"}
+
+        return {"valid": True, "token": token}
+
+    def scan(self, payload: str, scanned_by: str, now: Optional[datetime] = None) -> dict:
+        """
+        Verify a token and build the scan record to upload once back online.
+
+        Args:
+            payload (str): Data read from the token QR code
+            scanned_by (str): ID of the attendant scanning the token
+            now (datetime): Current UTC time, defaults to the local clock
+
+        Returns:
+            dict: Scan record matching TokenScanCreate, including the scanned payload so the
+            server can verify it again, with the validation result under "validation"
+        """
+        now = now or datetime.utcnow()
+        result = self.verify(payload, now)
+        token = result.get("token") or parse_token_payload(payload)
+        if result["valid"]:
+            self.used_codes.add(token.token_code)
+
+        return {
+            "token_code": token.token_code if token else None,
+            "pump_id": self.pump_id or (token.pump_id if token else None),
+            "scanned_by": str(scanned_by),
+            "scan_time": now.isoformat(),
+            "result": OFFLINE_SCAN_ACCEPTED if result["valid"] else f"{OFFLINE_SCAN_REJECTED}: {result['message']}",
+            "qr_payload": payload,
+            "validation": result
+        }
+
+
+token_signer = TokenSigner()
@@ -8,6 +8,7 @@ import { useAuth } from "@/hooks/useAuth";
 import { useApiBookings } from "@/hooks/useApiBookings";
 import { toast } from "@/hooks/use-toast";
 import type { Pump } from "@/hooks/usePumps";
+import { getTokenQrUrl } from "@/lib/apiConfig";
 
 interface BookingModalProps {
   isOpen: boolean;
@@ -31,7 +32,7 @@ const BookingModal = ({ isOpen, onClose, pump }: BookingModalProps) => {
   const [selectedTime, setSelectedTime] = useState("");
   const [fuelQuantity, setFuelQuantity] = useState("10");
   const [loading, setLoading] = useState(false);
-  const [tokenData, setTokenData] = useState<{ token_code: string; qr_data: string } | null>(null);
+  const [tokenData, setTokenData] = useState<{ token_code: string; qr_url: string } | null>(null);
 
   const { user } = useAuth();
   const { createBooking } = useApiBookings();
@@ -79,7 +80,7 @@ const BookingModal = ({ isOpen, onClose, pump }: BookingModalProps) => {
     } else if (data?.token) {
       setTokenData({
         token_code: data.token.token_code,
-        qr_data: data.token.qr_data
+        qr_url: getTokenQrUrl(data.token)
       });
       setStep("confirmation");
       toast({
@@ -203,7 +204,7 @@ const BookingModal = ({ isOpen, onClose, pump }: BookingModalProps) => {
                 <>
                   <div className="w-40 h-40 rounded-xl overflow-hidden mx-auto mb-4 bg-card">
                     <img 
-                      src={tokenData.qr_data} 
+                      src={tokenData.qr_url} 
                       alt="QR Code" 
                       className="w-full h-full object-contain"
                     />
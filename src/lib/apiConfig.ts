@@ -46,4 +46,12 @@ export const API_CONFIG = {
 // Helper function to get the API URL
 export const getApiUrl = (endpoint: string) => {
   return `${API_BASE_URL}${API_BASE_PATH}/${endpoint}`;
-};
\ No newline at end of file
+};
+
+// QR image for an e-token. Older tokens store a rendered data URI in qr_data,
+// newer ones store only the payload and are rendered by the API.
+export const getTokenQrUrl = (token: { id: string; qr_data: string }) => {
+  return token.qr_data.startsWith('data:')
+    ? token.qr_data
+    : `${API_CONFIG.ENDPOINTS.TOKENS.BASE}/${token.id}/qr`;
+};
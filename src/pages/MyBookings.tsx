@@ -4,6 +4,7 @@ import { Calendar, Clock, MapPin, QrCode, CheckCircle, XCircle, AlertCircle, Ban
 import { Button } from "@/components/ui/button";
 import { useAuth } from "@/hooks/useAuth";
 import { useApiBookings } from "@/hooks/useApiBookings";
+import { getTokenQrUrl } from "@/lib/apiConfig";
 import Header from "@/components/Header";
 import Footer from "@/components/Footer";
 import {
@@ -300,7 +301,7 @@ const MyBookings = () => {
                     <div className="flex-shrink-0">
                       <div className="w-32 h-32 rounded-xl overflow-hidden bg-card border border-border">
                         <img 
-                          src={booking.token.qr_data} 
+                          src={getTokenQrUrl(booking.token)} 
                           alt="QR Code" 
                           className="w-full h-full object-contain"
                         />
@@ -514,7 +515,7 @@ const MyBookings = () => {
               <div className="flex flex-col items-center gap-4 py-4">
                 <div className="p-4 bg-white rounded-lg">
                   <img 
-                    src={selectedBooking.token.qr_data} 
+                    src={getTokenQrUrl(selectedBooking.token)} 
                     alt="Booking QR Code" 
                     className="w-64 h-64 object-contain"
                   />